@@ -0,0 +1,93 @@
+"""Load-test the analytics API with many concurrent clients and report latency percentiles.
+
+Usage:
+    uvicorn src.api.app:app --workers 1 &
+    python -m scripts.benchmarks.api_load_test --clients 200 --requests 20
+
+Each client issues its requests back to back, cycling through the endpoints.
+503 responses are counted separately: they are the limiter shedding load.
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+
+
+OUT = Path("data/processed/benchmarks")
+ENDPOINTS = [
+    "/analytics/top-products",
+    "/analytics/monthly-trend",
+    "/analytics/category-summary",
+    "/analytics/summary",
+]
+
+
+def percentile(values: list, pct: float):
+    """Nearest-rank percentile of ``values``."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(pct * len(ordered) / 100), 1)
+    return ordered[rank - 1]
+
+
+async def _client(client: httpx.AsyncClient, paths: list, requests: int, offset: int, latencies: list, statuses: Counter):
+    for i in range(requests):
+        started = time.perf_counter()
+        try:
+            response = await client.get(paths[(offset + i) % len(paths)])
+            statuses[response.status_code] += 1
+        except httpx.HTTPError as exc:
+            statuses[type(exc).__name__] += 1
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def run_load_test(
+    base_url: str, clients: int, requests: int, paths: list, timeout: float, transport=None
+) -> dict:
+    """``transport`` (e.g. ``httpx.ASGITransport(app)``) runs the test against an in-process app."""
+    latencies, statuses = [], Counter()
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    started = time.perf_counter()
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout, transport=transport) as client:
+        await asyncio.gather(*(
+            _client(client, paths, requests, offset, latencies, statuses) for offset in range(clients)
+        ))
+    elapsed = time.perf_counter() - started
+    return {
+        "base_url": base_url,
+        "clients": clients,
+        "requests": clients * requests,
+        "elapsed_seconds": round(elapsed, 3),
+        "requests_per_sec": round(clients * requests / elapsed, 2) if elapsed else None,
+        "status_counts": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        "latency_ms": {
+            f"p{pct}": round(percentile(latencies, pct), 2) if latencies else None for pct in (50, 95, 99)
+        } | {"max": round(max(latencies), 2) if latencies else None},
+    }
+
+
+def main(argv: list | None = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    parser.add_argument("--paths", nargs="+", default=ENDPOINTS)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run_load_test(args.url, args.clients, args.requests, args.paths, args.timeout))
+    OUT.mkdir(parents=True, exist_ok=True)
+    with open(OUT / "api_load_test.json", "w") as f:
+        json.dump(result, f, indent=4)
+    return result
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(), indent=4))
@@ -0,0 +1,218 @@
+"""Time every pipeline stage at several scale factors and compare against a baseline.
+
+Usage:
+    python -m scripts.benchmarks.pipeline_stages --scale-factors 0.01 1 10
+    python -m scripts.benchmarks.pipeline_stages --update-baseline
+
+Each scale factor generates a fresh dataset into a temporary directory and runs
+the database stages in a throwaway database created on the configured server
+(and dropped afterwards). Without a reachable server only the stages that do
+not need one are timed and the rest are reported as skipped.
+
+The run exits non-zero unless it is a clean pass: when any stage is slower than
+the baseline by more than ``benchmarks.regression_threshold``, when a stage was
+skipped, or when there is no baseline to compare against. ``--update-baseline``
+refuses to store a run with skipped stages.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import psycopg2
+
+from scripts.data_generation import generate_data
+from scripts.db_connection import dispose_engine, get_config, get_connection, get_db_config, reload_config
+from scripts.ingestion import ingest_to_staging
+from scripts.quality_checks import validate_data
+from scripts.telemetry import measure_task
+from scripts.transformation import generate_analytics, load_warehouse, staging_to_production
+
+
+OUT = Path("data/processed/benchmarks")
+DDL_PATH = Path("sql/ddl")
+REPORTED_METRICS = ["wall_seconds", "cpu_seconds", "sql_seconds", "python_seconds", "rows_per_sec", "process_peak_rss_mb"]
+
+# Quality checks validate the production schema, so they run after cleansing has filled it.
+DATABASE_STAGES = [
+    ("ingestion", ingest_to_staging.main),
+    ("cleansing", lambda: staging_to_production.main(strategy="truncate-insert")),
+    ("quality_checks", validate_data.main),
+    ("warehouse_dimensions", lambda: [
+        load_warehouse.build_dim_date_for_production(),
+        load_warehouse.build_dim_customers(),
+        load_warehouse.build_dim_products(),
+        load_warehouse.build_dim_payment_method(),
+    ]),
+    ("fact_sales", lambda: load_warehouse.build_fact_sales(mode="full")),
+    ("aggregates", load_warehouse.build_aggregates),
+    ("analytics_export", generate_analytics.execute_and_export),
+]
+
+
+def _admin_connection():
+    cfg = get_db_config()
+    conn = psycopg2.connect(
+        host=cfg["host"], port=cfg["port"], dbname=cfg["name"], user=cfg["user"], password=cfg["password"]
+    )
+    conn.autocommit = True
+    return conn
+
+
+@contextmanager
+def throwaway_database():
+    """Create an empty database with the pipeline DDL and point the shared pool at it.
+
+    Yields the database name, or None when no server is reachable.
+    """
+    try:
+        admin = _admin_connection()
+    except psycopg2.OperationalError:
+        yield None
+        return
+    name = f"{get_db_config()['name']}_bench_{os.getpid()}"
+    previous = os.environ.get("DB_NAME")
+    with admin.cursor() as cur:
+        cur.execute(f'DROP DATABASE IF EXISTS "{name}"')
+        cur.execute(f'CREATE DATABASE "{name}"')
+    os.environ["DB_NAME"] = name
+    reload_config()
+    dispose_engine()
+    try:
+        conn = get_connection()
+        with conn.cursor() as cur:
+            for ddl in sorted(DDL_PATH.glob("[0-9][0-9]_*.sql")):
+                cur.execute(ddl.read_text(encoding="utf-8"))
+        conn.commit()
+        conn.close()
+        yield name
+    finally:
+        dispose_engine()
+        if previous is None:
+            os.environ.pop("DB_NAME", None)
+        else:
+            os.environ["DB_NAME"] = previous
+        reload_config()
+        with admin.cursor() as cur:
+            cur.execute(f'DROP DATABASE IF EXISTS "{name}"')
+        admin.close()
+
+
+@contextmanager
+def _raw_path(path: Path):
+    """Point data generation and ingestion at a scratch raw-data directory."""
+    saved = generate_data.RAW_PATH, ingest_to_staging.RAW_PATH
+    generate_data.RAW_PATH = ingest_to_staging.RAW_PATH = path
+    try:
+        yield
+    finally:
+        generate_data.RAW_PATH, ingest_to_staging.RAW_PATH = saved
+
+
+def _timed(stage: str, func) -> dict:
+    with measure_task(stage) as metrics:
+        func()
+    return {metric: metrics[metric] for metric in REPORTED_METRICS}
+
+
+def run_scale_factor(scale_factor: float, seed: int) -> dict:
+    result = {"scale_factor": scale_factor, "stages": {}}
+    with tempfile.TemporaryDirectory() as tmp, _raw_path(Path(tmp)):
+        metadata = {}
+        result["stages"]["data_generation"] = _timed(
+            "data_generation", lambda: metadata.update(generate_data.main(scale_factor, seed))
+        )
+        result["rows"] = metadata["row_counts"]
+        with throwaway_database() as database:
+            result["database"] = database
+            for stage, func in DATABASE_STAGES:
+                result["stages"][stage] = _timed(stage, func) if database else {"skipped": "no database server"}
+    return result
+
+
+def compare_to_baseline(results: list, baseline: list, threshold: float, min_seconds: float) -> list:
+    """Stages whose wall time grew by more than ``threshold`` (a fraction) over the baseline.
+
+    Stages faster than ``min_seconds`` in both runs are ignored as noise.
+    """
+    previous = {str(entry["scale_factor"]): entry["stages"] for entry in baseline}
+    regressions = []
+    for entry in results:
+        for stage, metrics in entry["stages"].items():
+            base = previous.get(str(entry["scale_factor"]), {}).get(stage, {})
+            now, then = metrics.get("wall_seconds"), base.get("wall_seconds")
+            if now is None or then is None or max(now, then) < min_seconds:
+                continue
+            if now > then * (1 + threshold):
+                regressions.append({
+                    "scale_factor": entry["scale_factor"],
+                    "stage": stage,
+                    "baseline_seconds": then,
+                    "seconds": now,
+                    "change": round(now / then - 1, 3) if then else None,
+                })
+    return regressions
+
+
+def skipped_stages(results: list) -> list:
+    return [
+        {"scale_factor": entry["scale_factor"], "stage": stage, "reason": metrics["skipped"]}
+        for entry in results
+        for stage, metrics in entry["stages"].items()
+        if "skipped" in metrics
+    ]
+
+
+def main(argv: list | None = None) -> dict:
+    config = get_config("benchmarks")
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale-factors", type=float, nargs="+", default=config.get("scale_factors", [0.01, 1, 10]))
+    parser.add_argument("--seed", type=int, default=int(config.get("seed", 42)))
+    parser.add_argument("--baseline", type=Path, default=Path(config.get("baseline", "config/benchmark_baseline.json")))
+    parser.add_argument("--threshold", type=float, default=float(config.get("regression_threshold", 0.2)))
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = [run_scale_factor(scale_factor, args.seed) for scale_factor in args.scale_factors]
+    skipped = skipped_stages(results)
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else None
+    regressions = []
+    if baseline is not None:
+        regressions = compare_to_baseline(results, baseline, args.threshold, float(config.get("min_seconds", 0.05)))
+
+    if regressions:
+        status = "regressed"
+    elif skipped:
+        status = "incomplete"
+    elif baseline is None and not args.update_baseline:
+        status = "no_baseline"
+    else:
+        status = "passed"
+    if args.update_baseline:
+        if skipped:
+            raise SystemExit(f"Not updating {args.baseline}: {len(skipped)} stages were skipped")
+        args.baseline.write_text(json.dumps(results, indent=4), encoding="utf-8")
+
+    report = {
+        "status": status,
+        "baseline": str(args.baseline) if baseline is not None else None,
+        "threshold": args.threshold,
+        "regressions": regressions,
+        "skipped": skipped,
+        "results": results,
+    }
+    OUT.mkdir(parents=True, exist_ok=True)
+    with open(OUT / "pipeline_stages.json", "w") as f:
+        json.dump(report, f, indent=4)
+    return report
+
+
+if __name__ == "__main__":
+    report = main()
+    print(json.dumps(report, indent=4))
+    if report["status"] != "passed":
+        print(f"Benchmark {report['status']}: see the regressions and skipped stages above", file=sys.stderr)
+    sys.exit(0 if report["status"] == "passed" else 1)
@@ -0,0 +1,104 @@
+"""Compare the pandas and pushdown staging_to_production modes at several data sizes.
+
+Usage:
+    python -m scripts.benchmarks.transformation_modes --sizes 200 2000 20000
+
+Each size generates a fresh dataset, loads it into staging, runs both modes and
+checks that they leave identical production tables behind.
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from scripts.data_generation import generate_data
+from scripts.db_connection import get_connection
+from scripts.ingestion import ingest_to_staging
+from scripts.transformation import staging_to_production
+
+
+OUT = Path("data/processed/benchmarks")
+
+TABLE_KEYS = {
+    "customers": "customer_id",
+    "products": "product_id",
+    "transactions": "transaction_id",
+    "transaction_items": "transaction_item_id",
+}
+
+
+def production_checksums(connection) -> dict:
+    """Row count and content hash of every production table, independent of physical order."""
+    result = {}
+    with connection.cursor() as cur:
+        for table, key in TABLE_KEYS.items():
+            cur.execute(
+                f"SELECT COUNT(*), md5(COALESCE(string_agg(t::text, '|' ORDER BY t.{key}), '')) "
+                f"FROM production.{table} t"
+            )
+            rows, digest = cur.fetchone()
+            result[table] = {"rows": rows, "md5": digest}
+    return result
+
+
+def _stage_dataset(num_transactions: int, workdir: Path) -> None:
+    customers = generate_data.generate_customers(max(num_transactions // 2, 1))
+    products = generate_data.generate_products(max(num_transactions // 4, 1))
+    transactions = generate_data.generate_transactions(num_transactions, customers)
+    items = generate_data.generate_transaction_items(transactions, products)
+    frames = {"customers.csv": customers, "products.csv": products,
+              "transactions.csv": transactions, "transaction_items.csv": items}
+    files = {}
+    for name, df in frames.items():
+        df.to_csv(workdir / name, index=False)
+        files[workdir / name] = ingest_to_staging.STAGING_FILES[name]
+
+    conn = get_connection()
+    ingest_to_staging.truncate_staging_tables(conn, list(files.values()))
+    conn.close()
+    ingest_to_staging.ingest_parallel(files, workers=4, shard_bytes=64 * 1024 * 1024, chunk_size=100_000)
+
+
+def _timed_run(mode: str) -> dict:
+    start = time.perf_counter()
+    staging_to_production.main(mode)
+    seconds = time.perf_counter() - start
+    conn = get_connection()
+    checksums = production_checksums(conn)
+    conn.close()
+    return {"seconds": round(seconds, 3), "checksums": checksums}
+
+
+def run_benchmark(sizes: list) -> list:
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            _stage_dataset(size, Path(tmp))
+        pandas_run = _timed_run("pandas")
+        pushdown_run = _timed_run("pushdown")
+        results.append({
+            "transactions": size,
+            "pandas_seconds": pandas_run["seconds"],
+            "pushdown_seconds": pushdown_run["seconds"],
+            "speedup": round(pandas_run["seconds"] / pushdown_run["seconds"], 2) if pushdown_run["seconds"] else None,
+            "identical": pandas_run["checksums"] == pushdown_run["checksums"],
+            "rows": {table: value["rows"] for table, value in pushdown_run["checksums"].items()},
+        })
+    return results
+
+
+def main(argv: list | None = None) -> list:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 2_000, 20_000])
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.sizes)
+    OUT.mkdir(parents=True, exist_ok=True)
+    with open(OUT / "transformation_modes.json", "w") as f:
+        json.dump(results, f, indent=4)
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(), indent=4))
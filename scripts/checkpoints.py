@@ -0,0 +1,84 @@
+"""Per-task checkpoints that let a pipeline run skip work whose inputs did not change.
+
+Each completed task records a fingerprint of its inputs (config, file hashes,
+versions and watermarks from the ``pipeline`` schema) next to its result in ``pipeline_checkpoints.json``. On the
+next run a task is reused when its fingerprint matches, its outputs still exist
+and none of its upstream tasks had to run again.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+from scripts.db_connection import get_connection
+from scripts.pipeline_state import state_snapshot
+
+CHECKPOINT_PATH = Path("data/processed/pipeline_checkpoints.json")
+
+
+def hash_value(value) -> str:
+    """Stable digest of any JSON-serialisable value."""
+    payload = json.dumps(value, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def file_digest(path, block_size: int = 1024 * 1024) -> str | None:
+    path = Path(path)
+    if not path.exists():
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def files_fingerprint(paths) -> dict:
+    return {str(path): file_digest(path) for path in paths}
+
+
+def state_fingerprint(datasets: list, stages: list = ()) -> dict:
+    connection = get_connection()
+    try:
+        return state_snapshot(connection, datasets, stages)
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+def load_checkpoints(path: Path | None = None) -> dict:
+    path = path or CHECKPOINT_PATH
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_checkpoint(checkpoints: dict, task_result: dict, fingerprint: str | None, path: Path | None = None) -> None:
+    """Record a finished task and rewrite the checkpoint file atomically."""
+    path = path or CHECKPOINT_PATH
+    checkpoints[task_result["task"]] = {
+        "status": task_result["status"],
+        "fingerprint": fingerprint,
+        "finished_at": datetime.utcnow().isoformat(),
+        "result": task_result.get("result"),
+        "error": task_result.get("error"),
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(checkpoints, indent=4, default=str), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def stale_reason(checkpoint: dict | None, fingerprint: str | None, outputs=()) -> str | None:
+    """Why a task must run again, or None when its checkpoint can be reused."""
+    if checkpoint is None:
+        return "no checkpoint"
+    if checkpoint["status"] != "success":
+        return f"last run {checkpoint['status']}"
+    if checkpoint["fingerprint"] != fingerprint:
+        return "inputs changed"
+    missing = [str(path) for path in outputs if not Path(path).exists()]
+    if missing:
+        return f"missing outputs: {missing}"
+    return None
@@ -0,0 +1,144 @@
+"""Run a dependency graph of pipeline tasks with bounded parallelism.
+
+A task is a dict::
+
+    {"name": "fact_sales", "func": build_fact_sales, "deps": ["dim_customers", ...],
+     "inputs": ["fact_sales"]}
+
+``deps`` must finish successfully (or be reused from an earlier run) before the
+task starts. The results of the deps listed in ``inputs`` are passed to ``func``
+as keyword arguments.
+"""
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from graphlib import TopologicalSorter
+
+from scripts.telemetry import measure_task
+
+
+def _attempt(name: str, func, retries: int, kwargs: dict) -> dict:
+    last_error = None
+    for attempt in range(1, retries + 2):
+        try:
+            logging.info("Starting task %s (attempt %s)", name, attempt)
+            result = func(**kwargs)
+            logging.info("Completed task %s", name)
+            return {"task": name, "status": "success", "attempt": attempt, "result": result}
+        except Exception as exc:
+            last_error = str(exc)
+            logging.warning("Task %s failed on attempt %s: %s", name, attempt, last_error)
+    return {"task": name, "status": "failed", "attempt": retries + 1, "error": last_error}
+
+
+def run_task(name: str, func, retries: int, kwargs: dict, profiler: str | None = None) -> dict:
+    """Run one task, retrying only that task up to ``retries`` times, and measure it."""
+    with measure_task(name, profiler) as metrics:
+        record = _attempt(name, func, retries, kwargs)
+    return {**record, "seconds": metrics["wall_seconds"], "metrics": metrics}
+
+
+def validate_graph(tasks: list) -> TopologicalSorter:
+    """Check every dependency exists and the graph has no cycles."""
+    names = {task["name"] for task in tasks}
+    if len(names) != len(tasks):
+        raise ValueError("Task names must be unique")
+    for task in tasks:
+        unknown = set(task.get("deps", ())) - names
+        if unknown:
+            raise ValueError(f"Task {task['name']} depends on unknown tasks: {sorted(unknown)}")
+        if not set(task.get("inputs", ())) <= set(task.get("deps", ())):
+            raise ValueError(f"Task {task['name']} takes inputs from tasks it does not depend on")
+    sorter = TopologicalSorter({task["name"]: task.get("deps", ()) for task in tasks})
+    sorter.prepare()
+    return sorter
+
+
+def critical_path(tasks: list, results: dict) -> dict:
+    """Longest chain of dependent tasks by measured duration."""
+    deps_of = {task["name"]: task.get("deps", ()) for task in tasks}
+    finish, previous = {}, {}
+    for name in TopologicalSorter(deps_of).static_order():
+        slowest = max(deps_of[name], key=lambda dep: finish[dep], default=None)
+        previous[name] = slowest
+        finish[name] = results[name].get("seconds", 0) + (finish[slowest] if slowest else 0)
+    if not finish:
+        return {"tasks": [], "seconds": 0}
+    name = max(finish, key=finish.get)
+    seconds = finish[name]
+    path = []
+    while name is not None:
+        path.append(name)
+        name = previous[name]
+    return {"tasks": path[::-1], "seconds": round(seconds, 3)}
+
+
+DONE = ("success", "cached")
+
+
+def descendants(tasks: list, names) -> set:
+    """The given tasks plus every task that depends on them, directly or not."""
+    deps_of = {task["name"]: task.get("deps", ()) for task in tasks}
+    selected = set(names)
+    for name in TopologicalSorter(deps_of).static_order():
+        if selected.intersection(deps_of[name]):
+            selected.add(name)
+    return selected
+
+
+def run_dag(
+    tasks: list,
+    max_workers: int = 4,
+    retries: int = 0,
+    executor: str = "thread",
+    reuse=None,
+    on_result=None,
+    profile: dict | None = None,
+) -> dict:
+    """Run tasks as soon as their dependencies succeed, at most ``max_workers`` at a time.
+
+    Tasks downstream of a failure are skipped; independent branches keep running.
+    ``reuse(task, results)`` may return an earlier result for a ready task, which
+    is then recorded as ``cached`` instead of running. ``on_result`` is called
+    with every finished task's record. ``profile`` maps task names to the
+    profiler (``cprofile`` or ``pyinstrument``) to run them under.
+    """
+    by_name = {task["name"]: task for task in tasks}
+    sorter = validate_graph(tasks)
+    pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    started = time.perf_counter()
+    results = {}
+    with pool_class(max_workers=max(int(max_workers), 1)) as pool:
+        running = {}
+        while sorter.is_active():
+            for name in sorter.get_ready():
+                task = by_name[name]
+                blocked = [dep for dep in task.get("deps", ()) if results[dep]["status"] not in DONE]
+                if blocked:
+                    results[name] = {"task": name, "status": "skipped", "blocked_by": blocked}
+                    sorter.done(name)
+                    continue
+                cached = reuse(task, results) if reuse else None
+                if cached is not None:
+                    results[name] = {"task": name, "status": "cached", "seconds": 0, **cached}
+                    sorter.done(name)
+                    continue
+                kwargs = {dep: results[dep]["result"] for dep in task.get("inputs", ())}
+                running[pool.submit(run_task, name, task["func"], retries, kwargs, (profile or {}).get(name))] = name
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                results[name] = future.result()
+                if on_result:
+                    on_result(results[name])
+                sorter.done(name)
+
+    ordered = [results[task["name"]] for task in tasks]
+    return {
+        "status": "success" if all(r["status"] in DONE for r in ordered) else "failed",
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "tasks": ordered,
+        "critical_path": critical_path(tasks, results),
+    }
@@ -1,56 +1,124 @@
-import pandas as pd
+import argparse
 import json
-from faker import Faker
-from datetime import datetime
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from functools import lru_cache
 from pathlib import Path
-import random
 
-fake = Faker()
+import numpy as np
+import pandas as pd
+from faker import Faker
+
+from scripts.db_connection import get_config
+from scripts.telemetry import record_rows
+
 RAW_PATH = Path("data/raw")
 RAW_PATH.mkdir(parents=True, exist_ok=True)
 
-def generate_customers(num_customers: int) -> pd.DataFrame:
-    return pd.DataFrame([{
-        "customer_id": i + 1,
-        "first_name": fake.first_name(),
-        "last_name": fake.last_name(),
-        "email": fake.email(),
-        "gender": random.choice(["M", "F"]),
-        "signup_date": fake.date_this_decade()
-    } for i in range(num_customers)])
-
-def generate_products(num_products: int) -> pd.DataFrame:
-    return pd.DataFrame([{
-        "product_id": i + 1,
-        "product_name": fake.word(),
-        "category": random.choice(["Electronics", "Clothing", "Home"]),
-        "price": round(random.uniform(10, 500), 2)
-    } for i in range(num_products)])
-
-def generate_transactions(num_transactions: int, customers_df: pd.DataFrame) -> pd.DataFrame:
-    return pd.DataFrame([{
-        "transaction_id": i + 1,
-        "customer_id": random.choice(customers_df["customer_id"]),
-        "transaction_date": fake.date_time_this_year(),
-        "payment_method": random.choice(["Card", "UPI", "Cash"]),
-        "total_amount": round(random.uniform(50, 1000), 2)
-    } for i in range(num_transactions)])
-
-def generate_transaction_items(transactions_df: pd.DataFrame, products_df: pd.DataFrame) -> pd.DataFrame:
-    rows = []
-    tid = 1
-    for _, tx in transactions_df.iterrows():
-        for _ in range(random.randint(1, 3)):
-            product = products_df.sample(1).iloc[0]
-            rows.append({
-                "transaction_item_id": tid,
-                "transaction_id": tx["transaction_id"],
-                "product_id": product["product_id"],
-                "quantity": random.randint(1, 5),
-                "unit_price": product["price"]
-            })
-            tid += 1
-    return pd.DataFrame(rows)
+DEFAULT_SEED = 42
+NAME_POOL_SIZE = 1_000
+GENDERS = np.array(["M", "F"])
+CATEGORIES = np.array(["Electronics", "Clothing", "Home"])
+PAYMENT_METHODS = np.array(["Card", "UPI", "Cash"])
+EMAIL_DOMAINS = np.array(["example.com", "example.org", "example.net"])
+SIGNUP_START = date(2020, 1, 1)
+
+
+@lru_cache(maxsize=8)
+def build_name_pools(seed: int = DEFAULT_SEED, size: int = NAME_POOL_SIZE) -> dict:
+    """Draw Faker values once; rows then sample from these pools with NumPy."""
+    fake = Faker()
+    fake.seed_instance(seed)
+    return {
+        "first_names": np.array([fake.first_name() for _ in range(size)]),
+        "last_names": np.array([fake.last_name() for _ in range(size)]),
+        "words": np.array([fake.word() for _ in range(size)]),
+    }
+
+
+def _rng(rng) -> np.random.Generator:
+    return rng if rng is not None else np.random.default_rng(DEFAULT_SEED)
+
+
+def _random_dates(rng: np.random.Generator, start: date, end: date, size: int, unit: str = "D") -> np.ndarray:
+    """Uniform datetime64 values in ``[start, end]`` at day or second resolution."""
+    first = np.datetime64(start, unit)
+    span = int((np.datetime64(end, unit) + np.timedelta64(1, "D") - first) / np.timedelta64(1, unit))
+    return first + rng.integers(0, span, size).astype(f"timedelta64[{unit}]")
+
+
+def generate_customers(
+    num_customers: int, rng=None, start_id: int = 1, end_date: date | None = None, seed: int = DEFAULT_SEED
+) -> pd.DataFrame:
+    rng = _rng(rng)
+    pools = build_name_pools(seed)
+    ids = np.arange(start_id, start_id + num_customers)
+    first_names = rng.choice(pools["first_names"], num_customers)
+    last_names = rng.choice(pools["last_names"], num_customers)
+    domains = rng.choice(EMAIL_DOMAINS, num_customers)
+    local_part = (pd.Series(first_names).str.lower() + "." + pd.Series(last_names).str.lower()).str.replace(
+        r"[^a-z.]", "", regex=True
+    )
+    return pd.DataFrame({
+        "customer_id": ids,
+        "first_name": first_names,
+        "last_name": last_names,
+        "email": local_part + ids.astype(str) + "@" + domains,
+        "gender": rng.choice(GENDERS, num_customers),
+        "signup_date": _random_dates(rng, SIGNUP_START, end_date or date.today(), num_customers),
+    })
+
+
+def generate_products(num_products: int, rng=None, start_id: int = 1, seed: int = DEFAULT_SEED) -> pd.DataFrame:
+    rng = _rng(rng)
+    return pd.DataFrame({
+        "product_id": np.arange(start_id, start_id + num_products),
+        "product_name": rng.choice(build_name_pools(seed)["words"], num_products),
+        "category": rng.choice(CATEGORIES, num_products),
+        "price": rng.uniform(10, 500, num_products).round(2),
+    })
+
+
+def generate_transactions(
+    num_transactions: int,
+    customers_df: pd.DataFrame,
+    rng=None,
+    start_id: int = 1,
+    start_date: date | None = None,
+    end_date: date | None = None,
+) -> pd.DataFrame:
+    rng = _rng(rng)
+    end_date = end_date or date.today()
+    start_date = start_date or date(end_date.year, 1, 1)
+    return pd.DataFrame({
+        "transaction_id": np.arange(start_id, start_id + num_transactions),
+        "customer_id": rng.choice(customers_df["customer_id"].to_numpy(), num_transactions),
+        "transaction_date": _random_dates(rng, start_date, end_date, num_transactions, unit="s"),
+        "payment_method": rng.choice(PAYMENT_METHODS, num_transactions),
+        "total_amount": rng.uniform(50, 1000, num_transactions).round(2),
+    })
+
+
+def generate_transaction_items(
+    transactions_df: pd.DataFrame, products_df: pd.DataFrame, rng=None, start_id: int = 1, counts=None
+) -> pd.DataFrame:
+    """Draw 1-3 items per transaction with array operations instead of per-row sampling."""
+    rng = _rng(rng)
+    if counts is None:
+        counts = rng.integers(1, 4, len(transactions_df))
+    total = int(counts.sum())
+    picks = rng.integers(0, len(products_df), total)
+    return pd.DataFrame({
+        "transaction_item_id": np.arange(start_id, start_id + total),
+        "transaction_id": np.repeat(transactions_df["transaction_id"].to_numpy(), counts),
+        "product_id": products_df["product_id"].to_numpy()[picks],
+        "quantity": rng.integers(1, 6, total),
+        "unit_price": products_df["price"].to_numpy()[picks],
+    })
+
 
 def validate_referential_integrity(customers, products, transactions, items) -> dict:
     return {
@@ -60,24 +128,167 @@ def validate_referential_integrity(customers, products, transactions, items) ->
     }
 
 
-def main():
-    customers = generate_customers(100)
-    products = generate_products(50)
-    transactions = generate_transactions(200, customers)
-    items = generate_transaction_items(transactions, products)
+def _scaled(count, scale_factor: float) -> int:
+    return max(int(round(int(count) * scale_factor)), 1)
+
+
+def _stream_rng(seed: int, *key: int) -> np.random.Generator:
+    """Independent generator for one stream; depends only on the seed and its key."""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=key))
+
+
+# Stream keys: customers and products get their own streams, shard i uses
+# (SHARD_STREAM + i, 0) for its item counts and (SHARD_STREAM + i, 1) for the rest.
+CUSTOMER_STREAM, PRODUCT_STREAM, SHARD_STREAM = 0, 1, 2
+
+
+def _shard_item_counts(seed: int, shard: int, size: int) -> np.ndarray:
+    return _stream_rng(seed, SHARD_STREAM + shard, 0).integers(1, 4, size)
+
+
+def _count_shard_items(seed: int, shard: int, size: int) -> int:
+    return int(_shard_item_counts(seed, shard, size).sum())
+
+
+def generate_shard(task: dict) -> dict:
+    """Generate one shard of transactions and items and write it to its own files.
+
+    Everything drawn here comes from the shard's own seed stream and key ranges,
+    so the output does not depend on how many workers run the shards.
+    """
+    started = time.perf_counter()
+    shard, seed, size = task["shard"], task["seed"], task["size"]
+    rng = _stream_rng(seed, SHARD_STREAM + shard, 1)
+    customers = pd.DataFrame({"customer_id": np.arange(1, task["num_customers"] + 1)})
+    products = generate_products(task["num_products"], _stream_rng(seed, PRODUCT_STREAM), seed=seed)
+
+    transactions = generate_transactions(
+        size, customers, rng, task["transaction_start_id"], task["start_date"], task["end_date"]
+    )
+    counts = _shard_item_counts(seed, shard, size)
+    items = generate_transaction_items(transactions, products, rng, task["item_start_id"], counts)
+
+    out_dir = Path(task["out_dir"])
+    files = {
+        "transactions": out_dir / f"transactions-{shard:05d}.csv",
+        "transaction_items": out_dir / f"transaction_items-{shard:05d}.csv",
+    }
+    transactions.to_csv(files["transactions"], index=False)
+    items.to_csv(files["transaction_items"], index=False)
+    return {
+        "shard": shard,
+        "transaction_id_range": [task["transaction_start_id"], task["transaction_start_id"] + size - 1],
+        "transaction_item_id_range": [task["item_start_id"], task["item_start_id"] + len(items) - 1],
+        "rows": {"transactions": size, "transaction_items": len(items)},
+        "files": {name: path.name for name, path in files.items()},
+        "validation": validate_referential_integrity(customers, products, transactions, items),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def merge_shards(manifest: dict, shard_dir: Path, out_dir: Path) -> None:
+    """Concatenate shard files in shard order into one CSV per table."""
+    for table in ("transactions", "transaction_items"):
+        with open(out_dir / f"{table}.csv", "wb") as target:
+            for position, entry in enumerate(manifest["shards"]):
+                with open(shard_dir / entry["files"][table], "rb") as source:
+                    header = source.readline()
+                    if position == 0:
+                        target.write(header)
+                    shutil.copyfileobj(source, target, 16 * 1024 * 1024)
+
 
+def _run_tasks(func, calls: list, workers: int) -> list:
+    """Run ``func(*args)`` for each args tuple, in order, across ``workers`` processes."""
+    if workers <= 1:
+        return [func(*args) for args in calls]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, *zip(*calls)))
+
+
+def main(scale_factor: float | None = None, seed: int | None = None, workers: int | None = None) -> dict:
+    config = get_config("data_generation")
+    scale_factor = float(scale_factor if scale_factor is not None else config.get("scale_factor", 1))
+    seed = int(seed if seed is not None else config.get("seed", DEFAULT_SEED))
+    workers = int(workers if workers is not None else config.get("workers", 1)) or (os.cpu_count() or 1)
+    shard_size = int(config.get("shard_size", 1_000_000))
+    start_date = date.fromisoformat(str(config.get("start_date", "2024-01-01")))
+    end_date = date.fromisoformat(str(config.get("end_date", "2024-12-31")))
+    num_customers = _scaled(config.get("customers", 100), scale_factor)
+    num_products = _scaled(config.get("products", 50), scale_factor)
+    num_transactions = _scaled(config.get("transactions", 200), scale_factor)
+
+    started = time.perf_counter()
+    customers = generate_customers(num_customers, _stream_rng(seed, CUSTOMER_STREAM), end_date=end_date, seed=seed)
+    products = generate_products(num_products, _stream_rng(seed, PRODUCT_STREAM), seed=seed)
     customers.to_csv(RAW_PATH / "customers.csv", index=False)
     products.to_csv(RAW_PATH / "products.csv", index=False)
-    transactions.to_csv(RAW_PATH / "transactions.csv", index=False)
-    items.to_csv(RAW_PATH / "transaction_items.csv", index=False)
 
+    # Split the transaction id space into fixed-size shards. A first cheap pass
+    # counts each shard's items so item ids can be assigned without overlaps.
+    shard_dir = RAW_PATH / "shards"
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    sizes = [min(shard_size, num_transactions - offset) for offset in range(0, num_transactions, shard_size)]
+    item_counts = _run_tasks(_count_shard_items, [(seed, shard, size) for shard, size in enumerate(sizes)], workers)
+    item_offsets = np.concatenate([[0], np.cumsum(item_counts)[:-1]]).astype(int)
+    tasks = [
+        {
+            "shard": shard,
+            "seed": seed,
+            "size": size,
+            "transaction_start_id": shard * shard_size + 1,
+            "item_start_id": int(item_offsets[shard]) + 1,
+            "num_customers": num_customers,
+            "num_products": num_products,
+            "start_date": start_date,
+            "end_date": end_date,
+            "out_dir": str(shard_dir),
+        }
+        for shard, size in enumerate(sizes)
+    ]
+    manifest = {"seed": seed, "scale_factor": scale_factor, "shard_size": shard_size,
+                "shards": _run_tasks(generate_shard, [(task,) for task in tasks], workers)}
+    with open(shard_dir / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=4)
+    if config.get("merge_shards", True):
+        merge_shards(manifest, shard_dir, RAW_PATH)
+
+    validation = {"customer_fk_valid": True, "product_fk_valid": True, "transaction_fk_valid": True}
+    for entry in manifest["shards"]:
+        validation = {key: validation[key] and value for key, value in entry["validation"].items()}
+
+    elapsed = time.perf_counter() - started
+    item_count = int(sum(item_counts))
+    record_rows(rows_out=num_customers + num_products + num_transactions + item_count)
     metadata = {
         "generated_at": datetime.utcnow().isoformat(),
-        "validation": validate_referential_integrity(customers, products, transactions, items)
+        "seed": seed,
+        "scale_factor": scale_factor,
+        "workers": workers,
+        "shards": len(sizes),
+        "row_counts": {
+            "customers": num_customers,
+            "products": num_products,
+            "transactions": num_transactions,
+            "transaction_items": item_count,
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rows_per_sec": {
+            "transactions": round(num_transactions / elapsed, 2) if elapsed else None,
+            "transaction_items": round(item_count / elapsed, 2) if elapsed else None,
+        },
+        "validation": validation,
     }
 
     with open(RAW_PATH / "generation_metadata.json", "w") as f:
         json.dump(metadata, f, indent=4)
+    return metadata
+
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate synthetic e-commerce CSVs in data/raw/.")
+    parser.add_argument("--scale-factor", type=float, help="multiplier applied to the data_generation counts")
+    parser.add_argument("--seed", type=int, help="random seed; the same seed and scale factor give identical files")
+    parser.add_argument("--workers", type=int, help="processes generating shards in parallel (0 = all cores)")
+    args = parser.parse_args()
+    print(main(args.scale_factor, args.seed, args.workers))
@@ -1,14 +1,30 @@
+import copy
 import os
+import threading
+import time
+from functools import lru_cache
 from pathlib import Path
 
-import psycopg2
 import yaml
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
 
+from scripts.telemetry import TimedCursor
 
-def _load_env() -> None:
-    load_dotenv()
+CONFIG_PATH = Path("config/config.yaml")
+
+_engine = None
+_engine_lock = threading.Lock()
+_metrics_lock = threading.Lock()
+_pool_metrics = {
+    "checkouts": 0,
+    "checkins": 0,
+    "connections_opened": 0,
+    "wait_seconds_total": 0.0,
+    "wait_seconds_max": 0.0,
+    "timeouts": 0,
+}
 
 
 def _resolve_env(value: str) -> str:
@@ -18,41 +34,143 @@ def _resolve_env(value: str) -> str:
     return value
 
 
+@lru_cache(maxsize=None)
+def _load_raw_config() -> dict:
+    load_dotenv()
+    if CONFIG_PATH.exists():
+        with CONFIG_PATH.open("r", encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
+    return {}
+
+
+def get_config(section: str | None = None) -> dict:
+    """Return the parsed config.yaml (or one section of it).
+
+    The file is read and `.env` is loaded once per process; callers get a copy
+    so they can't mutate the cached config.
+    """
+    raw = _load_raw_config()
+    if section is not None:
+        raw = raw.get(section) or {}
+    return copy.deepcopy(raw)
+
+
+def reload_config() -> None:
+    """Drop the cached config so the next call re-reads config.yaml and `.env`."""
+    _load_raw_config.cache_clear()
+    get_db_config.cache_clear()
+
+
+@lru_cache(maxsize=None)
 def get_db_config() -> dict:
-    _load_env()
-    config_path = Path("config/config.yaml")
-    config = {}
-    if config_path.exists():
-        with config_path.open("r", encoding="utf-8") as f:
-            raw = yaml.safe_load(f) or {}
-            config = raw.get("database", {})
+    config = get_config("database")
     return {
         "host": os.getenv("DB_HOST", _resolve_env(config.get("host", "localhost"))),
         "port": int(os.getenv("DB_PORT", _resolve_env(config.get("port", "5432")) or 5432)),
         "name": os.getenv("DB_NAME", _resolve_env(config.get("name", "ecommerce_db"))),
         "user": os.getenv("DB_USER", _resolve_env(config.get("user", "postgres"))),
         "password": os.getenv("DB_PASSWORD", _resolve_env(config.get("password", "postgres"))),
+        "pool_size": int(config.get("pool_size", 5)),
+        "max_overflow": int(config.get("max_overflow", 10)),
+        "pool_recycle": int(config.get("pool_recycle_seconds", 1800)),
+        "pool_timeout": int(config.get("pool_timeout_seconds", 30)),
     }
 
 
-def get_connection():
-    cfg = get_db_config()
-    return psycopg2.connect(
-        host=cfg["host"],
-        port=cfg["port"],
-        database=cfg["name"],
-        user=cfg["user"],
-        password=cfg["password"],
-    )
+class _InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with _metrics_lock:
+                _pool_metrics["timeouts"] += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with _metrics_lock:
+                _pool_metrics["wait_seconds_total"] += waited
+                _pool_metrics["wait_seconds_max"] = max(_pool_metrics["wait_seconds_max"], waited)
+
+
+def _count(metric: str):
+    def listener(*_args):
+        with _metrics_lock:
+            _pool_metrics[metric] += 1
+
+    return listener
 
 
 def get_engine():
-    cfg = get_db_config()
-    url = (
-        f"postgresql://{cfg['user']}:{cfg['password']}@"
-        f"{cfg['host']}:{cfg['port']}/{cfg['name']}"
-    )
-    return create_engine(url)
+    """Return the process-wide SQLAlchemy engine, creating its pool on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                cfg = get_db_config()
+                engine = create_engine(
+                    get_connection_string(),
+                    poolclass=_InstrumentedQueuePool,
+                    pool_size=cfg["pool_size"],
+                    max_overflow=cfg["max_overflow"],
+                    pool_recycle=cfg["pool_recycle"],
+                    pool_timeout=cfg["pool_timeout"],
+                    pool_pre_ping=True,
+                    connect_args={"cursor_factory": TimedCursor},
+                )
+                event.listen(engine, "connect", _count("connections_opened"))
+                event.listen(engine, "checkout", _count("checkouts"))
+                event.listen(engine, "checkin", _count("checkins"))
+                _engine = engine
+    return _engine
+
+
+def get_connection():
+    """Check a DBAPI (psycopg2) connection out of the shared pool.
+
+    Calling ``close()`` on the returned connection hands it back to the pool.
+    """
+    return get_engine().raw_connection()
+
+
+def get_pool_metrics() -> dict:
+    with _metrics_lock:
+        metrics = dict(_pool_metrics)
+    metrics["wait_seconds_total"] = round(metrics["wait_seconds_total"], 6)
+    metrics["wait_seconds_max"] = round(metrics["wait_seconds_max"], 6)
+    if _engine is not None:
+        pool = _engine.pool
+        metrics.update(
+            pool_size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+        )
+    return metrics
+
+
+def dispose_engine() -> None:
+    """Close every pooled connection and forget the shared engine."""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+
+
+def _after_fork_in_child() -> None:
+    # A forked worker must not reuse sockets owned by the parent's pool.
+    global _engine_lock, _metrics_lock
+    _engine_lock = threading.Lock()
+    _metrics_lock = threading.Lock()
+    if _engine is not None:
+        _engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
 
 
 def get_connection_string():
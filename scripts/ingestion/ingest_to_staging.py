@@ -1,16 +1,61 @@
+import io
 import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 import pandas as pd
 from psycopg2.extras import execute_values
-from sqlalchemy import text
 
-from scripts.db_connection import get_connection, get_engine
+from scripts.db_connection import get_config, get_connection
+from scripts.pipeline_state import STAGING_DATASET, bump_data_version, ensure_state_tables
+from scripts.telemetry import record_rows
 
 RAW_PATH = Path("data/raw")
 OUT_PATH = Path("data/staging")
 OUT_PATH.mkdir(exist_ok=True)
 
+STAGING_FILES = {
+    "customers.csv": "staging.customers",
+    "products.csv": "staging.products",
+    "transactions.csv": "staging.transactions",
+    "transaction_items.csv": "staging.transaction_items",
+}
+
+# Target column types for each staging table, in table column order.
+STAGING_COLUMNS = {
+    "staging.customers": {
+        "customer_id": "int",
+        "first_name": "text",
+        "last_name": "text",
+        "email": "text",
+        "gender": "text",
+        "signup_date": "date",
+    },
+    "staging.products": {
+        "product_id": "int",
+        "product_name": "text",
+        "category": "text",
+        "price": "numeric",
+    },
+    "staging.transactions": {
+        "transaction_id": "int",
+        "customer_id": "int",
+        "transaction_date": "date",
+        "payment_method": "text",
+        "total_amount": "numeric",
+    },
+    "staging.transaction_items": {
+        "transaction_item_id": "int",
+        "transaction_id": "int",
+        "product_id": "int",
+        "quantity": "int",
+        "unit_price": "numeric",
+    },
+}
+
+
 def bulk_insert_data(df: pd.DataFrame, table_name: str, connection) -> int:
     """Bulk insert a dataframe into a target table."""
     if df.empty:
@@ -23,11 +68,177 @@ def bulk_insert_data(df: pd.DataFrame, table_name: str, connection) -> int:
         connection.commit()
     return len(df)
 
+
+def coerce_chunk(df: pd.DataFrame, column_types: dict) -> pd.DataFrame:
+    """Map CSV columns onto the staging columns and coerce them to the target types.
+
+    Columns missing from the CSV are filled with nulls, extra CSV columns are
+    dropped, and values that cannot be parsed become nulls instead of failing
+    the whole COPY.
+    """
+    out = pd.DataFrame(index=df.index)
+    for column, kind in column_types.items():
+        values = df[column] if column in df.columns else pd.Series(None, index=df.index, dtype="object")
+        if kind == "int":
+            numbers = pd.to_numeric(values, errors="coerce")
+            # "1.5" is not an id: null it rather than rounding it onto another row's key.
+            out[column] = numbers.where(numbers % 1 == 0).astype("Int64")
+        elif kind == "numeric":
+            out[column] = pd.to_numeric(values, errors="coerce").round(2)
+        elif kind == "date":
+            # ISO8601 parses each value on its own; an inferred format would null rows in any other layout.
+            out[column] = pd.to_datetime(values, errors="coerce", format="ISO8601").dt.strftime("%Y-%m-%d")
+        else:
+            out[column] = values.astype("string")
+    return out
+
+
+def copy_chunk(df: pd.DataFrame, table_name: str, connection) -> int:
+    """Stream a dataframe chunk into a table with COPY ... FROM STDIN."""
+    if df.empty:
+        return 0
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False, na_rep="")
+    buffer.seek(0)
+    cols = ",".join(df.columns)
+    with connection.cursor() as cur:
+        cur.copy_expert(f"COPY {table_name} ({cols}) FROM STDIN WITH (FORMAT csv)", buffer)
+    return len(df)
+
+
+class _ByteRangeReader(io.RawIOBase):
+    """Read-only view over the bytes ``[start, end)`` of a file."""
+
+    def __init__(self, path, start: int, end: int):
+        self._file = open(path, "rb")
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._remaining <= 0:
+            return 0
+        view = memoryview(buffer)[: self._remaining]
+        read = self._file.readinto(view)
+        self._remaining -= read
+        return read
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+def read_csv_header(csv_path) -> list:
+    """Return the column names from the first line of a CSV."""
+    with open(csv_path, "r", encoding="utf-8") as f:
+        return f.readline().strip().split(",")
+
+
+def plan_shards(csv_path, shard_bytes: int) -> list:
+    """Split a CSV body into line-aligned ``(start, end)`` byte ranges of roughly ``shard_bytes``."""
+    size = os.path.getsize(csv_path)
+    with open(csv_path, "rb") as f:
+        f.readline()
+        data_start = f.tell()
+        boundaries = [data_start]
+        position = data_start
+        while shard_bytes > 0 and position + shard_bytes < size:
+            f.seek(position + shard_bytes)
+            f.readline()
+            position = f.tell()
+            if position >= size:
+                break
+            boundaries.append(position)
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+
+def copy_csv_to_staging(
+    csv_path: str,
+    table_name: str,
+    connection,
+    chunk_size: int = 100_000,
+    byte_range: tuple | None = None,
+) -> dict:
+    """Stream a CSV (or one byte-range shard of it) into staging using COPY."""
+    column_types = STAGING_COLUMNS[table_name]
+    start = time.perf_counter()
+    rows = 0
+    options = {"usecols": lambda c: c in column_types, "dtype": str, "chunksize": chunk_size}
+    if byte_range is None:
+        source = csv_path
+    else:
+        options.update(header=None, names=read_csv_header(csv_path))
+        source = io.BufferedReader(_ByteRangeReader(csv_path, *byte_range))
+    try:
+        for chunk in pd.read_csv(source, **options):
+            rows += copy_chunk(coerce_chunk(chunk, column_types), table_name, connection)
+    finally:
+        if byte_range is not None:
+            source.close()
+    connection.commit()
+    return _load_summary(table_name, rows, time.perf_counter() - start, "copy")
+
+
+def _copy_shard(csv_path: str, table_name: str, byte_range: tuple, chunk_size: int) -> dict:
+    """Worker entry point: load one shard over a connection owned by the worker."""
+    conn = get_connection()
+    try:
+        result = copy_csv_to_staging(csv_path, table_name, conn, chunk_size, byte_range)
+    finally:
+        conn.close()
+    result["byte_range"] = list(byte_range)
+    return result
+
+
+def ingest_parallel(files: dict, workers: int, shard_bytes: int, chunk_size: int, executor: str = "process") -> list:
+    """Load several CSVs concurrently, splitting large files into byte-range shards.
+
+    Every shard is loaded by its own worker and connection, so wall-clock time is
+    bounded by the number of workers rather than the total row count.
+    """
+    pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    started = time.perf_counter()
+    tables = {}
+    with pool_class(max_workers=workers) as pool:
+        futures = {}
+        for csv_path, table_name in files.items():
+            tables[table_name] = {"shards": [], "finished": started}
+            for byte_range in plan_shards(csv_path, shard_bytes):
+                futures[pool.submit(_copy_shard, str(csv_path), table_name, byte_range, chunk_size)] = table_name
+        for future in as_completed(futures):
+            table_name = futures[future]
+            tables[table_name]["shards"].append(future.result())
+            tables[table_name]["finished"] = time.perf_counter()
+
+    summary = []
+    for table_name, state in tables.items():
+        rows = sum(shard["rows_loaded"] for shard in state["shards"])
+        result = _load_summary(table_name, rows, state["finished"] - started, "copy")
+        result["shards"] = len(state["shards"])
+        summary.append(result)
+    return summary
+
+
 def load_csv_to_staging(csv_path: str, table_name: str, connection) -> dict:
     """Load a CSV into staging and return a summary."""
+    start = time.perf_counter()
     df = pd.read_csv(csv_path)
     rows = bulk_insert_data(df, table_name, connection)
-    return {"table": table_name, "rows_loaded": rows}
+    return _load_summary(table_name, rows, time.perf_counter() - start, "execute_values")
+
+
+def _load_summary(table_name: str, rows: int, seconds: float, method: str) -> dict:
+    return {
+        "table": table_name,
+        "rows_loaded": rows,
+        "method": method,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds, 2) if seconds > 0 else None,
+    }
+
 
 def validate_staging_load(connection) -> dict:
     """Return row counts for staging tables after load."""
@@ -38,33 +249,44 @@ def validate_staging_load(connection) -> dict:
             result[table] = cur.fetchone()[0]
     return result
 
-def main():
-    conn = get_connection()
-    engine = get_engine()
-    
-    # Truncate staging tables before loading
-    with engine.begin() as db_conn:
-        for table in ["customers", "products", "transactions", "transaction_items"]:
-            db_conn.execute(text(f"TRUNCATE TABLE staging.{table} CASCADE"))
-    
-    summary = []
 
-    mapping = {
-        "customers.csv": "staging.customers",
-        "products.csv": "staging.products",
-        "transactions.csv": "staging.transactions",
-        "transaction_items.csv": "staging.transaction_items"
-    }
+def truncate_staging_tables(connection, tables: list) -> None:
+    """Empty the given staging tables in a single statement."""
+    with connection.cursor() as cur:
+        cur.execute(f"TRUNCATE TABLE {', '.join(tables)} CASCADE")
+    connection.commit()
 
-    for csv, table in mapping.items():
-        summary.append(load_csv_to_staging(RAW_PATH / csv, table, conn))
+
+def main(method: str | None = None):
+    config = get_config("ingestion")
+    method = method or config.get("method", "copy")
+    chunk_size = int(config.get("chunk_size", 100_000))
+    workers = int(config.get("workers") or os.cpu_count() or 1)
+    shard_bytes = int(float(config.get("shard_size_mb", 64)) * 1024 * 1024)
+
+    files = {RAW_PATH / csv: table for csv, table in STAGING_FILES.items()}
+
+    conn = get_connection()
+    truncate_staging_tables(conn, list(files.values()))
+
+    if method == "copy":
+        summary = ingest_parallel(files, workers, shard_bytes, chunk_size, config.get("executor", "process"))
+        # Shards load in worker processes whose cursors report to no task, so count rows here.
+        record_rows(rows_out=sum(result["rows_loaded"] for result in summary))
+    else:
+        summary = [load_csv_to_staging(csv_path, table, conn) for csv_path, table in files.items()]
 
     summary.append(validate_staging_load(conn))
+    ensure_state_tables(conn)
+    bump_data_version(conn, STAGING_DATASET)
+    conn.commit()
 
     with open(OUT_PATH / "ingestion_summary.json", "w") as f:
         json.dump(summary, f, indent=4)
 
     conn.close()
+    return summary
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,253 @@
+"""Micro-batch mode: load raw files as they land instead of rerunning everything on a schedule.
+
+Producers drop CSVs named after their staging table (``transactions_<anything>.csv``,
+``transaction_items_<anything>.csv``, ...) into the landing directory. Each poll
+takes the settled files that are not yet in the manifest, up to
+``pipeline.batch_size`` files and ``max_batch_mb``. It loads them into an emptied
+staging schema, upserts that delta into production and runs the incremental
+warehouse load. Files are recorded in the manifest only after the whole batch
+succeeded. The manifest is keyed on name, size and modification time, so a later
+drop that reuses a file name is loaded again.
+
+Every stage is idempotent, so a failed batch is simply retried, one file at a
+time so that a bad file cannot hold back the rest. A file that fails
+``max_attempts`` times on its own is moved to ``failed_dir`` (``<landing>/failed``)
+and recorded as failed.
+
+When more than ``max_pending_files`` are waiting, a ``_PAUSE`` marker is written to
+the landing directory for producers to honour, and batches run back to back until
+the backlog drops below ``resume_pending_files``.
+"""
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+
+from scripts.checkpoints import file_digest
+from scripts.db_connection import get_config, get_connection
+from scripts.ingestion.ingest_to_staging import STAGING_FILES, copy_csv_to_staging, truncate_staging_tables
+from scripts.transformation import load_warehouse, staging_to_production
+
+logger = logging.getLogger(__name__)
+
+LANDING_DIR = Path("data/landing")
+MANIFEST_PATH = Path("data/processed/landing_manifest.json")
+PAUSE_MARKER = "_PAUSE"
+
+# File-name prefix -> staging table; longest prefix first so transaction_items wins over transactions.
+LANDING_TABLES = dict(sorted(
+    ((csv.removesuffix(".csv"), table) for csv, table in STAGING_FILES.items()),
+    key=lambda item: -len(item[0]),
+))
+
+
+def table_for(path: Path) -> str | None:
+    for prefix, table in LANDING_TABLES.items():
+        if path.name.startswith(prefix):
+            return table
+    return None
+
+
+def file_key(path: Path) -> str:
+    """Manifest key: a file that is replaced under the same name gets a new key."""
+    stat = path.stat()
+    return f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def load_manifest(path: Path | None = None) -> dict:
+    path = path or MANIFEST_PATH
+    if not path.exists():
+        return {"batches": 0, "files": {}, "attempts": {}}
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    manifest.setdefault("attempts", {})
+    return manifest
+
+
+def save_manifest(manifest: dict, path: Path | None = None) -> None:
+    path = path or MANIFEST_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=4, default=str), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def pending_files(landing_dir: Path, manifest: dict, settle_seconds: float = 2, now: float | None = None) -> list:
+    """Landed CSVs not yet in the manifest, oldest first.
+
+    Files modified within the last ``settle_seconds`` may still be being written
+    and are left for a later poll.
+    """
+    if not landing_dir.exists():
+        return []
+    now = time.time() if now is None else now
+    files = []
+    for path in landing_dir.glob("*.csv"):
+        stat = path.stat()
+        if file_key(path) not in manifest["files"] and now - stat.st_mtime >= settle_seconds:
+            files.append((stat.st_mtime, path.name, path, stat.st_size))
+    return [(path, size) for _, _, path, size in sorted(files)]
+
+
+def plan_batch(pending: list, max_files: int, max_bytes: int) -> list:
+    """Take files in landing order until either limit is reached; always at least one."""
+    batch, total = [], 0
+    for path, size in pending:
+        if batch and (len(batch) >= max_files or total + size > max_bytes):
+            break
+        batch.append((path, size))
+        total += size
+    return batch
+
+
+def update_backpressure(landing_dir: Path, backlog: int, high: int, low: int) -> bool:
+    """Raise the pause marker above ``high`` pending files and clear it below ``low``."""
+    marker = landing_dir / PAUSE_MARKER
+    if backlog > high and not marker.exists():
+        logger.warning("Landing backlog of %s files exceeds %s; pausing producers", backlog, high)
+        landing_dir.mkdir(parents=True, exist_ok=True)
+        marker.write_text(json.dumps({"backlog": backlog, "since": datetime.utcnow().isoformat()}), encoding="utf-8")
+    elif backlog < low and marker.exists():
+        logger.info("Landing backlog down to %s files; resuming producers", backlog)
+        marker.unlink()
+    return marker.exists()
+
+
+def quarantine(path: Path, failed_dir: Path) -> Path:
+    failed_dir.mkdir(parents=True, exist_ok=True)
+    target = failed_dir / path.name
+    if target.exists():
+        target = failed_dir / f"{path.stem}.{time.time_ns()}{path.suffix}"
+    shutil.move(str(path), target)
+    return target
+
+
+def record_failure(manifest: dict, batch: list, error: Exception, max_attempts: int, failed_dir: Path) -> list:
+    """Count a failed attempt for every file in ``batch``; quarantine a lone file that is out of attempts.
+
+    Only a single-file batch can be blamed on its file, so files from a larger
+    failed batch are merely counted and retried one at a time. Returns the
+    quarantined file names.
+    """
+    quarantined = []
+    for path, size in batch:
+        key = file_key(path)
+        attempts = manifest["attempts"].get(key, 0) + 1
+        if len(batch) > 1 or attempts < max_attempts:
+            manifest["attempts"][key] = attempts
+            continue
+        del manifest["attempts"][key]
+        target = quarantine(path, failed_dir)
+        logger.error("Quarantined %s to %s after %s failed attempts: %s", path.name, target, attempts, error)
+        manifest["files"][key] = {
+            "status": "failed",
+            "table": table_for(path),
+            "bytes": size,
+            "attempts": attempts,
+            "error": str(error),
+            "quarantined_to": str(target),
+            "recorded_at": datetime.utcnow().isoformat(),
+        }
+        quarantined.append(path.name)
+    return quarantined
+
+
+def process_batch(files: dict, chunk_size: int = 100_000) -> dict:
+    """Load ``{path: staging table}`` through staging, production and the warehouse."""
+    started = time.perf_counter()
+    conn = get_connection()
+    try:
+        truncate_staging_tables(conn, list(STAGING_FILES.values()))
+        staged = [copy_csv_to_staging(str(path), table, conn, chunk_size) for path, table in files.items()]
+        production = staging_to_production.run_pushdown_delta(conn)
+    finally:
+        conn.close()
+    # Reload facts from the batch's oldest transaction, even if it predates the late-arrival window.
+    warehouse = load_warehouse.main(since=production["min_transaction_date"])
+    return {
+        "rows_staged": sum(result["rows_loaded"] for result in staged),
+        "production": production["summary"],
+        "fact_window_from": production["min_transaction_date"],
+        "warehouse_version": warehouse.get("publish_version"),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def run_once(config: dict | None = None, manifest_path: Path | None = None) -> dict:
+    """Process at most one batch; returns what was done and the remaining backlog."""
+    config = config if config is not None else get_config("pipeline")
+    settings = config.get("micro_batch") or {}
+    landing_dir = Path(settings.get("landing_dir", LANDING_DIR))
+    max_files = int(config.get("batch_size", 500))
+    max_bytes = int(float(settings.get("max_batch_mb", 256)) * 1024 * 1024)
+
+    manifest = load_manifest(manifest_path)
+    pending = pending_files(landing_dir, manifest, float(settings.get("settle_seconds", 2)))
+    unknown = [(path, size) for path, size in pending if table_for(path) is None]
+    for path, size in unknown:
+        logger.warning("Ignoring landed file %s: no staging table matches its name", path.name)
+        manifest["files"][file_key(path)] = {"status": "ignored", "bytes": size, "recorded_at": datetime.utcnow().isoformat()}
+    pending = [item for item in pending if item not in unknown]
+
+    # Files from a failed batch go through alone until they succeed or are quarantined.
+    retrying = [item for item in pending if file_key(item[0]) in manifest["attempts"]]
+    batch = retrying[:1] or plan_batch(pending, max_files, max_bytes)
+    summary = {"files": [path.name for path, _ in batch], "backlog": len(pending) - len(batch)}
+    if batch:
+        try:
+            result = process_batch({path: table_for(path) for path, _ in batch}, int(settings.get("chunk_size", 100_000)))
+        except Exception as exc:
+            failed_dir = Path(settings.get("failed_dir", landing_dir / "failed"))
+            quarantined = record_failure(manifest, batch, exc, int(settings.get("max_attempts", 3)), failed_dir)
+            save_manifest(manifest, manifest_path)
+            if not quarantined:
+                raise
+            # The bad file is out of the way; the next poll carries on with the rest.
+            summary["quarantined"] = quarantined
+        else:
+            manifest["batches"] += 1
+            processed_at = datetime.utcnow().isoformat()
+            for path, size in batch:
+                manifest["attempts"].pop(file_key(path), None)
+                manifest["files"][file_key(path)] = {
+                    "status": "processed",
+                    "table": table_for(path),
+                    "bytes": size,
+                    "sha256": file_digest(path),
+                    "batch": manifest["batches"],
+                    "processed_at": processed_at,
+                }
+            summary.update(result, batch=manifest["batches"])
+    if batch or unknown:
+        save_manifest(manifest, manifest_path)
+
+    summary["paused"] = update_backpressure(
+        landing_dir,
+        summary["backlog"],
+        int(settings.get("max_pending_files", 2000)),
+        int(settings.get("resume_pending_files", 500)),
+    )
+    return summary
+
+
+def run(config: dict | None = None) -> None:
+    """Poll the landing directory forever. Batches run back to back while a backlog remains."""
+    config = config if config is not None else get_config("pipeline")
+    poll_seconds = float((config.get("micro_batch") or {}).get("poll_seconds", 5))
+    failures = 0
+    while True:
+        try:
+            summary = run_once(config)
+            failures = 0
+        except Exception:
+            failures += 1
+            delay = min(poll_seconds * 2 ** failures, 300)
+            logger.exception("Micro-batch failed (%s in a row); retrying in %ss", failures, delay)
+            time.sleep(delay)
+            continue
+        if "batch" in summary:
+            logger.info("Batch %s: %s files in %ss, %s pending", summary["batch"], len(summary["files"]), summary["seconds"], summary["backlog"])
+        if not summary["backlog"]:
+            time.sleep(poll_seconds)
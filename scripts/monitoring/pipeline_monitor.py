@@ -1,30 +1,217 @@
+"""Cheap pipeline monitoring with a time-series history.
+
+Each run reads row estimates and table sizes from ``pg_class`` and
+``pg_stat_user_tables`` and runs the indexed ``MAX()`` freshness probes in
+``monitoring_queries.sql``; exact ``COUNT(*)``s only run with ``--exact``. Every
+sample is appended as one line to ``history.jsonl``, so trends and anomalies
+are computed from the history without touching the database again. Only the
+tail of the history is read, and it is pruned to ``history_retention_samples``
+samples no older than ``history_retention_days``.
+"""
+import argparse
 import json
-from datetime import datetime
+import logging
+import os
+import statistics
+from datetime import date, datetime, timedelta
 from pathlib import Path
 
-from scripts.db_connection import get_connection
+from scripts.db_connection import get_config, get_connection
+from scripts.sql_queries import load_named_queries
 
+logger = logging.getLogger(__name__)
 
 REPORT_PATH = Path("data/processed")
 REPORT_PATH.mkdir(parents=True, exist_ok=True)
+QUERIES_PATH = Path("sql/queries/monitoring_queries.sql")
+HISTORY_PATH = REPORT_PATH / "monitoring" / "history.jsonl"
+TAIL_BLOCK_BYTES = 64 * 1024
+
+
+def _scalar(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if value is None or isinstance(value, (int, str)):
+        return value
+    return float(value)
+
+
+def collect_stats(connection, queries: dict) -> dict:
+    """Per-table estimates: ``{table: {"rows", "dead_rows", "bytes", ...}}``."""
+    with connection.cursor() as cur:
+        cur.execute(queries["table_stats"])
+        columns = [column[0] for column in cur.description]
+        rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+    return {
+        row["table_name"]: {
+            "rows": int(row["estimated_rows"]),
+            "dead_rows": row["dead_rows"],
+            "inserted": row["rows_inserted"],
+            "changed": row["rows_changed"],
+            "bytes": row["total_bytes"],
+            "analyzed": _scalar(row["last_analyzed"]),
+        }
+        for row in rows
+    }
+
+
+def run_probes(connection, queries: dict, prefix: str = "freshness_") -> dict:
+    """Run every query named ``<prefix><probe>``; a probe whose table is missing reports None."""
+    results = {}
+    for name, sql in queries.items():
+        if not name.startswith(prefix):
+            continue
+        probe = name.removeprefix(prefix)
+        try:
+            with connection.cursor() as cur:
+                cur.execute(sql)
+                results[probe] = _scalar(cur.fetchone()[0])
+        except Exception as exc:
+            connection.rollback()
+            logger.warning("Monitoring probe %s failed: %s", name, exc)
+            results[probe] = None
+    return results
+
+
+def exact_counts(connection, tables: list) -> dict:
+    """Exact row counts; full scans, so only run on demand."""
+    counts = {}
+    with connection.cursor() as cur:
+        for table in tables:
+            cur.execute(f"SELECT COUNT(*) FROM {table}")
+            counts[table] = cur.fetchone()[0]
+    return counts
+
+
+def append_sample(sample: dict, path: Path | None = None) -> None:
+    path = path or HISTORY_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(sample, separators=(",", ":"), default=str) + "\n")
+
+
+def _tail_lines(path: Path, count: int) -> tuple:
+    """The last ``count`` lines of ``path``, read backwards in blocks, and whether that is every line."""
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        data = b""
+        # One newline more than needed, so the first, possibly partial, line can be dropped.
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(TAIL_BLOCK_BYTES, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lines = [line for line in data.decode("utf-8", errors="replace").splitlines() if line.strip()]
+    return lines[-count:], position == 0 and len(lines) <= count
 
 
-def _load_queries() -> list:
-    query_path = Path("sql/queries/monitoring_queries.sql")
-    if not query_path.exists():
+def load_history(path: Path | None = None, limit: int | None = None) -> list:
+    """The last ``limit`` samples (all of them by default), oldest first; only the tail is read."""
+    path = path or HISTORY_PATH
+    if not path.exists():
         return []
-    content = query_path.read_text(encoding="utf-8")
-    return [q.strip() for q in content.split(";") if q.strip()]
+    if not limit:
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    return [json.loads(line) for line in _tail_lines(path, limit)[0]]
 
 
-def run_monitoring() -> dict:
+def prune_history(path: Path, keep: int, max_age_days: float | None = None, now: datetime | None = None) -> bool:
+    """Keep the newest ``keep`` samples younger than ``max_age_days``.
+
+    Reads only those samples, and rewrites the file (atomically) only when
+    something is dropped; returns whether it was.
+    """
+    if not path.exists():
+        return False
+    lines, whole = _tail_lines(path, keep)
+    kept = lines
+    if max_age_days:
+        cutoff = (now or datetime.utcnow()) - timedelta(days=float(max_age_days))
+        kept = [line for line in lines if datetime.fromisoformat(json.loads(line)["timestamp"]) >= cutoff]
+    if whole and len(kept) == len(lines):
+        return False
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text("".join(line + "\n" for line in kept), encoding="utf-8")
+    os.replace(tmp, path)
+    return True
+
+
+def trend(history: list, table: str) -> list:
+    """``(timestamp, estimated rows, bytes)`` for one table across the history."""
+    return [
+        (sample["timestamp"], sample["tables"][table]["rows"], sample["tables"][table]["bytes"])
+        for sample in history
+        if table in sample["tables"]
+    ]
+
+
+def detect_anomalies(history: list, sample: dict, config: dict) -> list:
+    """Compare a new sample against the recent history.
+
+    Flags tables that shrank by more than ``row_drop_pct`` (schemas in
+    ``ignore_drops`` are rebuilt every run and skipped), tables that grew more
+    than ``spike_factor`` times their median growth, freshness probes that went
+    backwards, and a warehouse last published over ``max_staleness_hours`` ago.
+    """
+    anomalies = []
+    ignore_drops = tuple(f"{schema}." for schema in config.get("ignore_drops", ["staging"]))
+    row_drop = float(config.get("row_drop_pct", 10)) / 100
+    spike_factor = float(config.get("spike_factor", 5))
+    previous = history[-1] if history else None
+
+    for table, stats in sample["tables"].items():
+        series = [past["tables"][table]["rows"] for past in history if table in past["tables"]]
+        if not series:
+            continue
+        last, rows = series[-1], stats["rows"]
+        if last and rows < last * (1 - row_drop) and not table.startswith(ignore_drops):
+            anomalies.append({"type": "row_drop", "table": table, "previous": last, "current": rows})
+        growth = [b - a for a, b in zip(series, series[1:]) if b > a]
+        if len(growth) >= 3 and rows - last > spike_factor * statistics.median(growth):
+            anomalies.append({
+                "type": "row_spike",
+                "table": table,
+                "growth": rows - last,
+                "median_growth": statistics.median(growth),
+            })
+
+    for probe, value in sample["freshness"].items():
+        before = previous["freshness"].get(probe) if previous else None
+        if value is not None and before is not None and value < before:
+            anomalies.append({"type": "freshness_regressed", "probe": probe, "previous": before, "current": value})
+
+    lag_hours = sample.get("lag_hours", {}).get("warehouse_published")
+    max_hours = float(config.get("max_staleness_hours", 26))
+    if lag_hours is not None and lag_hours > max_hours:
+        anomalies.append({"type": "stale_warehouse", "lag_hours": round(lag_hours, 1), "limit_hours": max_hours})
+    return anomalies
+
+
+def run_monitoring(exact: bool = False) -> dict:
+    config = get_config("monitoring")
+    history_path = Path(config.get("history_path", HISTORY_PATH))
+    queries = load_named_queries(config.get("queries_path", QUERIES_PATH))
+
     connection = get_connection()
-    results = []
-    with connection.cursor() as cur:
-        for query in _load_queries():
-            cur.execute(query)
-            rows = cur.fetchall()
-            results.append({"query": query, "rows": rows})
+    sample = {"timestamp": datetime.utcnow().isoformat(), "tables": collect_stats(connection, queries)}
+    sample["freshness"] = run_probes(connection, queries)
+    sample["lag_hours"] = run_probes(connection, queries, "lag_hours_")
+    if exact:
+        sample["exact"] = exact_counts(connection, list(sample["tables"]))
+    connection.rollback()
+    connection.close()
+
+    history = load_history(history_path, int(config.get("history_window", 48)))
+    sample["anomalies"] = detect_anomalies(history, sample, config)
+    for anomaly in sample["anomalies"]:
+        logger.warning("Monitoring anomaly: %s", anomaly)
+    append_sample(sample, history_path)
+    prune_history(
+        history_path,
+        int(config.get("history_retention_samples", 10_000)),
+        config.get("history_retention_days", 90),
+    )
 
     pipeline_report = None
     report_file = REPORT_PATH / "pipeline_execution_report.json"
@@ -32,17 +219,24 @@ def run_monitoring() -> dict:
         pipeline_report = json.loads(report_file.read_text(encoding="utf-8"))
 
     report = {
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": sample["timestamp"],
         "pipeline_report": pipeline_report,
-        "monitoring_results": results,
+        "monitoring_results": sample,
     }
 
     with open(REPORT_PATH / "monitoring_report.json", "w") as f:
-        json.dump(report, f, indent=4)
+        json.dump(report, f, indent=4, default=str)
 
-    connection.close()
     return report
 
 
 if __name__ == "__main__":
-    print(run_monitoring())
+    parser = argparse.ArgumentParser(description="Sample table statistics and freshness into the monitoring history.")
+    parser.add_argument("--exact", action="store_true", help="also run exact COUNT(*) on every table (full scans)")
+    parser.add_argument("--trend", metavar="TABLE", help="print a table's row-count history instead of sampling")
+    args = parser.parse_args()
+    if args.trend:
+        history_path = Path(get_config("monitoring").get("history_path", HISTORY_PATH))
+        print(json.dumps(trend(load_history(history_path), args.trend), indent=4))
+    else:
+        print(json.dumps(run_monitoring(args.exact)["monitoring_results"], indent=4, default=str))
@@ -1,14 +1,25 @@
 import json
 import logging
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 
-import yaml
-
+from scripts.checkpoints import (
+    files_fingerprint,
+    hash_value,
+    load_checkpoints,
+    save_checkpoint,
+    stale_reason,
+    state_fingerprint,
+)
+from scripts.dag import descendants, run_dag
 from scripts.data_generation import generate_data
+from scripts.db_connection import get_config, get_pool_metrics
 from scripts.ingestion import ingest_to_staging
+from scripts.pipeline_state import PRODUCTION_DATASET, STAGING_DATASET
 from scripts.quality_checks import validate_data
-from scripts.transformation import generate_analytics, load_warehouse, staging_to_production
+from scripts.telemetry import to_prometheus
+from scripts.transformation import export_parquet, generate_analytics, load_warehouse, staging_to_production
 
 
 OUT = Path("data/processed")
@@ -16,59 +27,127 @@ OUT.mkdir(parents=True, exist_ok=True)
 
 
 def _load_pipeline_config() -> dict:
-    config_path = Path("config/config.yaml")
-    if config_path.exists():
-        with config_path.open("r", encoding="utf-8") as f:
-            return (yaml.safe_load(f) or {}).get("pipeline", {})
-    return {}
-
-
-def _run_with_retries(step_name: str, func, retries: int) -> dict:
-    last_error = None
-    for attempt in range(1, retries + 2):
-        try:
-            logging.info("Starting step %s (attempt %s)", step_name, attempt)
-            result = func()
-            logging.info("Completed step %s", step_name)
-            return {"step": step_name, "status": "success", "attempt": attempt, "result": result}
-        except Exception as exc:
-            last_error = str(exc)
-            logging.warning("Step %s failed on attempt %s: %s", step_name, attempt, last_error)
-    return {"step": step_name, "status": "failed", "error": last_error}
-
-
-def run_pipeline() -> dict:
-    config = _load_pipeline_config()
-    retries = int(config.get("retries", 0))
-    logging.basicConfig(level=config.get("logging_level", "INFO"))
+    return get_config("pipeline")
+
+
+def _config_fingerprint(*sections: str) -> dict:
+    return {section: get_config(section) for section in sections}
+
+
+def _ingestion_fingerprint() -> dict:
+    files = [ingest_to_staging.RAW_PATH / csv for csv in ingest_to_staging.STAGING_FILES]
+    return {**_config_fingerprint("ingestion"), "files": files_fingerprint(files)}
+
 
-    steps = [
-        ("data_generation", generate_data.main),
-        ("ingestion", ingest_to_staging.main),
-        ("quality_checks", validate_data.main),
-        ("transformation", staging_to_production.main),
-        ("warehouse_load", load_warehouse.main),
-        ("analytics", generate_analytics.execute_and_export),
+def _staging_fingerprint(*sections: str) -> dict:
+    return {**_config_fingerprint(*sections), "staging": state_fingerprint([STAGING_DATASET])}
+
+
+def _production_fingerprint() -> dict:
+    production = state_fingerprint([PRODUCTION_DATASET], [staging_to_production.WATERMARK_STAGE])
+    return {**_config_fingerprint("warehouse"), "production": production}
+
+
+def pipeline_tasks() -> list:
+    """The pipeline as a task graph; the warehouse stage is split per dimension, fact and aggregate.
+
+    ``fingerprint`` describes a task's inputs and ``outputs`` lists the files it
+    must leave behind; both decide whether a checkpoint can be reused.
+    """
+    raw_files = [generate_data.RAW_PATH / csv for csv in ingest_to_staging.STAGING_FILES]
+    tasks = [
+        {"name": "data_generation", "func": generate_data.main, "deps": [],
+         "fingerprint": partial(_config_fingerprint, "data_generation"), "outputs": raw_files},
+        {"name": "ingestion", "func": ingest_to_staging.main, "deps": ["data_generation"],
+         "fingerprint": _ingestion_fingerprint},
+        {"name": "quality_checks", "func": validate_data.main, "deps": ["ingestion"],
+         "fingerprint": partial(_staging_fingerprint, "quality"), "outputs": [OUT / "quality_report.json"]},
+        {"name": "transformation", "func": staging_to_production.main, "deps": ["quality_checks"],
+         "fingerprint": partial(_staging_fingerprint, "transformation")},
     ]
+    for task in load_warehouse.warehouse_tasks(deps=["transformation"]):
+        tasks.append({**task, "fingerprint": _production_fingerprint})
+    tasks.append({"name": "analytics", "func": generate_analytics.execute_and_export, "deps": ["aggregates"],
+                  "outputs": [OUT / "analytics" / "analytics_summary.json"]})
+    tasks.append({"name": "parquet_export", "func": export_parquet.main, "deps": ["aggregates"],
+                  "outputs": [export_parquet.OUTPUT_DIR / "manifest.json"]})
+    return tasks
+
+
+def plan_forced(tasks: list, from_step: str | None = None, only: list | None = None) -> set | None:
+    """Tasks a partial run must execute, or None for a normal run.
+
+    ``from_step`` runs that task and everything downstream of it; ``only`` runs
+    just the named tasks. Every other task reuses its last checkpoint.
+    """
+    names = {task["name"] for task in tasks}
+    requested = ([from_step] if from_step else []) + list(only or [])
+    unknown = set(requested) - names
+    if unknown:
+        raise ValueError(f"Unknown pipeline steps: {sorted(unknown)}; choose from {sorted(names)}")
+    if from_step:
+        return descendants(tasks, [from_step]) | set(only or [])
+    if only:
+        return set(only)
+    return None
+
+
+def run_pipeline(from_step: str | None = None, only: list | None = None, force: bool = False) -> dict:
+    """Run the task graph, resuming from checkpoints.
+
+    A task is skipped when an earlier run completed it with the same input
+    fingerprint, its outputs still exist and no upstream task ran again.
+    ``force`` ignores every checkpoint.
+    """
+    config = _load_pipeline_config()
+    logging.basicConfig(level=config.get("logging_level", "INFO"))
 
-    results = []
-    status = "success"
-    for step_name, func in steps:
-        result = _run_with_retries(step_name, func, retries)
-        results.append(result)
-        if result["status"] != "success":
-            status = "failed"
-            break
+    tasks = pipeline_tasks()
+    forced = plan_forced(tasks, from_step, only)
+    checkpoints = load_checkpoints()
+    fingerprints = {}
+
+    def reuse(task: dict, results: dict):
+        name = task["name"]
+        previous = checkpoints.get(name) or {}
+        if forced is not None and name not in forced:
+            return {"reason": "not selected", "result": previous.get("result")}
+        fingerprint = task.get("fingerprint")
+        fingerprints[name] = hash_value(fingerprint()) if fingerprint else None
+        if force or forced is not None:
+            return None
+        if any(results[dep]["status"] == "success" for dep in task.get("deps", ())):
+            return None
+        if stale_reason(checkpoints.get(name), fingerprints[name], task.get("outputs", ())):
+            return None
+        return {"reason": "inputs unchanged", "result": previous.get("result")}
+
+    def record(result: dict) -> None:
+        save_checkpoint(checkpoints, result, fingerprints.get(result["task"]))
+
+    run = run_dag(
+        tasks,
+        max_workers=int(config.get("max_parallel_tasks", 4)),
+        retries=int(config.get("retries", 0)),
+        executor=config.get("executor", "thread"),
+        reuse=reuse,
+        on_result=record,
+        profile={name: config.get("profiler", "cprofile") for name in config.get("profile_tasks") or []},
+    )
 
     report = {
         "pipeline_name": "Ecommerce Analytics ETL",
         "execution_time": datetime.utcnow().isoformat(),
-        "status": status,
-        "steps": results,
+        "status": run["status"],
+        "elapsed_seconds": run["elapsed_seconds"],
+        "critical_path": run["critical_path"],
+        "tasks": run["tasks"],
+        "db_pool": get_pool_metrics(),
     }
 
     with open(OUT / "pipeline_execution_report.json", "w") as f:
-        json.dump(report, f, indent=4)
+        json.dump(report, f, indent=4, default=str)
+    (OUT / "pipeline_metrics.prom").write_text(to_prometheus(run["tasks"]), encoding="utf-8")
 
     return report
 
@@ -0,0 +1,110 @@
+"""Pipeline state stored in the ``pipeline`` schema.
+
+``pipeline.watermarks`` holds high-water marks for incremental loads and
+``pipeline.data_versions`` a counter per published dataset, bumped whenever
+its contents change. Callers pass their own connection and commit it, so state
+only moves forward in the same transaction as the rows it describes.
+"""
+
+# Stage under which the warehouse load keeps its fact_sales and aggregates
+# watermarks, and the dataset whose version it publishes. Kept here so readers
+# such as the API and dashboard need not import the loader.
+WAREHOUSE_WATERMARK_STAGE = "load_warehouse"
+WAREHOUSE_DATASET = "warehouse"
+# Bumped by ingestion and by the production load, so checkpoints can tell when
+# those tables changed without counting their rows.
+STAGING_DATASET = "staging"
+PRODUCTION_DATASET = "production"
+
+STATE_DDL = """
+    CREATE SCHEMA IF NOT EXISTS pipeline;
+    CREATE TABLE IF NOT EXISTS pipeline.watermarks (
+        stage TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        watermark_column TEXT NOT NULL,
+        watermark_value TEXT,
+        rows_processed BIGINT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (stage, table_name)
+    );
+    CREATE TABLE IF NOT EXISTS pipeline.data_versions (
+        dataset TEXT PRIMARY KEY,
+        version BIGINT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def ensure_state_tables(connection) -> None:
+    with connection.cursor() as cur:
+        cur.execute(STATE_DDL)
+
+
+def get_watermark(connection, stage: str, table_name: str):
+    """Return the stored watermark value (as text) or None if the table was never loaded."""
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT watermark_value FROM pipeline.watermarks WHERE stage = %s AND table_name = %s",
+            (stage, table_name),
+        )
+        row = cur.fetchone()
+    return row[0] if row else None
+
+
+def set_watermark(connection, stage: str, table_name: str, column: str, value, rows_processed: int) -> None:
+    with connection.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO pipeline.watermarks (stage, table_name, watermark_column, watermark_value, rows_processed, updated_at)
+            VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+            ON CONFLICT (stage, table_name) DO UPDATE SET
+                watermark_column = EXCLUDED.watermark_column,
+                watermark_value = EXCLUDED.watermark_value,
+                rows_processed = EXCLUDED.rows_processed,
+                updated_at = EXCLUDED.updated_at
+            """,
+            (stage, table_name, column, None if value is None else str(value), rows_processed),
+        )
+
+
+def get_data_version(connection, dataset: str):
+    """Current version of a dataset, or None if it was never published."""
+    with connection.cursor() as cur:
+        cur.execute("SELECT version FROM pipeline.data_versions WHERE dataset = %s", (dataset,))
+        row = cur.fetchone()
+    return row[0] if row else None
+
+
+def bump_data_version(connection, dataset: str) -> int:
+    with connection.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO pipeline.data_versions (dataset, version, updated_at)
+            VALUES (%s, 1, CURRENT_TIMESTAMP)
+            ON CONFLICT (dataset) DO UPDATE SET
+                version = pipeline.data_versions.version + 1,
+                updated_at = EXCLUDED.updated_at
+            RETURNING version
+            """,
+            (dataset,),
+        )
+        return cur.fetchone()[0]
+
+
+def state_snapshot(connection, datasets: list, stages: list = ()) -> dict:
+    """Versions of ``datasets`` and watermarks of ``stages``; primary-key reads of the state tables."""
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT dataset, version, updated_at FROM pipeline.data_versions WHERE dataset = ANY(%s) ORDER BY dataset",
+            (list(datasets),),
+        )
+        versions = {dataset: [version, updated_at] for dataset, version, updated_at in cur.fetchall()}
+        cur.execute(
+            """
+            SELECT stage, table_name, watermark_value, updated_at FROM pipeline.watermarks
+            WHERE stage = ANY(%s) ORDER BY stage, table_name
+            """,
+            (list(stages),),
+        )
+        watermarks = {f"{stage}.{table}": [value, updated_at] for stage, table, value, updated_at in cur.fetchall()}
+    return {"versions": versions, "watermarks": watermarks}
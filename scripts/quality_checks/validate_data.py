@@ -1,69 +1,124 @@
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from scripts.db_connection import get_connection
+from scripts.db_connection import get_config, get_connection
+from scripts.telemetry import submit_in_context
 
 
 OUT = Path("data/processed")
 OUT.mkdir(parents=True, exist_ok=True)
 
-
-def check_null_values(connection, schema: str) -> dict:
-    result = {}
-    with connection.cursor() as cur:
-        cur.execute(f"SELECT COUNT(*) FROM {schema}.customers WHERE email IS NULL")
-        result["customers_email_nulls"] = cur.fetchone()[0] == 0
-        cur.execute(f"SELECT COUNT(*) FROM {schema}.products WHERE price IS NULL")
-        result["products_price_nulls"] = cur.fetchone()[0] == 0
-        cur.execute(f"SELECT COUNT(*) FROM {schema}.transactions WHERE total_amount IS NULL")
-        result["transactions_total_nulls"] = cur.fetchone()[0] == 0
-        cur.execute(f"SELECT COUNT(*) FROM {schema}.transaction_items WHERE unit_price IS NULL")
-        result["items_price_nulls"] = cur.fetchone()[0] == 0
-    return result
-
-
-def check_duplicates(connection, schema: str) -> dict:
-    result = {}
-    with connection.cursor() as cur:
-        cur.execute(f"SELECT COUNT(*) FROM {schema}.customers GROUP BY customer_id HAVING COUNT(*) > 1")
-        result["customers_duplicates"] = cur.fetchone() is None
-        cur.execute(f"SELECT COUNT(*) FROM {schema}.products GROUP BY product_id HAVING COUNT(*) > 1")
-        result["products_duplicates"] = cur.fetchone() is None
-    return result
-
-
-def check_referential_integrity(connection, schema: str) -> dict:
-    result = {}
-    with connection.cursor() as cur:
-        cur.execute(
-            f"""
-            SELECT COUNT(*)
-            FROM {schema}.transactions t
-            LEFT JOIN {schema}.customers c ON t.customer_id = c.customer_id
-            WHERE c.customer_id IS NULL
-            """
+# Primary keys used to report sample rows for failing rules.
+TABLE_KEYS = {
+    "customers": "customer_id",
+    "products": "product_id",
+    "transactions": "transaction_id",
+    "transaction_items": "transaction_item_id",
+}
+
+
+def load_quality_config() -> dict:
+    """Quality rules and engine settings from the ``quality`` section of config.yaml."""
+    config = {"workers": 4, "sample_size": 5, "rules": []}
+    config.update(get_config("quality"))
+    config["keys"] = {**TABLE_KEYS, **(config.get("keys") or {})}
+    return config
+
+
+def _failing_condition(rule: dict, schema: str) -> str:
+    """SQL predicate that is true for rows breaking a row-level rule."""
+    column = f"t.{rule['column']}"
+    if rule["type"] == "not_null":
+        return f"{column} IS NULL"
+    if rule["type"] == "range":
+        bounds = []
+        if "greater_than" in rule:
+            bounds.append(f"{column} <= {rule['greater_than']}")
+        if "min" in rule:
+            bounds.append(f"{column} < {rule['min']}")
+        if "max" in rule:
+            bounds.append(f"{column} > {rule['max']}")
+        return " OR ".join(bounds) or "FALSE"
+    if rule["type"] == "references":
+        # NOT EXISTS rather than a join: a non-unique reference column must not multiply rows.
+        return (
+            f"NOT EXISTS (SELECT 1 FROM {schema}.{rule['ref_table']} r "
+            f"WHERE r.{rule['ref_column']} = {column})"
         )
-        result["transactions_fk_valid"] = cur.fetchone()[0] == 0
-        cur.execute(
-            f"""
-            SELECT COUNT(*)
-            FROM {schema}.transaction_items ti
-            LEFT JOIN {schema}.transactions t ON ti.transaction_id = t.transaction_id
-            WHERE t.transaction_id IS NULL
-            """
+    raise ValueError(f"Unsupported rule type: {rule['type']}")
+
+
+def compile_table_scan(schema: str, table: str, rules: list) -> str:
+    """Compile every rule for one table into a single query.
+
+    Null and range rules become ``COUNT(*) FILTER (WHERE ...)``, duplicates are
+    counted as ``COUNT(col) - COUNT(DISTINCT col)`` and foreign keys are checked
+    with NOT EXISTS probes on the same pass over the table.
+    """
+    selects = ["COUNT(*) AS row_count"]
+    for rule in rules:
+        if rule["type"] == "unique":
+            selects.append(f"COUNT(t.{rule['column']}) - COUNT(DISTINCT t.{rule['column']})")
+        else:
+            selects.append(f"COUNT(*) FILTER (WHERE {_failing_condition(rule, schema)})")
+    return f"SELECT {', '.join(selects)} FROM {schema}.{table} t"
+
+
+def compile_sample_query(schema: str, table: str, key: str, rule: dict, limit: int) -> str:
+    """Query returning up to ``limit`` keys of rows that break a rule."""
+    if rule["type"] == "unique":
+        return (
+            f"SELECT t.{rule['column']} FROM {schema}.{table} t "
+            f"GROUP BY t.{rule['column']} HAVING COUNT(*) > 1 ORDER BY 1 LIMIT {limit}"
         )
-        result["items_tx_fk_valid"] = cur.fetchone()[0] == 0
-    return result
+    return (
+        f"SELECT t.{key} FROM {schema}.{table} t "
+        f"WHERE {_failing_condition(rule, schema)} ORDER BY 1 LIMIT {limit}"
+    )
 
 
-def check_data_ranges(connection, schema: str) -> dict:
-    result = {}
-    with connection.cursor() as cur:
-        cur.execute(f"SELECT COUNT(*) FROM {schema}.transactions WHERE total_amount <= 0")
-        result["total_amount_valid"] = cur.fetchone()[0] == 0
-        cur.execute(f"SELECT COUNT(*) FROM {schema}.transaction_items WHERE quantity <= 0")
-        result["quantity_valid"] = cur.fetchone()[0] == 0
-    return result
+def check_table(schema: str, table: str, rules: list, key: str, sample_size: int) -> dict:
+    """Run one table's fused scan, then fetch sample keys for the rules that failed."""
+    start = time.perf_counter()
+    connection = get_connection()
+    results = {}
+    try:
+        with connection.cursor() as cur:
+            cur.execute(compile_table_scan(schema, table, rules))
+            row_count, *failures = cur.fetchone()
+            for rule, failing in zip(rules, failures):
+                samples = []
+                if failing:
+                    cur.execute(compile_sample_query(schema, table, key, rule, sample_size))
+                    samples = [row[0] for row in cur.fetchall()]
+                results[rule["name"]] = {
+                    "table": f"{schema}.{table}",
+                    "type": rule["type"],
+                    "column": rule["column"],
+                    "failing_rows": failing,
+                    "sample_keys": samples,
+                    "passed": failing == 0,
+                }
+    finally:
+        connection.close()
+    return {"table": table, "row_count": row_count, "rules": results, "seconds": round(time.perf_counter() - start, 3)}
+
+
+def run_quality_rules(schema: str, config: dict) -> dict:
+    """Check every table in parallel, one fused scan per table."""
+    by_table = {}
+    for rule in config["rules"]:
+        by_table.setdefault(rule["table"], []).append(rule)
+    with ThreadPoolExecutor(max_workers=int(config.get("workers", 4))) as pool:
+        futures = [
+            submit_in_context(
+                pool, check_table, schema, table, rules, config["keys"][table], int(config.get("sample_size", 5))
+            )
+            for table, rules in by_table.items()
+        ]
+        return {result["table"]: result for result in (future.result() for future in futures)}
 
 
 def calculate_quality_score(check_results: dict) -> float:
@@ -74,19 +129,24 @@ def calculate_quality_score(check_results: dict) -> float:
 
 
 def main(schema: str = "production") -> dict:
-    connection = get_connection()
-    checks = {}
-    checks.update(check_null_values(connection, schema))
-    checks.update(check_duplicates(connection, schema))
-    checks.update(check_referential_integrity(connection, schema))
-    checks.update(check_data_ranges(connection, schema))
-    score = calculate_quality_score(checks)
-
-    report = {"schema": schema, "checks": checks, "quality_score": score}
+    start = time.perf_counter()
+    tables = run_quality_rules(schema, load_quality_config())
+    rules = {name: result for table in tables.values() for name, result in table["rules"].items()}
+    checks = {name: result["passed"] for name, result in rules.items()}
+    score = calculate_quality_score(checks) if checks else 100.0
+
+    report = {
+        "schema": schema,
+        "checks": checks,
+        "quality_score": score,
+        "rules": rules,
+        "row_counts": {table: result["row_count"] for table, result in tables.items()},
+        "table_seconds": {table: result["seconds"] for table, result in tables.items()},
+        "elapsed_seconds": round(time.perf_counter() - start, 3),
+    }
     with open(OUT / "quality_report.json", "w") as f:
-        json.dump(report, f, indent=4)
+        json.dump(report, f, indent=4, default=str)
 
-    connection.close()
     return report
 
 
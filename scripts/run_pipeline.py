@@ -1,5 +1,13 @@
+import argparse
+import json
+
 from scripts.pipeline_orchestrator import run_pipeline
 
 
 if __name__ == "__main__":
-    print(run_pipeline())
+    parser = argparse.ArgumentParser(description="Run the pipeline, skipping tasks whose inputs have not changed.")
+    parser.add_argument("--from-step", help="rerun this task and everything downstream of it")
+    parser.add_argument("--only", nargs="+", metavar="STEP", help="rerun just these tasks")
+    parser.add_argument("--force", action="store_true", help="ignore checkpoints and rerun every task")
+    args = parser.parse_args()
+    print(json.dumps(run_pipeline(args.from_step, args.only, args.force), indent=4, default=str))
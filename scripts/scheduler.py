@@ -1,10 +1,33 @@
+import argparse
+import json
+import logging
 import os
 import time
 
+from scripts import micro_batch
+from scripts.db_connection import get_config
 from scripts.pipeline_orchestrator import run_pipeline
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Run the pipeline on a schedule or as landed files arrive.")
+    parser.add_argument(
+        "--mode",
+        choices=["schedule", "micro-batch"],
+        default=os.getenv("PIPELINE_MODE", "schedule"),
+        help="schedule: full run every PIPELINE_SCHEDULE_MINUTES; micro-batch: load files from the landing directory",
+    )
+    parser.add_argument("--once", action="store_true", help="micro-batch: process one batch and exit")
+    args = parser.parse_args()
+
+    if args.mode == "micro-batch":
+        config = get_config("pipeline")
+        logging.basicConfig(level=config.get("logging_level", "INFO"))
+        if args.once:
+            print(json.dumps(micro_batch.run_once(config), indent=4, default=str))
+            return
+        return micro_batch.run(config)
+
     interval_minutes = int(os.getenv("PIPELINE_SCHEDULE_MINUTES", "1440"))
     interval_seconds = interval_minutes * 60
 
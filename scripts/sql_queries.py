@@ -0,0 +1,18 @@
+"""Named SQL blocks kept in ``.sql`` files under ``sql/queries/``."""
+import re
+from pathlib import Path
+
+
+def load_named_queries(path) -> dict:
+    """Parse ``-- name: <name>`` blocks, in file order.
+
+    Comment lines inside a block are dropped and the trailing semicolon is
+    stripped, so each value can be executed or wrapped in ``COPY (...)`` as is.
+    """
+    content = Path(path).read_text(encoding="utf-8")
+    queries = {}
+    for block in re.split(r"^--\s*name:\s*", content, flags=re.MULTILINE)[1:]:
+        name, _, body = block.partition("\n")
+        sql = "\n".join(line for line in body.splitlines() if not line.strip().startswith("--"))
+        queries[name.strip()] = sql.strip().rstrip(";").strip()
+    return queries
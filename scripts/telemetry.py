@@ -0,0 +1,172 @@
+"""Per-task performance telemetry.
+
+``measure_task`` wraps one pipeline task and records wall time, CPU time, peak
+RSS and the time and rows spent in SQL. SQL is timed by ``TimedCursor``, the
+cursor class every pooled psycopg2 connection uses, which adds to the metrics
+of whichever task is running in the current context. Time not spent in SQL is
+reported as ``python_seconds`` (pandas, CSV I/O and other client-side work).
+
+Work a task fans out to its own thread pool must be submitted with
+``submit_in_context`` so the workers' SQL is still attributed to the task; their
+statements overlap, so ``sql_seconds`` can then exceed the task's wall time.
+"""
+import contextvars
+import cProfile
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import psycopg2.extensions
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_PATH = Path("data/processed/profiles")
+
+_current = contextvars.ContextVar("task_metrics", default=None)
+# Worker threads of one task update the same metrics dict.
+_metrics_lock = threading.Lock()
+
+
+def peak_rss_mb():
+    """High-water mark of the whole process; tasks sharing the process all see the largest one."""
+    if resource is None:
+        return None
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def record_rows(rows_in: int = 0, rows_out: int = 0) -> None:
+    """Count rows a task read or wrote outside the database (e.g. CSV files)."""
+    metrics = _current.get()
+    if metrics is not None:
+        with _metrics_lock:
+            metrics["rows_in"] += int(rows_in)
+            metrics["rows_out"] += int(rows_out)
+
+
+def submit_in_context(pool, func, *args, **kwargs):
+    """``pool.submit`` that runs ``func`` in a copy of the caller's context.
+
+    Threads started by an executor do not inherit context variables, so without
+    this the SQL a task runs on its own worker threads is attributed to no task.
+    """
+    return pool.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+@contextmanager
+def _sql_timer(cursor):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _current.get()
+        if metrics is not None:
+            with _metrics_lock:
+                metrics["sql_seconds"] += time.perf_counter() - started
+                metrics["sql_statements"] += 1
+                if cursor.rowcount and cursor.rowcount > 0:
+                    # Statements that return rows are reads; everything else wrote rows.
+                    metrics["rows_in" if cursor.description else "rows_out"] += cursor.rowcount
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """psycopg2 cursor that reports statement time and row counts to the running task."""
+
+    def execute(self, query, vars=None):
+        with _sql_timer(self):
+            return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        with _sql_timer(self):
+            return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        with _sql_timer(self):
+            return super().copy_expert(sql, file, size)
+
+
+@contextmanager
+def _profiler(task_name: str, profiler: str | None):
+    if not profiler:
+        yield None
+        return
+    PROFILE_PATH.mkdir(parents=True, exist_ok=True)
+    if profiler == "pyinstrument":
+        from pyinstrument import Profiler
+
+        profile = Profiler()
+        profile.start()
+        try:
+            yield PROFILE_PATH / f"{task_name}.html"
+        finally:
+            profile.stop()
+            (PROFILE_PATH / f"{task_name}.html").write_text(profile.output_html(), encoding="utf-8")
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield PROFILE_PATH / f"{task_name}.prof"
+    finally:
+        profile.disable()
+        profile.dump_stats(PROFILE_PATH / f"{task_name}.prof")
+
+
+@contextmanager
+def measure_task(task_name: str, profiler: str | None = None):
+    """Collect metrics for the code run inside the block; yields the metrics dict.
+
+    ``profiler`` is ``"cprofile"`` or ``"pyinstrument"`` to also write a profile
+    of the task to ``data/processed/profiles/``.
+    """
+    metrics = {"rows_in": 0, "rows_out": 0, "sql_seconds": 0.0, "sql_statements": 0}
+    token = _current.set(metrics)
+    wall_started, cpu_started = time.perf_counter(), time.thread_time()
+    try:
+        with _profiler(task_name, profiler) as profile_path:
+            if profile_path is not None:
+                metrics["profile"] = str(profile_path)
+            yield metrics
+    finally:
+        _current.reset(token)
+        wall = time.perf_counter() - wall_started
+        rows = max(metrics["rows_in"], metrics["rows_out"])
+        metrics.update(
+            wall_seconds=round(wall, 3),
+            cpu_seconds=round(time.thread_time() - cpu_started, 3),
+            sql_seconds=round(metrics["sql_seconds"], 3),
+            python_seconds=round(max(wall - metrics["sql_seconds"], 0), 3),
+            rows_per_sec=round(rows / wall, 2) if wall > 0 else None,
+            process_peak_rss_mb=peak_rss_mb(),
+        )
+
+
+PROMETHEUS_METRICS = {
+    "wall_seconds": "Wall-clock time of the task",
+    "cpu_seconds": "CPU time of the thread running the task",
+    "sql_seconds": "Time spent executing SQL",
+    "python_seconds": "Time spent outside SQL (pandas, file I/O)",
+    "sql_statements": "SQL statements executed",
+    "rows_in": "Rows read by the task",
+    "rows_out": "Rows written by the task",
+    "rows_per_sec": "Rows processed per second",
+    "process_peak_rss_mb": "Peak resident set size of the whole process so far in MiB (not per task)",
+}
+
+
+def to_prometheus(tasks: list, prefix: str = "pipeline_task") -> str:
+    """Render task metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric, help_text in PROMETHEUS_METRICS.items():
+        lines.append(f"# HELP {prefix}_{metric} {help_text}")
+        lines.append(f"# TYPE {prefix}_{metric} gauge")
+        for task in tasks:
+            value = (task.get("metrics") or {}).get(metric)
+            if value is not None:
+                lines.append(f'{prefix}_{metric}{{task="{task["task"]}"}} {value}')
+    return "\n".join(lines) + "\n"
@@ -1,21 +1,111 @@
+"""Streamlit dashboard over the warehouse aggregates.
+
+Run with ``streamlit run scripts/transformation/dashboard.py``. Streamlit reruns
+this script on every interaction, so the engine is a cached resource shared by
+all sessions and query results are cached per warehouse data version: a
+pipeline run that publishes a new version is picked up within
+``dashboard.version_check_seconds``, and until then reruns never touch Postgres.
+"""
 import pandas as pd
 import streamlit as st
+from sqlalchemy import text
+
+from scripts.db_connection import get_config, get_engine
+from scripts.pipeline_state import WAREHOUSE_DATASET
+
+config = get_config("dashboard")
+VERSION_CHECK_SECONDS = float(config.get("version_check_seconds", 30))
+CACHE_TTL_SECONDS = float(config.get("cache_ttl_seconds", 3600))
+TOP_PRODUCTS = int(config.get("top_products", 10))
+
+
+@st.cache_resource
+def _engine():
+    return get_engine()
+
+
+def _query(sql: str, **params) -> pd.DataFrame:
+    with _engine().connect() as conn:
+        return pd.read_sql(text(sql), conn, params=params)
+
+
+@st.cache_data(ttl=VERSION_CHECK_SECONDS)
+def warehouse_version():
+    try:
+        df = _query("SELECT version FROM pipeline.data_versions WHERE dataset = :dataset", dataset=WAREHOUSE_DATASET)
+    except Exception:
+        # Never published: results still expire through CACHE_TTL_SECONDS.
+        return None
+    return None if df.empty else int(df.iloc[0, 0])
+
+
+# Every loader takes ``version`` so that it is part of the cache key.
 
-from scripts.db_connection import get_engine
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_date_bounds(version):
+    return _query("SELECT MIN(date_key) AS first_day, MAX(date_key) AS last_day FROM warehouse.agg_sales_daily")
 
 
-engine = get_engine()
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_daily(version, start, end):
+    return _query(
+        """
+        SELECT date_key, total_orders, total_quantity, total_sales
+        FROM warehouse.agg_sales_daily
+        WHERE date_key BETWEEN :start AND :end
+        ORDER BY date_key
+        """,
+        start=start,
+        end=end,
+    )
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_categories(version):
+    return _query("SELECT category, total_sales AS revenue FROM warehouse.agg_sales_category ORDER BY revenue DESC")
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_top_products(version, limit):
+    return _query(
+        """
+        SELECT p.product_name, p.category, SUM(a.total_sales) AS revenue
+        FROM warehouse.agg_sales_product a
+        JOIN warehouse.dim_products p ON a.product_key = p.product_key
+        GROUP BY p.product_name, p.category
+        ORDER BY revenue DESC
+        LIMIT :limit
+        """,
+        limit=limit,
+    )
+
 
 st.title("🚀 E-Commerce Analytics Dashboard")
 
-# Metric 1: Total Revenue
-rev_df = pd.read_sql("SELECT SUM(total_sales) FROM warehouse.fact_sales", engine)
-st.metric("Total Revenue", f"${rev_df.iloc[0,0]:,.2f}")
-
-# Chart 1: Sales by Category
-cat_df = pd.read_sql("""
-    SELECT p.category, SUM(f.total_sales) as revenue 
-    FROM warehouse.fact_sales f 
-    JOIN warehouse.dim_products p ON f.product_key = p.product_key 
-    GROUP BY 1""", engine)
-st.bar_chart(cat_df.set_index('category'))
\ No newline at end of file
+version = warehouse_version()
+bounds = load_date_bounds(version)
+first_day, last_day = bounds.iloc[0]["first_day"], bounds.iloc[0]["last_day"]
+if pd.isna(first_day):
+    st.info("The warehouse aggregates are empty; run the pipeline first.")
+    st.stop()
+
+selected = st.date_input("Date range", (first_day, last_day), min_value=first_day, max_value=last_day)
+start, end = selected if len(selected) == 2 else (selected[0], selected[0])
+daily = load_daily(version, start, end)
+
+# Metric 1: Revenue, order lines and average line value for the selected range.
+# total_orders counts fact_sales rows, which are line items; the warehouse has no transaction id.
+revenue, lines = float(daily["total_sales"].sum()), int(daily["total_orders"].sum())
+col_revenue, col_lines, col_line_value = st.columns(3)
+col_revenue.metric("Total Revenue", f"${revenue:,.2f}")
+col_lines.metric("Order Lines", f"{lines:,}")
+col_line_value.metric("Avg Line Value", f"${revenue / lines:,.2f}" if lines else "-")
+
+# Chart 1: Daily revenue
+st.line_chart(daily.set_index("date_key")["total_sales"])
+
+# Chart 2: Sales by Category (all time)
+st.bar_chart(load_categories(version).set_index("category"))
+
+# Table: Top products (all time)
+st.dataframe(load_top_products(version, TOP_PRODUCTS), hide_index=True)
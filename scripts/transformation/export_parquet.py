@@ -0,0 +1,209 @@
+"""Export fact_sales and the aggregate tables as Parquet for BI tools.
+
+Date-based tables are partitioned Hive-style (``<table>/year=YYYY/month=MM/``)
+so Power BI and Tableau can prune by date. Each partition has a signature
+computed in Postgres; only partitions whose signature differs from the previous
+manifest are read and rewritten, and partitions that no longer exist are removed.
+"""
+import json
+import os
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from scripts.db_connection import get_config, get_connection
+
+OUTPUT_DIR = Path("data/processed/parquet")
+
+_YEAR_MONTH = ("EXTRACT(YEAR FROM {column})::int", "EXTRACT(MONTH FROM {column})::int")
+_CONTENT_SIGNATURE = "md5(string_agg(t::text, '|' ORDER BY t::text))"
+
+# query: rows to export. partition_by: a date column (partitioned by its year and
+# month), a pair of year/month columns, or None for a single file. signature:
+# per-partition change detector evaluated over ``source``.
+PARQUET_TABLES = {
+    "fact_sales": {
+        "source": "warehouse.fact_sales",
+        "query": """
+            SELECT f.sales_key, f.date_key, f.customer_key, f.product_key, p.category,
+                   f.quantity, f.total_sales
+            FROM warehouse.fact_sales f
+            LEFT JOIN warehouse.dim_products p ON p.product_key = f.product_key
+        """,
+        "alias": "f",
+        "partition_by": "date_key",
+        # Reloaded facts get new sales_keys, so the key range changes with the content.
+        "signature": "COUNT(*) || ':' || MIN(t.sales_key) || ':' || MAX(t.sales_key) || ':' || SUM(t.total_sales)",
+        "dictionary": ["category"],
+    },
+    "agg_sales_daily": {
+        "source": "warehouse.agg_sales_daily",
+        "query": "SELECT a.* FROM warehouse.agg_sales_daily a",
+        "alias": "a",
+        "partition_by": "date_key",
+    },
+    "agg_sales_monthly": {
+        "source": "warehouse.agg_sales_monthly",
+        "query": "SELECT a.* FROM warehouse.agg_sales_monthly a",
+        "alias": "a",
+        "partition_by": ("year", "month"),
+    },
+    "agg_sales_category": {
+        "source": "warehouse.agg_sales_category",
+        "query": "SELECT a.* FROM warehouse.agg_sales_category a",
+        "alias": "a",
+        "partition_by": None,
+        "dictionary": ["category"],
+    },
+    "agg_sales_product": {
+        "source": "warehouse.agg_sales_product",
+        "query": "SELECT a.* FROM warehouse.agg_sales_product a",
+        "alias": "a",
+        "partition_by": None,
+    },
+}
+
+
+def _partition_exprs(partition_by, alias: str) -> tuple:
+    if partition_by is None:
+        return None, None
+    if isinstance(partition_by, str):
+        return tuple(expr.format(column=f"{alias}.{partition_by}") for expr in _YEAR_MONTH)
+    return tuple(f"{alias}.{column}" for column in partition_by)
+
+
+def compile_signature_sql(spec: dict) -> str:
+    """One row per partition: year, month, row count and a change signature."""
+    year, month = _partition_exprs(spec["partition_by"], "t")
+    signature = spec.get("signature", _CONTENT_SIGNATURE)
+    if year is None:
+        return f"SELECT NULL::int, NULL::int, COUNT(*), {signature} FROM {spec['source']} t"
+    return f"SELECT {year}, {month}, COUNT(*), {signature} FROM {spec['source']} t GROUP BY 1, 2"
+
+
+def compile_partition_query(spec: dict) -> str:
+    """Export query narrowed to one partition via %(year)s / %(month)s (or %(start)s / %(end)s)."""
+    partition_by, alias = spec["partition_by"], spec["alias"]
+    if partition_by is None:
+        return spec["query"]
+    if isinstance(partition_by, str):
+        # A date range keeps the date_key index usable.
+        column = f"{alias}.{partition_by}"
+        return f"{spec['query']} WHERE {column} >= %(start)s AND {column} < %(end)s"
+    year, month = _partition_exprs(partition_by, alias)
+    return f"{spec['query']} WHERE {year} = %(year)s AND {month} = %(month)s"
+
+
+def partition_name(year, month) -> str:
+    return "all" if year is None else f"year={int(year)}/month={int(month):02d}"
+
+
+def _month_range(year: int, month: int) -> tuple:
+    start = date(year, month, 1)
+    end = date(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+
+def _to_arrow(df: pd.DataFrame, dictionary_columns: list):
+    for column in dictionary_columns:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def write_partition(df: pd.DataFrame, path: Path, spec: dict, compression: str) -> int:
+    """Write one partition atomically and return its size in bytes."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix(".parquet.part")
+    pq.write_table(_to_arrow(df, spec.get("dictionary", [])), partial, compression=compression)
+    os.replace(partial, path)
+    return path.stat().st_size
+
+
+def load_manifest(output_dir: Path) -> dict:
+    path = output_dir / "manifest.json"
+    if not path.exists():
+        return {"tables": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def export_table(connection, table: str, spec: dict, output_dir: Path, previous: dict, compression: str) -> dict:
+    """Rewrite the partitions of one table whose signature changed; drop vanished ones."""
+    with connection.cursor() as cur:
+        cur.execute(compile_signature_sql(spec))
+        signatures = {partition_name(y, m): (y, m, rows, signature) for y, m, rows, signature in cur.fetchall() if rows}
+
+    partitions, written = {}, []
+    query = compile_partition_query(spec)
+    for name, (year, month, rows, signature) in sorted(signatures.items()):
+        path = output_dir / table / name / "part-0.parquet"
+        entry = previous.get(name)
+        if entry and entry["signature"] == signature and path.exists():
+            partitions[name] = entry
+            continue
+        params = {}
+        if isinstance(spec["partition_by"], str):
+            params["start"], params["end"] = _month_range(year, month)
+        elif spec["partition_by"] is not None:
+            params = {"year": year, "month": month}
+        df = pd.read_sql(query, connection, params=params or None)
+        partitions[name] = {
+            "path": str(path.relative_to(output_dir)),
+            "rows": len(df),
+            "bytes": write_partition(df, path, spec, compression),
+            "signature": signature,
+            "written_at": datetime.now(timezone.utc).isoformat(),
+        }
+        written.append(name)
+
+    removed = sorted(set(previous) - set(partitions))
+    for name in removed:
+        stale = output_dir / previous[name]["path"]
+        if stale.exists():
+            stale.unlink()
+    return {"partitions": partitions, "written": written, "removed": removed}
+
+
+def main(tables: list | None = None) -> dict:
+    config = get_config("parquet")
+    output_dir = Path(config.get("output_dir", OUTPUT_DIR))
+    compression = config.get("compression", "zstd")
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    started = time.perf_counter()
+    manifest = load_manifest(output_dir)
+    summary = {}
+    conn = get_connection()
+    for table in tables or config.get("tables") or list(PARQUET_TABLES):
+        previous = manifest["tables"].get(table, {}).get("partitions", {})
+        result = export_table(conn, table, PARQUET_TABLES[table], output_dir, previous, compression)
+        manifest["tables"][table] = {
+            "partitioned_by": None if PARQUET_TABLES[table]["partition_by"] is None else ["year", "month"],
+            "rows": sum(entry["rows"] for entry in result["partitions"].values()),
+            "partitions": result["partitions"],
+        }
+        summary[table] = {
+            "partitions": len(result["partitions"]),
+            "written": len(result["written"]),
+            "unchanged": len(result["partitions"]) - len(result["written"]),
+            "removed": len(result["removed"]),
+            "rows_written": sum(result["partitions"][name]["rows"] for name in result["written"]),
+        }
+    conn.rollback()
+    conn.close()
+
+    manifest["generated_at"] = datetime.now(timezone.utc).isoformat()
+    manifest["compression"] = compression
+    partial = output_dir / "manifest.json.part"
+    partial.write_text(json.dumps(manifest, indent=4), encoding="utf-8")
+    os.replace(partial, output_dir / "manifest.json")
+
+    return {"output_dir": str(output_dir), "seconds": round(time.perf_counter() - started, 3), "tables": summary}
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(), indent=4))
@@ -1,33 +1,60 @@
+import csv
 import json
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
 
-import pandas as pd
-
-from scripts.db_connection import get_connection
-
-def execute_and_export():
-    output_dir = 'data/processed/analytics/'
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Define your queries in a dictionary
-    queries = {
-        "query1_top_products": """
-            SELECT p.product_name, p.category, SUM(f.total_sales) as total_revenue 
-            FROM warehouse.fact_sales f 
-            JOIN warehouse.dim_products p ON f.product_key = p.product_key 
-            GROUP BY 1, 2 ORDER BY 3 DESC LIMIT 10""",
-        "query2_monthly_trend": """
-            SELECT d.year, d.month, SUM(f.total_sales) as revenue 
-            FROM warehouse.fact_sales f 
-            JOIN warehouse.dim_date d ON f.date_key = d.date_key 
-            GROUP BY 1, 2 ORDER BY 1, 2""",
-        "query5_payment_distribution": """
-            SELECT payment_method, COUNT(*) as txn_count, SUM(total_amount) as revenue 
-            FROM production.transactions GROUP BY 1"""
+from scripts.db_connection import get_config, get_connection
+from scripts.sql_queries import load_named_queries
+from scripts.telemetry import submit_in_context
+
+QUERIES_PATH = Path("sql/queries/analytical_queries.sql")
+OUTPUT_DIR = Path("data/processed/analytics")
+
+
+def load_queries(path: Path | None = None) -> dict:
+    """The ``-- name:`` blocks of the analytical queries file, in file order."""
+    return load_named_queries(path or QUERIES_PATH)
+
+
+def export_query(name: str, sql: str, output_dir: Path) -> dict:
+    """Stream one query's result to ``<name>.csv`` with COPY ... TO STDOUT, on its own connection."""
+    start = time.perf_counter()
+    target = output_dir / f"{name}.csv"
+    partial = target.with_suffix(".csv.part")
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur, open(partial, "w", encoding="utf-8", newline="") as f:
+            cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)", f)
+            rows = cur.rowcount
+        conn.rollback()
+    finally:
+        conn.close()
+    os.replace(partial, target)
+    with open(target, "r", encoding="utf-8", newline="") as f:
+        # csv.reader, not split(","): quoted values may contain commas and newlines.
+        reader = csv.reader(f)
+        columns = len(next(reader, []))
+        if rows < 0:
+            rows = sum(1 for _ in reader)
+    return {
+        "rows": rows,
+        "columns": columns,
+        "bytes": target.stat().st_size,
+        "execution_time_ms": round((time.perf_counter() - start) * 1000, 2),
     }
-    
+
+
+def execute_and_export(workers: int | None = None) -> dict:
+    """Export every analytical query concurrently and write ``analytics_summary.json``."""
+    config = get_config("analytics")
+    output_dir = Path(config.get("output_dir", OUTPUT_DIR))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    queries = load_queries(config.get("queries_path"))
+    workers = int(workers or config.get("workers", 4))
+
     summary = {
         "generation_timestamp": datetime.now().isoformat(),
         "queries_executed": len(queries),
@@ -35,26 +62,16 @@ def execute_and_export():
     }
 
     start_time = time.time()
-    conn = get_connection()
-
-    for name, sql in queries.items():
-        q_start = time.time()
-        df = pd.read_sql(sql, conn)
-        df.to_csv(f"{output_dir}{name}.csv", index=False)
-        
-        summary["query_results"][name] = {
-            "rows": len(df),
-            "columns": len(df.columns),
-            "execution_time_ms": round((time.time() - q_start) * 1000, 2)
-        }
-    
-    conn.close()
+    with ThreadPoolExecutor(max_workers=max(min(workers, len(queries)), 1)) as pool:
+        futures = {name: submit_in_context(pool, export_query, name, sql, output_dir) for name, sql in queries.items()}
+        summary["query_results"] = {name: future.result() for name, future in futures.items()}
     summary["total_execution_time_seconds"] = round(time.time() - start_time, 2)
-    
-    with open('data/processed/analytics/analytics_summary.json', 'w') as f:
+
+    with open(output_dir / "analytics_summary.json", "w") as f:
         json.dump(summary, f, indent=4)
-    
-    print("✅ Analytics Exported to data/processed/analytics/")
+
+    print(f"✅ Analytics Exported to {output_dir}/")
+    return summary
 
 if __name__ == "__main__":
-    execute_and_export()
\ No newline at end of file
+    execute_and_export()
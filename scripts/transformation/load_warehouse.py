@@ -1,198 +1,596 @@
-from datetime import date
+import argparse
+import time
+from functools import partial
+from datetime import date, timedelta
 
 import pandas as pd
 
-from scripts.db_connection import get_engine, get_connection
+from scripts.dag import run_dag
+from scripts.db_connection import get_config, get_engine, get_connection
+from scripts.pipeline_state import (
+    WAREHOUSE_DATASET,
+    WAREHOUSE_WATERMARK_STAGE,
+    bump_data_version,
+    ensure_state_tables,
+    get_watermark,
+    set_watermark,
+)
+from scripts.telemetry import peak_rss_mb
+
+WATERMARK_STAGE = WAREHOUSE_WATERMARK_STAGE
+
+
+# Slowly changing (Type 2) dimensions: a new version is inserted whenever the
+# hash of the tracked attributes differs from the current version's hash.
+SCD2_DIMENSIONS = {
+    "dim_customers": {
+        "source": "production.customers",
+        "natural_key": "customer_id",
+        "attributes": ["first_name", "last_name", "email"],
+    },
+    "dim_products": {
+        "source": "production.products",
+        "natural_key": "product_id",
+        "attributes": ["product_name", "category", "price"],
+    },
+}
 
 
 def build_dim_date(start_date: date, end_date: date) -> int:
-    engine = get_engine()
+    """Add any missing dates in the range; existing rows (and the facts using them) are kept."""
     conn = get_connection()
-    
-    # Truncate existing data
-    cur = conn.cursor()
-    cur.execute("TRUNCATE TABLE warehouse.dim_date CASCADE")
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO warehouse.dim_date (date_key, year, month, day)
+            SELECT d::date, EXTRACT(YEAR FROM d)::int, EXTRACT(MONTH FROM d)::int, EXTRACT(DAY FROM d)::int
+            FROM generate_series(%s::date, %s::date, INTERVAL '1 day') AS d
+            ON CONFLICT (date_key) DO NOTHING
+            """,
+            (start_date, end_date),
+        )
+        inserted = cur.rowcount
     conn.commit()
-    cur.close()
     conn.close()
-    
-    # Load new data
-    df_date = pd.DataFrame({"date_key": pd.date_range(start_date, end_date)})
-    df_date["day"] = df_date["date_key"].dt.day
-    df_date["month"] = df_date["date_key"].dt.month
-    df_date["year"] = df_date["date_key"].dt.year
-    df_date.to_sql("dim_date", engine, schema="warehouse", if_exists="append", index=False)
-    return len(df_date)
+    return inserted
 
 
-def build_dim_customers() -> int:
-    engine = get_engine()
-    conn = get_connection()
-    df = pd.read_sql("SELECT customer_id, first_name, last_name, email FROM production.customers", conn)
-    today = date.today()
-    df["effective_start_date"] = today
-    df["effective_end_date"] = pd.NaT
-    df["is_current"] = True
-    
-    # Truncate and load
-    cur_conn = get_connection()
-    cur = cur_conn.cursor()
-    cur.execute("TRUNCATE TABLE warehouse.dim_customers CASCADE")
-    cur_conn.commit()
-    cur.close()
-    cur_conn.close()
-    
-    df.to_sql("dim_customers", engine, schema="warehouse", if_exists="append", index=False)
-    conn.close()
-    return len(df)
+def _row_hash(alias: str, attributes: list) -> str:
+    return f"md5(ROW({', '.join(f'{alias}.{a}' for a in attributes)})::text)"
 
 
-def build_dim_products() -> int:
-    engine = get_engine()
+def compile_scd2_sql(dimension_name: str) -> dict:
+    """Build the set-based statements that maintain one SCD Type 2 dimension."""
+    spec = SCD2_DIMENSIONS[dimension_name]
+    table = f"warehouse.{dimension_name}"
+    key = spec["natural_key"]
+    attributes = spec["attributes"]
+    columns = ", ".join([key] + attributes)
+    return {
+        # Rows written before hashes existed get one from their own attributes.
+        "backfill": (
+            f"UPDATE {table} d SET row_hash = {_row_hash('d', attributes)} "
+            f"WHERE d.row_hash IS NULL AND d.is_current"
+        ),
+        "expire": (
+            f"UPDATE {table} d SET is_current = FALSE, effective_end_date = CURRENT_DATE, "
+            f"updated_at = CURRENT_TIMESTAMP "
+            f"FROM {spec['source']} src "
+            f"WHERE d.{key} = src.{key} AND d.is_current "
+            f"AND d.row_hash IS DISTINCT FROM {_row_hash('src', attributes)}"
+        ),
+        "insert": (
+            f"INSERT INTO {table} ({columns}, row_hash, effective_start_date, effective_end_date, is_current) "
+            f"SELECT {', '.join(f'src.{c}' for c in [key] + attributes)}, {_row_hash('src', attributes)}, "
+            f"CURRENT_DATE, NULL, TRUE "
+            f"FROM {spec['source']} src "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {table} d WHERE d.{key} = src.{key} AND d.is_current)"
+        ),
+    }
+
+
+def apply_scd_type2(dimension_name: str) -> dict:
+    """Expire changed rows and insert new versions in bulk, keeping existing surrogate keys."""
+    statements = compile_scd2_sql(dimension_name)
     conn = get_connection()
-    df = pd.read_sql("SELECT product_id, product_name, category, price FROM production.products", conn)
-    today = date.today()
-    df["effective_start_date"] = today
-    df["effective_end_date"] = pd.NaT
-    df["is_current"] = True
-    
-    # Truncate and load
-    cur_conn = get_connection()
-    cur = cur_conn.cursor()
-    cur.execute("TRUNCATE TABLE warehouse.dim_products CASCADE")
-    cur_conn.commit()
-    cur.close()
-    cur_conn.close()
-    
-    df.to_sql("dim_products", engine, schema="warehouse", if_exists="append", index=False)
+    with conn.cursor() as cur:
+        cur.execute(statements["backfill"])
+        cur.execute(statements["expire"])
+        expired = cur.rowcount
+        cur.execute(statements["insert"])
+        inserted = cur.rowcount
+    conn.commit()
     conn.close()
-    return len(df)
+    return {
+        "dimension": dimension_name,
+        "scd2_applied": True,
+        "expired": expired,
+        "inserted": inserted,
+        "new_keys": inserted - expired,
+    }
+
+
+def build_dim_customers() -> dict:
+    return apply_scd_type2("dim_customers")
+
+
+def build_dim_products() -> dict:
+    return apply_scd_type2("dim_products")
 
 
 def build_dim_payment_method() -> int:
-    engine = get_engine()
+    """Add payment methods not yet in the dimension, keeping existing keys."""
     conn = get_connection()
-    df = pd.read_sql(
-        "SELECT DISTINCT payment_method FROM production.transactions", conn
-    ).dropna()
-    
-    # Truncate and load
-    cur = conn.cursor()
-    cur.execute("TRUNCATE TABLE warehouse.dim_payment_method CASCADE")
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO warehouse.dim_payment_method (payment_method)
+            SELECT DISTINCT t.payment_method
+            FROM production.transactions t
+            WHERE t.payment_method IS NOT NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM warehouse.dim_payment_method p WHERE p.payment_method = t.payment_method
+              )
+            """
+        )
+        inserted = cur.rowcount
     conn.commit()
-    cur.close()
-    
-    df.to_sql("dim_payment_method", engine, schema="warehouse", if_exists="append", index=False)
     conn.close()
-    return len(df)
+    return inserted
 
 
-def build_fact_sales() -> int:
-    engine = get_engine()
+FACT_INSERT_SQL = """
+    INSERT INTO warehouse.fact_sales (date_key, customer_key, product_key, quantity, total_sales)
+    SELECT t.transaction_date, c.customer_key, p.product_key, i.quantity, ROUND(i.unit_price * i.quantity, 2)
+    FROM production.transaction_items i
+    JOIN production.transactions t ON t.transaction_id = i.transaction_id
+    LEFT JOIN warehouse.dim_customers c ON c.customer_id = t.customer_id AND c.is_current
+    LEFT JOIN warehouse.dim_products p ON p.product_id = i.product_id AND p.is_current
+    WHERE t.transaction_date >= %s AND t.transaction_date < %s
+"""
+
+
+# Full-history form of each aggregate; {where} narrows it to a date_key window.
+AGGREGATE_SELECTS = {
+    "agg_sales_daily": (
+        ["date_key"],
+        """
+        SELECT f.date_key, COUNT(*) AS total_orders, COALESCE(SUM(f.quantity), 0) AS total_quantity,
+               COALESCE(SUM(f.total_sales), 0) AS total_sales
+        FROM warehouse.fact_sales f {where}
+        GROUP BY f.date_key
+        """,
+    ),
+    "agg_sales_monthly": (
+        ["year", "month"],
+        """
+        SELECT EXTRACT(YEAR FROM f.date_key)::int AS year, EXTRACT(MONTH FROM f.date_key)::int AS month,
+               COUNT(*) AS total_orders, COALESCE(SUM(f.quantity), 0) AS total_quantity,
+               COALESCE(SUM(f.total_sales), 0) AS total_sales
+        FROM warehouse.fact_sales f {where}
+        GROUP BY 1, 2
+        """,
+    ),
+    "agg_sales_category": (
+        ["category"],
+        """
+        SELECT p.category, COUNT(*) AS total_orders, COALESCE(SUM(f.quantity), 0) AS total_quantity,
+               COALESCE(SUM(f.total_sales), 0) AS total_sales
+        FROM warehouse.fact_sales f
+        JOIN warehouse.dim_products p ON p.product_key = f.product_key {where}
+        GROUP BY p.category
+        """,
+    ),
+    # Serving aggregate for /analytics/top-products: one row per product version.
+    "agg_sales_product": (
+        ["product_key"],
+        """
+        SELECT f.product_key, COUNT(*) AS total_orders, COALESCE(SUM(f.quantity), 0) AS total_quantity,
+               COALESCE(SUM(f.total_sales), 0) AS total_sales
+        FROM warehouse.fact_sales f {where}
+        GROUP BY f.product_key
+        """,
+    ),
+}
+
+# Predicates an aggregate always applies, on top of any date window. Facts whose
+# product has no current dimension row have a NULL product_key, which cannot be
+# stored in agg_sales_product's primary key (the full rebuilds drop them too).
+AGGREGATE_FILTERS = {
+    "agg_sales_product": ["f.product_key IS NOT NULL"],
+}
+
+
+def aggregate_select(table_name: str, *conditions: str) -> str:
+    """An aggregate's SELECT with its own filters and ``conditions`` in the WHERE clause."""
+    predicates = AGGREGATE_FILTERS.get(table_name, []) + list(conditions)
+    where = f"WHERE {' AND '.join(predicates)}" if predicates else ""
+    return AGGREGATE_SELECTS[table_name][1].format(where=where)
+
+
+def mark_aggregates_current(connection, rows: int) -> None:
+    """Record that the aggregates reflect fact_sales as of this transaction.
+
+    Readers treat the aggregates as stale while the fact_sales watermark was
+    updated after this one, e.g. when the fact load succeeded but the rebuild failed.
+    """
+    with connection.cursor() as cur:
+        cur.execute("SELECT MAX(date_key) FROM warehouse.fact_sales")
+        max_date = cur.fetchone()[0]
+    set_watermark(connection, WATERMARK_STAGE, "aggregates", "date_key", max_date, rows)
+
+
+def compile_aggregate_delta_sql(table_name: str) -> str:
+    """Upsert that adds ``sign`` times the window's partial aggregates to an aggregate table."""
+    keys = AGGREGATE_SELECTS[table_name][0]
+    key_list = ", ".join(keys)
+    window = aggregate_select(table_name, "f.date_key >= %(start)s")
+    return f"""
+        INSERT INTO warehouse.{table_name} AS a ({key_list}, total_orders, total_quantity, total_sales)
+        SELECT {key_list}, %(sign)s * total_orders, %(sign)s * total_quantity, %(sign)s * total_sales
+        FROM ({window}) AS delta
+        ON CONFLICT ({key_list}) DO UPDATE SET
+            total_orders = a.total_orders + EXCLUDED.total_orders,
+            total_quantity = a.total_quantity + EXCLUDED.total_quantity,
+            total_sales = a.total_sales + EXCLUDED.total_sales
+    """
+
+
+def apply_aggregate_delta(cur, window_start: date, sign: int) -> None:
+    """Add (sign=1) or retract (sign=-1) the facts dated on or after window_start."""
+    for table_name in AGGREGATE_SELECTS:
+        cur.execute(compile_aggregate_delta_sql(table_name), {"start": window_start, "sign": sign})
+    if sign > 0:
+        for table_name in AGGREGATE_SELECTS:
+            cur.execute(f"DELETE FROM warehouse.{table_name} WHERE total_orders <= 0")
+
+
+def verify_aggregates() -> dict:
+    """Compare every aggregate table with a full recompute from fact_sales."""
     conn = get_connection()
+    result = {}
+    with conn.cursor() as cur:
+        for table_name, (keys, _) in AGGREGATE_SELECTS.items():
+            stored = f"SELECT {', '.join(keys)}, total_orders, total_quantity, total_sales FROM warehouse.{table_name}"
+            expected = aggregate_select(table_name)
+            cur.execute(f"SELECT COUNT(*) FROM (({expected}) EXCEPT ({stored})) AS missing")
+            missing = cur.fetchone()[0]
+            cur.execute(f"SELECT COUNT(*) FROM (({stored}) EXCEPT ({expected})) AS unexpected")
+            unexpected = cur.fetchone()[0]
+            result[table_name] = {"missing_or_wrong": missing, "unexpected": unexpected, "matches": missing == unexpected == 0}
+    conn.close()
+    return result
 
-    transactions = pd.read_sql("SELECT * FROM production.transactions", conn)
-    items = pd.read_sql("SELECT * FROM production.transaction_items", conn)
-    dim_customers = pd.read_sql("SELECT customer_key, customer_id FROM warehouse.dim_customers", conn)
-    dim_products = pd.read_sql("SELECT product_key, product_id FROM warehouse.dim_products", conn)
 
-    df = items.merge(transactions, on="transaction_id", how="inner")
-    df = df.merge(dim_customers, on="customer_id", how="left")
-    df = df.merge(dim_products, on="product_id", how="left")
+def date_chunks(start_date: date, end_date: date, chunk_days: int) -> list:
+    """Split the inclusive range into ``[chunk_start, chunk_end)`` windows of ``chunk_days``."""
+    chunks = []
+    current = start_date
+    while current <= end_date:
+        chunk_end = min(current + timedelta(days=chunk_days), end_date + timedelta(days=1))
+        chunks.append((current, chunk_end))
+        current = chunk_end
+    return chunks
 
-    df["total_sales"] = (df["unit_price"] * df["quantity"]).round(2)
-    df_fact = df[["transaction_date", "customer_key", "product_key", "quantity", "total_sales"]].copy()
-    df_fact.rename(columns={"transaction_date": "date_key"}, inplace=True)
-    
-    # Truncate and load
-    cur = conn.cursor()
-    cur.execute("TRUNCATE TABLE warehouse.fact_sales CASCADE")
+
+def _fact_window_start(connection, mode: str, late_arrival_days: int, since: date | None = None):
+    """First date_key to (re)load, or None for a full rebuild.
+
+    ``since`` widens the window back to the oldest date a caller knows has
+    changed, e.g. a late micro-batch.
+    """
+    if mode != "incremental":
+        return None
+    stored = get_watermark(connection, WATERMARK_STAGE, "fact_sales")
+    if stored:
+        watermark = date.fromisoformat(stored)
+    else:
+        with connection.cursor() as cur:
+            cur.execute("SELECT MAX(date_key) FROM warehouse.fact_sales")
+            watermark = cur.fetchone()[0]
+    if watermark is None:
+        return None
+    window_start = watermark - timedelta(days=late_arrival_days)
+    return min(window_start, since) if since else window_start
+
+
+def build_fact_sales(mode: str | None = None, since: date | None = None) -> dict:
+    """Load fact_sales with one INSERT ... SELECT per date chunk.
+
+    In incremental mode only transactions on or after the last loaded date_key,
+    minus the late-arrival window (or from ``since``, if earlier), are deleted
+    and reloaded. The aggregates are
+    then maintained in the same transaction: the old window is retracted and the
+    reloaded window added back, so only the affected days and months change.
+    """
+    config = get_config("warehouse")
+    mode = mode or config.get("fact_load", "incremental")
+    maintain_aggregates = config.get("aggregates", "incremental") == "incremental"
+    late_arrival_days = int(config.get("late_arrival_days", 3))
+    chunk_days = int(config.get("fact_chunk_days", 31))
+
+    conn = get_connection()
+    ensure_state_tables(conn)
+    with conn.cursor() as cur:
+        cur.execute("SELECT MIN(transaction_date), MAX(transaction_date) FROM production.transactions")
+        min_date, max_date = cur.fetchone()
+        window_start = _fact_window_start(conn, mode, late_arrival_days, since)
+        if window_start is None:
+            mode = "full"
+            window_start = min_date
+            cur.execute("TRUNCATE TABLE warehouse.fact_sales")
+        else:
+            if maintain_aggregates:
+                apply_aggregate_delta(cur, window_start, -1)
+            cur.execute("DELETE FROM warehouse.fact_sales WHERE date_key >= %s", (window_start,))
+
+        rows = 0
+        chunks = date_chunks(window_start, max_date, chunk_days) if max_date else []
+        for chunk_start, chunk_end in chunks:
+            cur.execute(FACT_INSERT_SQL, (chunk_start, chunk_end))
+            rows += cur.rowcount
+        aggregates_maintained = mode == "incremental" and maintain_aggregates
+        if aggregates_maintained:
+            apply_aggregate_delta(cur, window_start, 1)
+    if max_date is not None:
+        set_watermark(conn, WATERMARK_STAGE, "fact_sales", "date_key", max_date, rows)
+    if aggregates_maintained:
+        mark_aggregates_current(conn, rows)
+    conn.commit()
+    conn.close()
+    return {
+        "mode": mode,
+        "rows_loaded": rows,
+        "window_start": None if window_start is None else window_start.isoformat(),
+        "window_end": None if max_date is None else max_date.isoformat(),
+        "chunks": len(chunks),
+        "aggregates_maintained": aggregates_maintained,
+    }
+
+
+# One scan of fact_sales feeds all four rollups. GROUPING() flags the set each output
+# row belongs to: bits are (date_key, year, month, category, product_key), 1 = rolled up.
+GROUPING_SETS_SQL = """
+    WITH base AS (
+        SELECT f.date_key,
+               EXTRACT(YEAR FROM f.date_key)::int AS year,
+               EXTRACT(MONTH FROM f.date_key)::int AS month,
+               p.category,
+               f.product_key,
+               f.quantity,
+               f.total_sales
+        FROM warehouse.fact_sales f
+        LEFT JOIN warehouse.dim_products p ON p.product_key = f.product_key
+    ),
+    grouped AS (
+        SELECT date_key, year, month, category, product_key,
+               GROUPING(date_key, year, month, category, product_key) AS grouping_id,
+               COUNT(*) AS total_orders,
+               COALESCE(SUM(quantity), 0) AS total_quantity,
+               COALESCE(SUM(total_sales), 0) AS total_sales
+        FROM base
+        GROUP BY GROUPING SETS ((date_key), (year, month), (category), (product_key))
+    ),
+    daily_rows AS (
+        INSERT INTO warehouse.agg_sales_daily (date_key, total_orders, total_quantity, total_sales)
+        SELECT date_key, total_orders, total_quantity, total_sales
+        FROM grouped WHERE grouping_id = 15 AND date_key IS NOT NULL
+        RETURNING 1
+    ),
+    monthly_rows AS (
+        INSERT INTO warehouse.agg_sales_monthly (year, month, total_orders, total_quantity, total_sales)
+        SELECT year, month, total_orders, total_quantity, total_sales
+        FROM grouped WHERE grouping_id = 19 AND year IS NOT NULL
+        RETURNING 1
+    ),
+    category_rows AS (
+        INSERT INTO warehouse.agg_sales_category (category, total_orders, total_quantity, total_sales)
+        SELECT category, total_orders, total_quantity, total_sales
+        FROM grouped WHERE grouping_id = 29 AND category IS NOT NULL
+        RETURNING 1
+    ),
+    product_rows AS (
+        INSERT INTO warehouse.agg_sales_product (product_key, total_orders, total_quantity, total_sales)
+        SELECT product_key, total_orders, total_quantity, total_sales
+        FROM grouped WHERE grouping_id = 30 AND product_key IS NOT NULL
+        RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM daily_rows), (SELECT COUNT(*) FROM monthly_rows),
+           (SELECT COUNT(*) FROM category_rows), (SELECT COUNT(*) FROM product_rows)
+"""
+
+
+def _elapsed_ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+
+def build_aggregates_grouping_sets() -> dict:
+    """Rebuild the daily, monthly, category and product rollups in one statement inside Postgres."""
+    started = time.perf_counter()
+    conn = get_connection()
+    ensure_state_tables(conn)
+    with conn.cursor() as cur:
+        cur.execute(f"TRUNCATE TABLE {', '.join(f'warehouse.{table}' for table in AGGREGATE_SELECTS)}")
+        truncate_ms = _elapsed_ms(started)
+        cur.execute(GROUPING_SETS_SQL)
+        daily, monthly, category, product = cur.fetchone()
+        rollup_ms = _elapsed_ms(started) - truncate_ms
+    mark_aggregates_current(conn, daily)
     conn.commit()
-    cur.close()
-    
-    df_fact.to_sql("fact_sales", engine, schema="warehouse", if_exists="append", index=False)
     conn.close()
-    return len(df_fact)
+    return {
+        "method": "grouping_sets",
+        "agg_sales_daily": daily,
+        "agg_sales_monthly": monthly,
+        "agg_sales_category": category,
+        "agg_sales_product": product,
+        "rows_fetched_to_python": 1,
+        "timings_ms": {
+            "truncate": round(truncate_ms, 2),
+            "rollup": round(rollup_ms, 2),
+            "total": round(_elapsed_ms(started), 2),
+        },
+        "process_peak_rss_mb": peak_rss_mb(),
+    }
 
 
-def build_aggregates() -> dict:
+def build_aggregates_pandas() -> dict:
+    timings = {}
+    started = phase = time.perf_counter()
     engine = get_engine()
     conn = get_connection()
     fact = pd.read_sql("SELECT * FROM warehouse.fact_sales", conn)
     dim_products = pd.read_sql("SELECT product_key, category FROM warehouse.dim_products", conn)
+    timings["fetch"], phase = _elapsed_ms(phase), time.perf_counter()
 
     daily = (
         fact.groupby("date_key", as_index=False)
         .agg(total_orders=("date_key", "count"), total_quantity=("quantity", "sum"), total_sales=("total_sales", "sum"))
     )
-    
+
     # Truncate and load daily
     cur = conn.cursor()
     cur.execute("TRUNCATE TABLE warehouse.agg_sales_daily CASCADE")
     conn.commit()
     cur.close()
-    
+
     daily.to_sql("agg_sales_daily", engine, schema="warehouse", if_exists="append", index=False)
+    timings["daily"], phase = _elapsed_ms(phase), time.perf_counter()
 
     monthly = fact.copy()
-    monthly["year"] = pd.to_datetime(monthly["date_key"]).dt.year
-    monthly["month"] = pd.to_datetime(monthly["date_key"]).dt.month
+    fact_dates = pd.to_datetime(monthly["date_key"])
+    monthly["year"] = fact_dates.dt.year
+    monthly["month"] = fact_dates.dt.month
     monthly = (
         monthly.groupby(["year", "month"], as_index=False)
         .agg(total_orders=("date_key", "count"), total_quantity=("quantity", "sum"), total_sales=("total_sales", "sum"))
     )
-    
+
     # Truncate and load monthly
     cur = conn.cursor()
     cur.execute("TRUNCATE TABLE warehouse.agg_sales_monthly CASCADE")
     conn.commit()
     cur.close()
-    
+
     monthly.to_sql("agg_sales_monthly", engine, schema="warehouse", if_exists="append", index=False)
+    timings["monthly"], phase = _elapsed_ms(phase), time.perf_counter()
 
     category = fact.merge(dim_products, on="product_key", how="left")
     category = (
         category.groupby("category", as_index=False)
         .agg(total_orders=("date_key", "count"), total_quantity=("quantity", "sum"), total_sales=("total_sales", "sum"))
     )
-    
+
     # Truncate and load category
     cur = conn.cursor()
     cur.execute("TRUNCATE TABLE warehouse.agg_sales_category CASCADE")
     conn.commit()
     cur.close()
-    
+
     category.to_sql("agg_sales_category", engine, schema="warehouse", if_exists="append", index=False)
-    
+    timings["category"], phase = _elapsed_ms(phase), time.perf_counter()
+
+    product = (
+        fact.groupby("product_key", as_index=False)
+        .agg(total_orders=("date_key", "count"), total_quantity=("quantity", "sum"), total_sales=("total_sales", "sum"))
+    )
+
+    # Truncate and load product
+    cur = conn.cursor()
+    cur.execute("TRUNCATE TABLE warehouse.agg_sales_product CASCADE")
+    conn.commit()
+    cur.close()
+
+    product.to_sql("agg_sales_product", engine, schema="warehouse", if_exists="append", index=False)
+
+    ensure_state_tables(conn)
+    mark_aggregates_current(conn, len(daily))
+    conn.commit()
     conn.close()
+    timings["product"] = _elapsed_ms(phase)
+    timings["total"] = _elapsed_ms(started)
     return {
+        "method": "pandas",
         "agg_sales_daily": len(daily),
         "agg_sales_monthly": len(monthly),
         "agg_sales_category": len(category),
+        "agg_sales_product": len(product),
+        "rows_fetched_to_python": len(fact) + len(dim_products),
+        "timings_ms": {name: round(value, 2) for name, value in timings.items()},
+        "process_peak_rss_mb": peak_rss_mb(),
     }
 
 
-def apply_scd_type2(dimension_name: str) -> dict:
-    return {"dimension": dimension_name, "scd2_applied": True}
+def build_aggregates(method: str | None = None) -> dict:
+    """Fully rebuild the aggregate tables with the configured method."""
+    method = method or get_config("warehouse").get("aggregate_build", "grouping_sets")
+    if method == "pandas":
+        return build_aggregates_pandas()
+    return build_aggregates_grouping_sets()
 
 
-def main() -> dict:
+def build_dim_date_for_production() -> int:
+    """Fill dim_date across the production transaction date range."""
     conn = get_connection()
     transactions = pd.read_sql("SELECT MIN(transaction_date) AS min_date, MAX(transaction_date) AS max_date FROM production.transactions", conn)
     conn.close()
     min_date = transactions.iloc[0]["min_date"] or date.today()
     max_date = transactions.iloc[0]["max_date"] or date.today()
+    return build_dim_date(min_date, max_date)
 
-    results = {
-        "dim_date": build_dim_date(min_date, max_date),
-        "dim_customers": build_dim_customers(),
-        "dim_products": build_dim_products(),
-        "dim_payment_method": build_dim_payment_method(),
-        "fact_sales": build_fact_sales(),
-        "aggregates": build_aggregates(),
+
+def refresh_aggregates(fact_sales: dict) -> dict:
+    """Rebuild the aggregates unless the fact load already maintained them."""
+    if fact_sales and fact_sales.get("aggregates_maintained"):
+        return {"mode": "incremental", "window_start": fact_sales["window_start"]}
+    return build_aggregates()
+
+
+def publish_warehouse_version() -> int:
+    """Bump the warehouse data version so API caches drop responses built from older data."""
+    conn = get_connection()
+    ensure_state_tables(conn)
+    version = bump_data_version(conn, WAREHOUSE_DATASET)
+    conn.commit()
+    conn.close()
+    return version
+
+
+def warehouse_tasks(deps: list | None = None, since: date | None = None) -> list:
+    """Warehouse build as DAG tasks: the dimensions are independent, the fact load
+    joins all of them, the aggregates read the loaded facts and the new data
+    version is published once everything succeeded. ``since`` is passed to
+    ``build_fact_sales``."""
+    deps = list(deps or [])
+    dimensions = {
+        "dim_date": build_dim_date_for_production,
+        "dim_customers": build_dim_customers,
+        "dim_products": build_dim_products,
+        "dim_payment_method": build_dim_payment_method,
     }
-    return results
+    tasks = [{"name": name, "func": func, "deps": deps} for name, func in dimensions.items()]
+    fact_sales = partial(build_fact_sales, since=since) if since else build_fact_sales
+    tasks.append({"name": "fact_sales", "func": fact_sales, "deps": list(dimensions)})
+    tasks.append({"name": "aggregates", "func": refresh_aggregates, "deps": ["fact_sales"], "inputs": ["fact_sales"]})
+    tasks.append({"name": "publish_version", "func": publish_warehouse_version, "deps": ["aggregates"]})
+    return tasks
+
+
+def main(since: date | None = None) -> dict:
+    config = get_config("pipeline")
+    run = run_dag(warehouse_tasks(since=since), int(config.get("max_parallel_tasks", 4)))
+    failed = [task for task in run["tasks"] if task["status"] == "failed"]
+    if failed:
+        raise RuntimeError(f"Warehouse task {failed[0]['task']} failed: {failed[0]['error']}")
+    return {task["task"]: task["result"] for task in run["tasks"]}
 
 
 if __name__ == "__main__":
-    print(main())
+    parser = argparse.ArgumentParser(description="Build the warehouse schema from production.")
+    parser.add_argument(
+        "--verify-aggregates",
+        action="store_true",
+        help="compare the aggregate tables against a full recompute instead of loading",
+    )
+    args = parser.parse_args()
+    print(verify_aggregates() if args.verify_aggregates else main())
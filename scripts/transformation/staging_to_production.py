@@ -1,7 +1,65 @@
 import pandas as pd
-from sqlalchemy import text
+from psycopg2.extras import execute_values
 
-from scripts.db_connection import get_connection, get_engine
+from scripts.db_connection import get_config, get_connection, get_engine
+from scripts.pipeline_state import (
+    PRODUCTION_DATASET,
+    bump_data_version,
+    ensure_state_tables,
+    get_watermark,
+    set_watermark,
+)
+
+WATERMARK_STAGE = "staging_to_production"
+
+PRODUCTION_COLUMNS = {
+    "customers": ["customer_id", "first_name", "last_name", "email", "gender", "signup_date"],
+    "products": ["product_id", "product_name", "category", "price"],
+    "transactions": ["transaction_id", "customer_id", "transaction_date", "payment_method", "total_amount"],
+    "transaction_items": ["transaction_item_id", "transaction_id", "product_id", "quantity", "unit_price"],
+}
+
+PRIMARY_KEYS = {
+    "customers": "customer_id",
+    "products": "product_id",
+    "transactions": "transaction_id",
+    "transaction_items": "transaction_item_id",
+}
+
+# Column used as the high-water mark by the incremental strategy. Tables without
+# one are compared in full, and the upsert only rewrites rows that changed.
+DEFAULT_WATERMARKS = {
+    "customers": None,
+    "products": None,
+    "transactions": "transaction_date",
+    "transaction_items": "transaction_item_id",
+}
+
+# SQL form of cleanse_customer_data, cleanse_product_data and apply_business_rules.
+# Rows are de-duplicated first and filtered afterwards, matching the pandas order.
+PUSHDOWN_RULES = {
+    "customers": {
+        "dedupe_on": "customer_id",
+        "conditions": [
+            "customer_id IS NOT NULL",
+            "first_name IS NOT NULL",
+            "last_name IS NOT NULL",
+            "email IS NOT NULL",
+        ],
+    },
+    "products": {
+        "dedupe_on": "product_id",
+        "conditions": [
+            "product_id IS NOT NULL",
+            "product_name IS NOT NULL",
+            "category IS NOT NULL",
+            "price IS NOT NULL",
+            "price > 0",
+        ],
+    },
+    "transactions": {"dedupe_on": None, "conditions": ["total_amount > 0"]},
+    "transaction_items": {"dedupe_on": None, "conditions": ["quantity > 0", "unit_price > 0"]},
+}
 
 
 def cleanse_customer_data(df: pd.DataFrame) -> pd.DataFrame:
@@ -26,8 +84,75 @@ def apply_business_rules(df: pd.DataFrame, rule_type: str) -> pd.DataFrame:
     return df
 
 
+def _watermark_column(table_name: str):
+    configured = get_config("transformation").get("watermarks") or {}
+    return configured.get(table_name, DEFAULT_WATERMARKS[table_name])
+
+
+def compile_upsert_sql(table_name: str, source: str) -> str:
+    """INSERT ... ON CONFLICT DO UPDATE that skips rows whose values did not change."""
+    columns = PRODUCTION_COLUMNS[table_name]
+    key = PRIMARY_KEYS[table_name]
+    updates = [c for c in columns if c != key]
+    assignments = ", ".join(f"{c} = EXCLUDED.{c}" for c in updates)
+    current = ", ".join(f"tgt.{c}" for c in updates)
+    incoming = ", ".join(f"EXCLUDED.{c}" for c in updates)
+    return (
+        f"INSERT INTO production.{table_name} AS tgt ({', '.join(columns)}) {source} "
+        f"ON CONFLICT ({key}) DO UPDATE SET {assignments} "
+        f"WHERE ({current}) IS DISTINCT FROM ({incoming})"
+    )
+
+
+def upsert_to_production(df: pd.DataFrame, table_name: str, connection, batch_size: int = 5_000) -> int:
+    """Upsert dataframe rows in batches and return how many rows were inserted or changed."""
+    if df.empty:
+        return 0
+    frame = df[PRODUCTION_COLUMNS[table_name]]
+    records = list(frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None))
+    query = compile_upsert_sql(table_name, "VALUES %s")
+    written = 0
+    with connection.cursor() as cur:
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            execute_values(cur, query, batch, page_size=len(batch))
+            written += cur.rowcount
+    return written
+
+
+def read_staging(connection, table_name: str, strategy: str) -> pd.DataFrame:
+    """Read a staging table; the incremental strategy only reads rows at or past the watermark."""
+    column = _watermark_column(table_name) if strategy == "incremental" else None
+    watermark = get_watermark(connection, WATERMARK_STAGE, table_name) if column else None
+    if watermark is None:
+        return pd.read_sql(f"SELECT * FROM staging.{table_name}", connection)
+    return pd.read_sql(
+        f"SELECT * FROM staging.{table_name} WHERE {column} >= %(watermark)s",
+        connection,
+        params={"watermark": watermark},
+    )
+
+
 def load_to_production(df: pd.DataFrame, table_name: str, strategy: str) -> dict:
     """Load dataframe into production schema using the chosen strategy."""
+    if strategy == "incremental":
+        batch_size = int(get_config("transformation").get("upsert_batch_size", 5_000))
+        column = _watermark_column(table_name)
+        conn = get_connection()
+        rows = upsert_to_production(df, table_name, conn, batch_size)
+        watermark = df[column].max() if column and not df.empty else None
+        if watermark is not None:
+            set_watermark(conn, WATERMARK_STAGE, table_name, column, watermark, rows)
+        conn.commit()
+        conn.close()
+        return {
+            "table": f"production.{table_name}",
+            "rows_loaded": rows,
+            "rows_in_delta": len(df),
+            "strategy": strategy,
+            "watermark": None if watermark is None else str(watermark),
+        }
+
     if strategy == "truncate-insert":
         conn = get_connection()
         cur = conn.cursor()
@@ -35,19 +160,130 @@ def load_to_production(df: pd.DataFrame, table_name: str, strategy: str) -> dict
         conn.commit()
         cur.close()
         conn.close()
-    
+
     engine = get_engine()
     df.to_sql(table_name, engine, schema="production", if_exists="append", index=False)
     return {"table": f"production.{table_name}", "rows_loaded": len(df), "strategy": strategy}
 
 
-def main() -> dict:
+def _pushdown_select(table_name: str, watermark_column: str | None = None) -> str:
+    rules = PUSHDOWN_RULES[table_name]
+    cols = ", ".join(PRODUCTION_COLUMNS[table_name])
+    source = f"staging.{table_name}"
+    if rules["dedupe_on"]:
+        # ctid keeps the first physical row, like drop_duplicates(keep="first").
+        source = (
+            f"(SELECT DISTINCT ON ({rules['dedupe_on']}) {cols} FROM {source} "
+            f"ORDER BY {rules['dedupe_on']}, ctid)"
+        )
+    conditions = list(rules["conditions"])
+    if watermark_column:
+        conditions.append(f"{watermark_column} >= %(watermark)s")
+    where = " AND ".join(conditions) or "TRUE"
+    return f"SELECT {cols} FROM {source} AS src WHERE {where}"
+
+
+def compile_pushdown_sql(table_name: str) -> str:
+    """Compile the cleansing rules for a table into an INSERT ... SELECT run inside Postgres."""
+    cols = ", ".join(PRODUCTION_COLUMNS[table_name])
+    return f"INSERT INTO production.{table_name} ({cols}) {_pushdown_select(table_name)}"
+
+
+def run_pushdown(connection) -> list:
+    """Rebuild the production tables from staging without leaving the database."""
+    summary = []
+    with connection.cursor() as cur:
+        cur.execute(f"TRUNCATE TABLE {', '.join(f'production.{t}' for t in PRODUCTION_COLUMNS)}")
+        for table_name in PRODUCTION_COLUMNS:
+            cur.execute(compile_pushdown_sql(table_name))
+            summary.append(
+                {"table": f"production.{table_name}", "rows_loaded": cur.rowcount, "strategy": "truncate-insert"}
+            )
+    connection.commit()
+    return summary
+
+
+def run_pushdown_incremental(connection) -> list:
+    """Upsert only the staging rows at or past each table's watermark, inside Postgres."""
+    summary = []
+    with connection.cursor() as cur:
+        for table_name in PRODUCTION_COLUMNS:
+            column = _watermark_column(table_name)
+            watermark = get_watermark(connection, WATERMARK_STAGE, table_name) if column else None
+            filter_column = column if watermark is not None else None
+            params = {"watermark": watermark}
+            cur.execute(compile_upsert_sql(table_name, _pushdown_select(table_name, filter_column)), params)
+            rows = cur.rowcount
+            if column:
+                where = f" WHERE {column} >= %(watermark)s" if filter_column else ""
+                cur.execute(f"SELECT MAX({column}) FROM staging.{table_name}{where}", params)
+                latest = cur.fetchone()[0]
+                if latest is not None:
+                    watermark = latest
+                    set_watermark(connection, WATERMARK_STAGE, table_name, column, latest, rows)
+            summary.append({
+                "table": f"production.{table_name}",
+                "rows_loaded": rows,
+                "strategy": "incremental",
+                "watermark": None if watermark is None else str(watermark),
+            })
+    connection.commit()
+    return summary
+
+
+def run_pushdown_delta(connection) -> dict:
+    """Upsert every staging row, for when staging holds only a micro-batch.
+
+    Watermarks are ignored and left untouched: late rows in the batch are loaded
+    even if they fall before the high-water mark. ``min_transaction_date`` is the
+    oldest date the batch touched, including transactions that only gained items,
+    so the warehouse can reload facts from there.
+    """
+    summary = []
+    ensure_state_tables(connection)
+    with connection.cursor() as cur:
+        for table_name in PRODUCTION_COLUMNS:
+            cur.execute(compile_upsert_sql(table_name, _pushdown_select(table_name)))
+            summary.append({"table": f"production.{table_name}", "rows_loaded": cur.rowcount, "strategy": "delta"})
+        cur.execute(
+            """
+            SELECT MIN(t.transaction_date) FROM production.transactions t
+            WHERE t.transaction_id IN (
+                SELECT transaction_id FROM staging.transactions
+                UNION SELECT transaction_id FROM staging.transaction_items
+            )
+            """
+        )
+        min_transaction_date = cur.fetchone()[0]
+    bump_data_version(connection, PRODUCTION_DATASET)
+    connection.commit()
+    return {"summary": summary, "min_transaction_date": min_transaction_date}
+
+
+def _publish(connection) -> None:
+    """Bump the production version so checkpoints see the change, then close the connection."""
+    bump_data_version(connection, PRODUCTION_DATASET)
+    connection.commit()
+    connection.close()
+
+
+def main(mode: str | None = None, strategy: str | None = None) -> dict:
+    config = get_config("transformation")
+    mode = mode or config.get("mode", "pushdown")
+    strategy = strategy or config.get("strategy", "truncate-insert")
     conn = get_connection()
+    ensure_state_tables(conn)
+    conn.commit()
 
-    customers = pd.read_sql("SELECT * FROM staging.customers", conn)
-    products = pd.read_sql("SELECT * FROM staging.products", conn)
-    transactions = pd.read_sql("SELECT * FROM staging.transactions", conn)
-    items = pd.read_sql("SELECT * FROM staging.transaction_items", conn)
+    if mode == "pushdown":
+        summary = run_pushdown_incremental(conn) if strategy == "incremental" else run_pushdown(conn)
+        _publish(conn)
+        return {"status": "success", "mode": mode, "strategy": strategy, "summary": summary}
+
+    customers = read_staging(conn, "customers", strategy)
+    products = read_staging(conn, "products", strategy)
+    transactions = read_staging(conn, "transactions", strategy)
+    items = read_staging(conn, "transaction_items", strategy)
 
     customers = cleanse_customer_data(customers)
     products = cleanse_product_data(products)
@@ -55,13 +291,13 @@ def main() -> dict:
     items = apply_business_rules(items, "items")
 
     summary = []
-    summary.append(load_to_production(customers, "customers", "truncate-insert"))
-    summary.append(load_to_production(products, "products", "truncate-insert"))
-    summary.append(load_to_production(transactions, "transactions", "truncate-insert"))
-    summary.append(load_to_production(items, "transaction_items", "truncate-insert"))
-    
-    conn.close()
-    return {"status": "success", "summary": summary}
+    summary.append(load_to_production(customers, "customers", strategy))
+    summary.append(load_to_production(products, "products", strategy))
+    summary.append(load_to_production(transactions, "transactions", strategy))
+    summary.append(load_to_production(items, "transaction_items", strategy))
+
+    _publish(conn)
+    return {"status": "success", "mode": mode, "strategy": strategy, "summary": summary}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,17 @@
+CREATE SCHEMA IF NOT EXISTS pipeline;
+
+CREATE TABLE IF NOT EXISTS pipeline.watermarks (
+    stage TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    watermark_column TEXT NOT NULL,
+    watermark_value TEXT,
+    rows_processed BIGINT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (stage, table_name)
+);
+
+CREATE TABLE IF NOT EXISTS pipeline.data_versions (
+    dataset TEXT PRIMARY KEY,
+    version BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
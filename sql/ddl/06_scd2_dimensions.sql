@@ -0,0 +1,10 @@
+-- SCD Type 2 support: attribute hashes and lookups on the current version
+ALTER TABLE warehouse.dim_customers ADD COLUMN IF NOT EXISTS row_hash TEXT;
+ALTER TABLE warehouse.dim_products ADD COLUMN IF NOT EXISTS row_hash TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_dim_customers_current
+    ON warehouse.dim_customers (customer_id) WHERE is_current;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_dim_products_current
+    ON warehouse.dim_products (product_id) WHERE is_current;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_dim_payment_method
+    ON warehouse.dim_payment_method (payment_method);
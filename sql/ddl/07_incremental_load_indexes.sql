@@ -0,0 +1,4 @@
+-- Indexes used by the incremental production and warehouse loads
+CREATE INDEX IF NOT EXISTS idx_transactions_date ON production.transactions (transaction_date);
+CREATE INDEX IF NOT EXISTS idx_items_transaction ON production.transaction_items (transaction_id);
+CREATE INDEX IF NOT EXISTS idx_fact_sales_date ON warehouse.fact_sales (date_key);
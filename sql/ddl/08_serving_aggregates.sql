@@ -0,0 +1,7 @@
+-- Serving aggregates read by the analytics API instead of scanning fact_sales
+CREATE TABLE IF NOT EXISTS warehouse.agg_sales_product (
+    product_key INT PRIMARY KEY,
+    total_orders INT,
+    total_quantity INT,
+    total_sales NUMERIC(12,2)
+);
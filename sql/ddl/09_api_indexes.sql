@@ -0,0 +1,3 @@
+-- Keyset pagination of fact_sales by customer for the API's detail endpoints
+CREATE INDEX IF NOT EXISTS idx_fact_sales_customer_sales_key ON warehouse.fact_sales (customer_key, sales_key);
+CREATE INDEX IF NOT EXISTS idx_dim_customers_customer_id ON warehouse.dim_customers (customer_id);
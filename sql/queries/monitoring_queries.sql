@@ -1,32 +1,40 @@
 -- Monitoring queries for pipeline health
+-- None of these scan a table: row counts come from the planner statistics and
+-- freshness probes are MAX() over indexed columns (see 07_incremental_load_indexes.sql).
+-- Exact COUNT(*)s run only with `pipeline_monitor --exact`.
 
--- Row counts by schema
-SELECT 'staging.customers' AS table_name, COUNT(*) AS row_count FROM staging.customers
-UNION ALL
-SELECT 'staging.products', COUNT(*) FROM staging.products
-UNION ALL
-SELECT 'staging.transactions', COUNT(*) FROM staging.transactions
-UNION ALL
-SELECT 'staging.transaction_items', COUNT(*) FROM staging.transaction_items;
+-- name: table_stats
+-- Estimated rows scale reltuples/relpages to the current size, as the planner does.
+SELECT n.nspname || '.' || c.relname AS table_name,
+       CASE
+           WHEN c.relpages > 0 AND c.reltuples >= 0
+               THEN (c.reltuples / c.relpages * (pg_relation_size(c.oid) / current_setting('block_size')::int))::bigint
+           ELSE COALESCE(s.n_live_tup, 0)
+       END AS estimated_rows,
+       s.n_dead_tup AS dead_rows,
+       s.n_tup_ins AS rows_inserted,
+       s.n_tup_upd + s.n_tup_del AS rows_changed,
+       pg_total_relation_size(c.oid) AS total_bytes,
+       GREATEST(s.last_analyze, s.last_autoanalyze) AS last_analyzed
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+WHERE c.relkind IN ('r', 'p')
+  AND n.nspname IN ('staging', 'production', 'warehouse', 'pipeline')
+ORDER BY 1;
 
-SELECT 'production.customers' AS table_name, COUNT(*) AS row_count FROM production.customers
-UNION ALL
-SELECT 'production.products', COUNT(*) FROM production.products
-UNION ALL
-SELECT 'production.transactions', COUNT(*) FROM production.transactions
-UNION ALL
-SELECT 'production.transaction_items', COUNT(*) FROM production.transaction_items;
+-- name: freshness_transactions
+SELECT MAX(transaction_date) FROM production.transactions;
 
-SELECT 'warehouse.dim_customers' AS table_name, COUNT(*) AS row_count FROM warehouse.dim_customers
-UNION ALL
-SELECT 'warehouse.dim_products', COUNT(*) FROM warehouse.dim_products
-UNION ALL
-SELECT 'warehouse.fact_sales', COUNT(*) FROM warehouse.fact_sales;
+-- name: freshness_fact_sales
+SELECT MAX(date_key) FROM warehouse.fact_sales;
 
--- Latest transaction date
-SELECT MAX(transaction_date) AS latest_transaction_date
-FROM production.transactions;
+-- name: freshness_agg_sales_daily
+SELECT MAX(date_key) FROM warehouse.agg_sales_daily;
 
--- Aggregate tables freshness
-SELECT MAX(date_key) AS latest_agg_date
-FROM warehouse.agg_sales_daily;
+-- name: freshness_warehouse_published
+SELECT MAX(updated_at) FROM pipeline.data_versions;
+
+-- name: lag_hours_warehouse_published
+-- Computed in the database so the server's clock and time zone are used.
+SELECT EXTRACT(EPOCH FROM LOCALTIMESTAMP - MAX(updated_at)) / 3600 FROM pipeline.data_versions;
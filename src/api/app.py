@@ -1,30 +1,137 @@
-from fastapi import FastAPI, HTTPException
-from sqlalchemy import text
+import csv
+import io
+import json
+from contextlib import asynccontextmanager
+from datetime import date
 
-from scripts.db_connection import get_engine
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
+from scripts.db_connection import get_config
+from scripts.pipeline_state import WAREHOUSE_DATASET, WAREHOUSE_WATERMARK_STAGE
+from src.api import db
+from src.api.cache import ResponseCache, VersionProbe
 
-app = FastAPI(title="Ecommerce Analytics API", version="1.0.0")
-engine = get_engine()
 
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    yield
+    await db.dispose_async_engine()
 
-def _fetch_all(query: str, params: dict | None = None) -> list[dict]:
+
+app = FastAPI(title="Ecommerce Analytics API", version="1.0.0", lifespan=lifespan)
+
+_api_config = get_config("api")
+response_cache = ResponseCache(
+    maxsize=int(_api_config.get("cache_maxsize", 256)),
+    ttl_seconds=float(_api_config.get("cache_ttl_seconds", 300)),
+)
+limiter = db.ConcurrencyLimiter(
+    int(_api_config.get("max_concurrent_queries", 20)),
+    float(_api_config.get("max_queue_wait_seconds", 0.5)),
+)
+export_limiter = db.ConcurrencyLimiter(
+    int(_api_config.get("max_concurrent_exports", 2)),
+    float(_api_config.get("max_queue_wait_seconds", 0.5)),
+)
+DEFAULT_TIMEOUT_MS = int(_api_config.get("statement_timeout_ms", 5000))
+EXPORT_TIMEOUT_MS = int(_api_config.get("export_statement_timeout_ms", 600_000))
+EXPORT_CHUNK_ROWS = int(_api_config.get("export_chunk_rows", 5000))
+MAX_PAGE_SIZE = int(_api_config.get("max_page_size", 1000))
+STATEMENT_TIMEOUTS_MS = _api_config.get("statement_timeouts_ms") or {}
+
+
+async def _fetch_all(query: str, params: dict | None = None, timeout_ms: int = DEFAULT_TIMEOUT_MS) -> list[dict]:
+    async with limiter:
+        try:
+            return await db.fetch_all(query, params, timeout_ms)
+        except Exception as exc:
+            if getattr(getattr(exc, "orig", None), "sqlstate", None) == "57014":
+                raise HTTPException(status_code=503, detail="Query exceeded its statement timeout")
+            raise HTTPException(status_code=500, detail=str(exc))
+
+
+async def _fetch_warehouse_version():
     try:
-        with engine.begin() as conn:
-            result = conn.execute(text(query), params or {})
-            return [dict(row) for row in result.mappings().all()]
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=str(exc))
+        return await db.fetch_scalar(
+            "SELECT version FROM pipeline.data_versions WHERE dataset = :dataset",
+            {"dataset": WAREHOUSE_DATASET},
+        )
+    except Exception:
+        # No published version yet: entries still expire through the TTL.
+        return None
+
+
+async def _aggregates_fresh() -> bool:
+    """True unless fact_sales was reloaded after the aggregates were last brought up to date."""
+    try:
+        fresh = await db.fetch_scalar(
+            """
+            SELECT COALESCE(a.updated_at >= f.updated_at, FALSE)
+            FROM pipeline.watermarks f
+            LEFT JOIN pipeline.watermarks a ON a.stage = f.stage AND a.table_name = 'aggregates'
+            WHERE f.stage = :stage AND f.table_name = 'fact_sales'
+            """,
+            {"stage": WAREHOUSE_WATERMARK_STAGE},
+        )
+    except Exception:
+        return False
+    return fresh is not False
+
+
+warehouse_version = VersionProbe(
+    _fetch_warehouse_version, float(_api_config.get("version_check_seconds", 5))
+)
+
+
+async def _cached_response(
+    request: Request, query: str, params: dict | None = None, base_query: str | None = None
+) -> Response:
+    """Serve a query result from the cache, keyed by warehouse version, path and parameters.
+
+    ``query`` may read a serving aggregate; ``base_query`` then computes the same
+    result from fact_sales and is used instead while the aggregates are stale.
+    Answers ``If-None-Match`` with 304 when the client already has the current body.
+    """
+    version = await warehouse_version.current()
+    key = (version, request.url.path, tuple(sorted((params or {}).items())))
+    cached = response_cache.get(key)
+    if cached is None:
+        timeout_ms = int(STATEMENT_TIMEOUTS_MS.get(request.url.path, DEFAULT_TIMEOUT_MS))
+        if base_query is not None and not await _aggregates_fresh():
+            query = base_query
+        # jsonable_encoder keeps NUMERIC columns as JSON numbers, as FastAPI's own responses do.
+        body = json.dumps(jsonable_encoder(await _fetch_all(query, params, timeout_ms))).encode("utf-8")
+        etag = response_cache.put(key, body)
+        status = "MISS"
+    else:
+        (body, etag), status = cached, "HIT"
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Cache": status}
+    if version is not None:
+        headers["X-Data-Version"] = str(version)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @app.get("/health")
-def health() -> dict:
+async def health() -> dict:
     return {"status": "ok"}
 
 
 @app.get("/analytics/top-products")
-def top_products(limit: int = 10) -> list[dict]:
+async def top_products(request: Request, limit: int = 10) -> Response:
     query = """
+        SELECT p.product_name, p.category, SUM(a.total_sales) AS total_revenue
+        FROM warehouse.agg_sales_product a
+        JOIN warehouse.dim_products p ON a.product_key = p.product_key
+        GROUP BY p.product_name, p.category
+        ORDER BY total_revenue DESC
+        LIMIT :limit
+    """
+    base_query = """
         SELECT p.product_name, p.category, SUM(f.total_sales) AS total_revenue
         FROM warehouse.fact_sales f
         JOIN warehouse.dim_products p ON f.product_key = p.product_key
@@ -32,38 +139,218 @@ def top_products(limit: int = 10) -> list[dict]:
         ORDER BY total_revenue DESC
         LIMIT :limit
     """
-    return _fetch_all(query, {"limit": limit})
+    return await _cached_response(request, query, {"limit": limit}, base_query)
 
 
 @app.get("/analytics/monthly-trend")
-def monthly_trend() -> list[dict]:
+async def monthly_trend(request: Request) -> Response:
     query = """
+        SELECT year, month, total_sales AS revenue
+        FROM warehouse.agg_sales_monthly
+        ORDER BY year, month
+    """
+    base_query = """
         SELECT d.year, d.month, SUM(f.total_sales) AS revenue
         FROM warehouse.fact_sales f
         JOIN warehouse.dim_date d ON f.date_key = d.date_key
         GROUP BY d.year, d.month
         ORDER BY d.year, d.month
     """
-    return _fetch_all(query)
+    return await _cached_response(request, query, base_query=base_query)
 
 
 @app.get("/analytics/category-summary")
-def category_summary() -> list[dict]:
+async def category_summary(request: Request) -> Response:
     query = """
         SELECT category, total_orders, total_quantity, total_sales
         FROM warehouse.agg_sales_category
         ORDER BY total_sales DESC
     """
-    return _fetch_all(query)
+    base_query = """
+        SELECT p.category, COUNT(*) AS total_orders, SUM(f.quantity) AS total_quantity,
+               SUM(f.total_sales) AS total_sales
+        FROM warehouse.fact_sales f
+        JOIN warehouse.dim_products p ON p.product_key = f.product_key
+        GROUP BY p.category
+        ORDER BY total_sales DESC
+    """
+    return await _cached_response(request, query, base_query=base_query)
 
 
 @app.get("/analytics/summary")
-def sales_summary() -> list[dict]:
+async def sales_summary(request: Request) -> Response:
     query = """
+        SELECT
+            COALESCE(SUM(total_orders), 0) AS total_orders,
+            SUM(total_quantity) AS total_quantity,
+            SUM(total_sales) AS total_revenue
+        FROM warehouse.agg_sales_daily
+    """
+    base_query = """
         SELECT
             COUNT(*) AS total_orders,
             SUM(quantity) AS total_quantity,
             SUM(total_sales) AS total_revenue
         FROM warehouse.fact_sales
     """
-    return _fetch_all(query)
+    return await _cached_response(request, query, base_query=base_query)
+
+
+SALES_COLUMNS = """
+    f.sales_key, f.date_key, c.customer_id, p.product_id, p.product_name, p.category,
+    f.quantity, f.total_sales
+"""
+
+
+def _sales_query(start_date=None, end_date=None, customer_id=None, after=None, limit=None) -> tuple:
+    """Fact-level sales ordered by sales_key; ``after`` and ``limit`` page through them by key."""
+    filters, params = [], {}
+    if start_date is not None:
+        filters.append("f.date_key >= :start_date")
+        params["start_date"] = start_date
+    if end_date is not None:
+        filters.append("f.date_key <= :end_date")
+        params["end_date"] = end_date
+    if customer_id is not None:
+        filters.append(
+            "f.customer_key IN (SELECT customer_key FROM warehouse.dim_customers WHERE customer_id = :customer_id)"
+        )
+        params["customer_id"] = customer_id
+    if after is not None:
+        filters.append("f.sales_key > :after")
+        params["after"] = after
+    query = f"""
+        SELECT {SALES_COLUMNS}
+        FROM warehouse.fact_sales f
+        LEFT JOIN warehouse.dim_customers c ON c.customer_key = f.customer_key
+        LEFT JOIN warehouse.dim_products p ON p.product_key = f.product_key
+        {"WHERE " + " AND ".join(filters) if filters else ""}
+        ORDER BY f.sales_key
+    """
+    if limit is not None:
+        query += " LIMIT :limit"
+        params["limit"] = limit
+    return query, params
+
+
+async def _sales_page(after, limit, **filters) -> dict:
+    query, params = _sales_query(after=after, limit=limit, **filters)
+    rows = await _fetch_all(query, params)
+    return {
+        "items": rows,
+        "next_after": rows[-1]["sales_key"] if len(rows) == limit else None,
+    }
+
+
+@app.get("/sales")
+async def sales(
+    start_date: date | None = None,
+    end_date: date | None = None,
+    customer_id: int | None = None,
+    after: int | None = Query(None, description="sales_key of the last row of the previous page"),
+    limit: int = Query(100, ge=1),
+) -> dict:
+    """Sales rows in sales_key order. Pass ``next_after`` back as ``after`` for the next page."""
+    limit = min(limit, MAX_PAGE_SIZE)
+    return await _sales_page(after, limit, start_date=start_date, end_date=end_date, customer_id=customer_id)
+
+
+@app.get("/customers/{customer_id}/sales")
+async def customer_sales(
+    customer_id: int,
+    after: int | None = None,
+    limit: int = Query(100, ge=1),
+) -> dict:
+    return await _sales_page(after, min(limit, MAX_PAGE_SIZE), customer_id=customer_id)
+
+
+def _ndjson_chunk(rows: list, first: bool) -> str:
+    return "".join(json.dumps(row) + "\n" for row in rows)
+
+
+def _csv_chunk(rows: list, first: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+    if first:
+        writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", _ndjson_chunk),
+    "csv": ("text/csv", _csv_chunk),
+}
+
+
+class _PermitStream:
+    """Async iterator over ``chunks`` that returns a limiter permit exactly once.
+
+    The permit goes back when the chunks run out or fail, or on ``aclose``,
+    which the response also runs as a background task, so a client that
+    disconnects mid-stream cannot leak it.
+    """
+
+    def __init__(self, chunks, limiter: db.ConcurrencyLimiter):
+        self._chunks = chunks
+        self._limiter = limiter
+        self._released = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self._chunks.__anext__()
+        except BaseException:
+            await self.aclose()
+            raise
+
+    async def aclose(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        try:
+            await self._chunks.aclose()
+        finally:
+            self._limiter.release()
+
+
+@app.get("/sales/export")
+async def export_sales(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    start_date: date | None = None,
+    end_date: date | None = None,
+    customer_id: int | None = None,
+) -> StreamingResponse:
+    """Stream every matching sales row from a server-side cursor, one chunk in memory at a time."""
+    query, params = _sales_query(start_date, end_date, customer_id)
+    media_type, render = EXPORT_FORMATS[format]
+    # Admission is decided before the response starts so overload still gets a 503.
+    await export_limiter.acquire()
+
+    async def body():
+        first = True
+        async for rows in db.stream_rows(query, params, EXPORT_TIMEOUT_MS, EXPORT_CHUNK_ROWS):
+            if rows:
+                # Same encoding as the /sales pages: amounts stay numbers, dates ISO strings.
+                yield render(jsonable_encoder(rows), first)
+                first = False
+
+    stream = _PermitStream(body(), export_limiter)
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="sales.{format}"'},
+        background=BackgroundTask(stream.aclose),
+    )
+
+
+@app.get("/cache/metrics")
+async def cache_metrics() -> dict:
+    return {
+        **response_cache.stats(),
+        "warehouse_version": await warehouse_version.current(),
+        "concurrency": limiter.stats(),
+        "exports": export_limiter.stats(),
+    }
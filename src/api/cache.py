@@ -0,0 +1,85 @@
+"""In-process response cache for the analytics API.
+
+Entries are keyed by the warehouse data version, so a pipeline run that
+publishes a new version makes every older entry unreachable; the LRU bound and
+TTL then clean them up. Each entry keeps the serialised body and its ETag.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with a per-entry time-to-live."""
+
+    def __init__(self, maxsize: int = 256, ttl_seconds: float = 300):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def get(self, key):
+        """Return ``(body, etag)`` for a live entry, or None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] <= now:
+                del self._entries[key]
+                self._stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0], entry[1]
+
+    def put(self, key, body: bytes) -> str:
+        """Store a body and return its ETag."""
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        with self._lock:
+            self._entries[key] = (body, etag, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return etag
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries), maxsize=self.maxsize)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else None
+        return stats
+
+
+class VersionProbe:
+    """Remembers the latest warehouse version for a few seconds between lookups.
+
+    ``fetch`` is a coroutine function; concurrent callers share one lookup.
+    """
+
+    def __init__(self, fetch, check_seconds: float = 5):
+        self._fetch = fetch
+        self.check_seconds = check_seconds
+        self._lock = asyncio.Lock()
+        self._version = None
+        self._checked_at = None
+
+    def _fresh(self) -> bool:
+        return self._checked_at is not None and time.monotonic() - self._checked_at < self.check_seconds
+
+    async def current(self):
+        if not self._fresh():
+            async with self._lock:
+                if not self._fresh():
+                    self._version = await self._fetch()
+                    self._checked_at = time.monotonic()
+        return self._version
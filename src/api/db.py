@@ -0,0 +1,110 @@
+"""Async, read-only data access for the analytics API.
+
+Queries run on an asyncpg engine with its own bounded pool. Every query runs in
+a read-only transaction with a statement timeout, and ``ConcurrencyLimiter``
+caps the number of requests allowed to wait on the database at once.
+"""
+import asyncio
+import threading
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from scripts.db_connection import get_config, get_db_config
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_async_engine():
+    """Return the API's async engine, creating its pool on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                cfg = get_db_config()
+                api = get_config("api")
+                _engine = create_async_engine(
+                    f"postgresql+asyncpg://{cfg['user']}:{cfg['password']}@{cfg['host']}:{cfg['port']}/{cfg['name']}",
+                    pool_size=int(api.get("pool_size", 10)),
+                    max_overflow=int(api.get("max_overflow", 0)),
+                    pool_timeout=float(api.get("pool_timeout_seconds", 5)),
+                    pool_recycle=int(api.get("pool_recycle_seconds", 1800)),
+                    pool_pre_ping=True,
+                )
+    return _engine
+
+
+async def dispose_async_engine() -> None:
+    global _engine
+    if _engine is not None:
+        engine, _engine = _engine, None
+        await engine.dispose()
+
+
+async def fetch_all(query: str, params: dict | None = None, timeout_ms: int = 5000) -> list[dict]:
+    """Run a query in a read-only transaction that Postgres cancels after ``timeout_ms``."""
+    async with get_async_engine().connect() as conn:
+        await conn.execute(text("SET TRANSACTION READ ONLY"))
+        await conn.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+        result = await conn.execute(text(query), params or {})
+        rows = [dict(row) for row in result.mappings().all()]
+        await conn.rollback()
+    return rows
+
+
+async def stream_rows(query: str, params: dict | None = None, timeout_ms: int = 0, chunk_size: int = 5000):
+    """Yield a query's rows in lists of ``chunk_size`` from a server-side cursor.
+
+    Only one chunk is held in memory at a time, whatever the size of the result.
+    """
+    async with get_async_engine().connect() as conn:
+        await conn.execute(text("SET TRANSACTION READ ONLY"))
+        await conn.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+        result = await conn.stream(text(query), params or {})
+        async for partition in result.mappings().partitions(chunk_size):
+            yield [dict(row) for row in partition]
+        await conn.rollback()
+
+
+async def fetch_scalar(query: str, params: dict | None = None, timeout_ms: int = 1000):
+    rows = await fetch_all(query, params, timeout_ms)
+    return next(iter(rows[0].values())) if rows else None
+
+
+class ConcurrencyLimiter:
+    """Admit at most ``limit`` requests at a time; reject with 503 after ``max_wait_seconds``."""
+
+    def __init__(self, limit: int, max_wait_seconds: float = 0.5):
+        self.limit = limit
+        self.max_wait_seconds = max_wait_seconds
+        self._semaphore = asyncio.Semaphore(limit)
+        self.rejected = 0
+        self.active = 0
+
+    async def acquire(self) -> None:
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Too many concurrent requests",
+                headers={"Retry-After": "1"},
+            )
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "active": self.active, "rejected": self.rejected}
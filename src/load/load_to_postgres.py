@@ -1,15 +1,9 @@
 import pandas as pd
-from sqlalchemy import create_engine
-import yaml
 
-def load_data():
-    with open("config/config.yaml", "r") as f:
-        config = yaml.safe_load(f)
+from scripts.db_connection import get_engine
 
-    db = config["database"]
-    engine = create_engine(
-        f"postgresql+psycopg2://{db['user']}:{db['password']}@{db['host']}:{db['port']}/{db['dbname']}"
-    )
+def load_data():
+    engine = get_engine()
 
     df = pd.read_csv("data/raw/orders.csv")
 
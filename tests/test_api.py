@@ -0,0 +1,183 @@
+import asyncio
+import json
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from src.api import app as api
+from src.api.cache import ResponseCache, VersionProbe
+from src.api.db import ConcurrencyLimiter
+
+
+def _client(monkeypatch, versions, aggregates_fresh=True):
+	calls = []
+
+	async def fresh():
+		return aggregates_fresh
+
+	async def fetch_all(query, params=None, timeout_ms=None):
+		calls.append(params if params is not None else query)
+		return [{"total_orders": len(calls)}]
+
+	async def latest_version():
+		return versions[-1]
+
+	monkeypatch.setattr(api, "_fetch_all", fetch_all)
+	monkeypatch.setattr(api, "_aggregates_fresh", fresh)
+	monkeypatch.setattr(api, "warehouse_version", VersionProbe(latest_version, check_seconds=0))
+	monkeypatch.setattr(api, "response_cache", ResponseCache(maxsize=8, ttl_seconds=60))
+	return TestClient(api.app), calls
+
+
+def test_responses_are_cached_until_the_warehouse_version_changes(monkeypatch):
+	versions = [1]
+	client, calls = _client(monkeypatch, versions)
+
+	first = client.get("/analytics/summary")
+	second = client.get("/analytics/summary")
+	assert first.json() == second.json() == [{"total_orders": 1}]
+	assert (first.headers["x-cache"], second.headers["x-cache"]) == ("MISS", "HIT")
+	assert len(calls) == 1
+
+	versions.append(2)
+	third = client.get("/analytics/summary")
+	assert third.headers["x-cache"] == "MISS"
+	assert third.json() == [{"total_orders": 2}]
+	assert client.get("/cache/metrics").json()["hits"] == 1
+
+
+def test_cached_responses_keep_numeric_columns_numeric(monkeypatch):
+	client, _ = _client(monkeypatch, [1])
+
+	async def fetch_all(query, params=None, timeout_ms=None):
+		return [{"product_name": "Lamp", "total_revenue": Decimal("12.50"), "total_orders": 3, "first_day": date(2024, 1, 2)}]
+
+	monkeypatch.setattr(api, "_fetch_all", fetch_all)
+	for _ in range(2):
+		response = client.get("/analytics/top-products")
+		assert response.json() == [{"product_name": "Lamp", "total_revenue": 12.5, "total_orders": 3, "first_day": "2024-01-02"}]
+	assert isinstance(response.json()[0]["total_revenue"], float)
+	assert response.headers["x-cache"] == "HIT"
+
+
+def test_query_parameters_are_part_of_the_key(monkeypatch):
+	client, calls = _client(monkeypatch, [1])
+	client.get("/analytics/top-products?limit=5")
+	client.get("/analytics/top-products?limit=10")
+	client.get("/analytics/top-products?limit=5")
+	assert calls == [{"limit": 5}, {"limit": 10}]
+
+
+def test_if_none_match_returns_not_modified(monkeypatch):
+	client, _ = _client(monkeypatch, [1])
+	etag = client.get("/analytics/monthly-trend").headers["etag"]
+	response = client.get("/analytics/monthly-trend", headers={"If-None-Match": etag})
+	assert response.status_code == 304
+	assert response.content == b""
+
+
+def test_response_cache_evicts_least_recently_used_and_expired_entries():
+	cache = ResponseCache(maxsize=2, ttl_seconds=60)
+	cache.put("a", b"1")
+	cache.put("b", b"2")
+	cache.get("a")
+	cache.put("c", b"3")
+	assert cache.get("b") is None
+	assert cache.get("a")[0] == b"1"
+
+	expired = ResponseCache(maxsize=2, ttl_seconds=0)
+	expired.put("a", b"1")
+	assert expired.get("a") is None
+	assert expired.stats()["expired"] == 1
+
+
+def test_concurrency_limiter_rejects_with_503_when_saturated():
+	async def scenario():
+		limiter = ConcurrencyLimiter(limit=1, max_wait_seconds=0.01)
+		async with limiter:
+			with pytest.raises(HTTPException) as excinfo:
+				async with limiter:
+					pass
+		async with limiter:
+			pass
+		return excinfo.value, limiter.stats()
+
+	error, stats = asyncio.run(scenario())
+	assert error.status_code == 503
+	assert error.headers == {"Retry-After": "1"}
+	assert stats == {"limit": 1, "active": 0, "rejected": 1}
+
+
+def test_endpoints_read_serving_aggregates_and_fall_back_when_stale(monkeypatch):
+	client, calls = _client(monkeypatch, [1])
+	client.get("/analytics/summary")
+	client.get("/analytics/monthly-trend")
+	assert "FROM warehouse.agg_sales_daily" in calls[0]
+	assert "FROM warehouse.agg_sales_monthly" in calls[1]
+
+	client, calls = _client(monkeypatch, [1], aggregates_fresh=False)
+	client.get("/analytics/summary")
+	client.get("/analytics/monthly-trend")
+	assert all("FROM warehouse.fact_sales" in query for query in calls)
+
+
+def test_sales_pages_by_sales_key(monkeypatch):
+	client, calls = _client(monkeypatch, [1])
+
+	async def page(query, params=None, timeout_ms=None):
+		calls.append((query, params))
+		start = params.get("after") or 0
+		return [{"sales_key": key} for key in range(start + 1, start + 1 + params["limit"])]
+
+	monkeypatch.setattr(api, "_fetch_all", page)
+	body = client.get("/sales?customer_id=7&limit=3&after=10").json()
+	query, params = calls[-1]
+	assert [row["sales_key"] for row in body["items"]] == [11, 12, 13]
+	assert body["next_after"] == 13
+	assert "f.sales_key > :after" in query and "ORDER BY f.sales_key" in query
+	assert params == {"customer_id": 7, "after": 10, "limit": 3}
+	assert client.get("/sales?limit=5000").status_code == 200
+	assert calls[-1][1]["limit"] == api.MAX_PAGE_SIZE
+
+
+def test_export_streams_chunks_as_csv_and_ndjson(monkeypatch):
+	async def stream_rows(query, params=None, timeout_ms=0, chunk_size=5000):
+		for start in (1, 3):
+			yield [{"sales_key": key, "total_sales": Decimal(key) * Decimal("1.5")} for key in (start, start + 1)]
+
+	monkeypatch.setattr(api.db, "stream_rows", stream_rows)
+	monkeypatch.setattr(api, "export_limiter", ConcurrencyLimiter(limit=1))
+	client = TestClient(api.app)
+
+	csv_body = client.get("/sales/export?format=csv").text
+	assert csv_body.splitlines() == ["sales_key,total_sales", "1,1.5", "2,3.0", "3,4.5", "4,6.0"]
+
+	lines = client.get("/sales/export?format=ndjson").text.splitlines()
+	assert [json.loads(line)["sales_key"] for line in lines] == [1, 2, 3, 4]
+	assert json.loads(lines[0])["total_sales"] == 1.5
+	assert api.export_limiter.stats()["active"] == 0
+	assert client.get("/sales/export?format=xml").status_code == 422
+
+
+def test_export_permit_is_released_when_the_stream_never_finishes(monkeypatch):
+	async def stream_rows(query, params=None, timeout_ms=0, chunk_size=5000):
+		while True:
+			yield [{"sales_key": 1}]
+
+	async def scenario():
+		monkeypatch.setattr(api.db, "stream_rows", stream_rows)
+		monkeypatch.setattr(api, "export_limiter", ConcurrencyLimiter(limit=1))
+		abandoned = await api.export_sales(format="ndjson")
+		assert api.export_limiter.stats()["active"] == 1
+		await abandoned.background()
+
+		partial = await api.export_sales(format="ndjson")
+		await partial.body_iterator.__anext__()
+		await partial.background()
+		await partial.background()
+		return api.export_limiter.stats()
+
+	assert asyncio.run(scenario())["active"] == 0
@@ -0,0 +1,101 @@
+import asyncio
+
+import httpx
+import psycopg2
+import pytest
+
+from scripts.benchmarks import api_load_test, pipeline_stages
+from scripts.data_generation import generate_data
+from src.api import app as api
+from src.api.cache import VersionProbe
+from src.api.db import ConcurrencyLimiter
+
+
+def test_compare_to_baseline_flags_only_real_regressions():
+	baseline = [{"scale_factor": 1.0, "stages": {
+		"ingestion": {"wall_seconds": 2.0},
+		"fact_sales": {"wall_seconds": 1.0},
+		"analytics_export": {"wall_seconds": 0.01},
+	}}]
+	results = [{"scale_factor": 1.0, "stages": {
+		"ingestion": {"wall_seconds": 2.2},
+		"fact_sales": {"wall_seconds": 1.5},
+		"analytics_export": {"wall_seconds": 0.03},
+		"aggregates": {"skipped": "no database server"},
+	}}]
+	regressions = pipeline_stages.compare_to_baseline(results, baseline, threshold=0.2, min_seconds=0.05)
+	assert [(r["stage"], r["change"]) for r in regressions] == [("fact_sales", 0.5)]
+
+
+def test_run_scale_factor_skips_database_stages_without_a_server(monkeypatch):
+	def unreachable():
+		raise psycopg2.OperationalError("connection refused")
+
+	config = {"customers": 10, "products": 5, "transactions": 100}
+	monkeypatch.setattr(generate_data, "get_config", lambda section: config)
+	monkeypatch.setattr(pipeline_stages, "_admin_connection", unreachable)
+	saved_raw_path = generate_data.RAW_PATH
+
+	result = pipeline_stages.run_scale_factor(0.5, seed=3)
+
+	assert result["database"] is None
+	assert result["rows"]["transactions"] == 50
+	assert result["stages"]["data_generation"]["wall_seconds"] >= 0
+	assert result["stages"]["fact_sales"] == {"skipped": "no database server"}
+	assert generate_data.RAW_PATH == saved_raw_path
+
+
+def test_main_reports_skipped_stages_instead_of_passing(monkeypatch, tmp_path):
+	def unreachable():
+		raise psycopg2.OperationalError("connection refused")
+
+	config = {"customers": 10, "products": 5, "transactions": 20}
+	monkeypatch.setattr(generate_data, "get_config", lambda section: config)
+	monkeypatch.setattr(pipeline_stages, "get_config", lambda section: {})
+	monkeypatch.setattr(pipeline_stages, "_admin_connection", unreachable)
+	monkeypatch.setattr(pipeline_stages, "OUT", tmp_path)
+	baseline = tmp_path / "baseline.json"
+	argv = ["--scale-factors", "1", "--baseline", str(baseline)]
+
+	report = pipeline_stages.main(argv)
+
+	assert report["status"] == "incomplete"
+	assert [entry["stage"] for entry in report["skipped"]] == [stage for stage, _ in pipeline_stages.DATABASE_STAGES]
+	with pytest.raises(SystemExit):
+		pipeline_stages.main(argv + ["--update-baseline"])
+	assert not baseline.exists()
+
+
+def test_quality_checks_are_timed_after_cleansing():
+	stages = [stage for stage, _ in pipeline_stages.DATABASE_STAGES]
+	assert stages.index("cleansing") < stages.index("quality_checks")
+
+
+def test_percentile_uses_nearest_rank():
+	values = list(range(1, 101))
+	assert api_load_test.percentile(values, 50) == 50
+	assert api_load_test.percentile(values, 99) == 99
+	assert api_load_test.percentile([7], 99) == 7
+	assert api_load_test.percentile([], 99) is None
+
+
+def test_load_test_sheds_load_with_503_instead_of_queueing(monkeypatch):
+	async def slow_query(query, params=None, timeout_ms=None):
+		await asyncio.sleep(0.05)
+		return [{"total_orders": 1}]
+
+	async def no_version():
+		return None
+
+	async def scenario():
+		monkeypatch.setattr(api, "limiter", ConcurrencyLimiter(limit=2, max_wait_seconds=0.01))
+		monkeypatch.setattr(api.db, "fetch_all", slow_query)
+		monkeypatch.setattr(api, "warehouse_version", VersionProbe(no_version, check_seconds=60))
+		monkeypatch.setattr(api.response_cache, "ttl_seconds", 0)
+		transport = httpx.ASGITransport(app=api.app)
+		return await api_load_test.run_load_test("http://test", 10, 2, ["/analytics/summary"], 5, transport)
+
+	result = asyncio.run(scenario())
+	assert result["requests"] == 20
+	assert set(result["status_counts"]) == {"200", "503"}
+	assert result["latency_ms"]["p99"] is not None
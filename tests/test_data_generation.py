@@ -1,3 +1,6 @@
+import numpy as np
+import pandas as pd
+
 from scripts.data_generation import generate_data
 
 
@@ -17,3 +20,56 @@ def test_generate_transactions_rows():
 	customers = generate_data.generate_customers(2)
 	df = generate_data.generate_transactions(4, customers)
 	assert len(df) == 4
+
+
+def test_generate_transaction_items_references_inputs():
+	rng = np.random.default_rng(1)
+	customers = generate_data.generate_customers(10, rng)
+	products = generate_data.generate_products(5, rng)
+	transactions = generate_data.generate_transactions(50, customers, rng)
+	items = generate_data.generate_transaction_items(transactions, products, rng)
+	assert items["transaction_item_id"].is_unique
+	assert items.groupby("transaction_id").size().between(1, 3).all()
+	assert all(generate_data.validate_referential_integrity(customers, products, transactions, items).values())
+
+
+def test_main_is_reproducible_for_seed_and_scale(monkeypatch, tmp_path):
+	config = {"customers": 10, "products": 5, "transactions": 20, "shard_size": 7}
+	monkeypatch.setattr(generate_data, "get_config", lambda section: config)
+	outputs = []
+	for run in range(2):
+		out = tmp_path / str(run)
+		out.mkdir()
+		monkeypatch.setattr(generate_data, "RAW_PATH", out)
+		metadata = generate_data.main(scale_factor=2, seed=7)
+		assert metadata["row_counts"]["transactions"] == 40
+		assert all(metadata["validation"].values())
+		outputs.append([(out / f"{name}.csv").read_text() for name in ("customers", "products", "transactions", "transaction_items")])
+	assert outputs[0] == outputs[1]
+	assert len(outputs[0][2].splitlines()) == 41
+
+
+def test_main_output_does_not_depend_on_worker_count(monkeypatch, tmp_path):
+	config = {"customers": 20, "products": 8, "transactions": 50, "shard_size": 12}
+	monkeypatch.setattr(generate_data, "get_config", lambda section: config)
+	outputs = []
+	for workers in (1, 3):
+		out = tmp_path / str(workers)
+		out.mkdir()
+		monkeypatch.setattr(generate_data, "RAW_PATH", out)
+		metadata = generate_data.main(seed=11, workers=workers)
+		assert metadata["shards"] == 5
+		assert all(metadata["validation"].values())
+		outputs.append([(out / f"{name}.csv").read_text() for name in ("transactions", "transaction_items")])
+
+	items = pd.read_csv(tmp_path / "1" / "transaction_items.csv")
+	assert items["transaction_item_id"].tolist() == list(range(1, len(items) + 1))
+	assert outputs[0] == outputs[1]
+
+
+def test_name_pools_follow_the_seed():
+	first = generate_data.generate_customers(20, np.random.default_rng(0), seed=1)
+	again = generate_data.generate_customers(20, np.random.default_rng(0), seed=1)
+	other = generate_data.generate_customers(20, np.random.default_rng(0), seed=2)
+	assert first["first_name"].tolist() == again["first_name"].tolist()
+	assert first["first_name"].tolist() != other["first_name"].tolist()
@@ -0,0 +1,29 @@
+from scripts import db_connection
+
+
+def test_get_config_is_parsed_once(monkeypatch, tmp_path):
+	config_path = tmp_path / "config.yaml"
+	config_path.write_text("pipeline:\n  retries: 2\n", encoding="utf-8")
+	monkeypatch.setattr(db_connection, "CONFIG_PATH", config_path)
+	db_connection.reload_config()
+
+	assert db_connection.get_config("pipeline") == {"retries": 2}
+	config_path.write_text("pipeline:\n  retries: 9\n", encoding="utf-8")
+	assert db_connection.get_config("pipeline") == {"retries": 2}
+
+	db_connection.reload_config()
+	assert db_connection.get_config("pipeline") == {"retries": 9}
+	db_connection.reload_config()
+
+
+def test_get_config_returns_copies():
+	db_connection.get_config("pipeline")["retries"] = -1
+	assert db_connection.get_config("pipeline").get("retries") != -1
+
+
+def test_get_engine_is_shared_and_lazy():
+	db_connection.dispose_engine()
+	engine = db_connection.get_engine()
+	assert db_connection.get_engine() is engine
+	assert db_connection.get_pool_metrics()["checked_out"] == 0
+	db_connection.dispose_engine()
@@ -35,3 +35,87 @@ def test_load_csv_to_staging_uses_bulk_insert(monkeypatch, tmp_path):
 	monkeypatch.setattr(ingest_to_staging, "bulk_insert_data", fake_bulk_insert)
 	result = ingest_to_staging.load_csv_to_staging(csv_path, "staging.sample", object())
 	assert result["rows_loaded"] == 1
+
+
+def test_coerce_chunk_maps_and_coerces_columns():
+	df = pd.DataFrame(
+		[
+			{"transaction_id": "1", "customer_id": "7", "transaction_date": "2024-01-19 19:51:02", "extra": "x"},
+			{"transaction_id": "2", "customer_id": "bad", "transaction_date": None, "extra": "y"},
+		]
+	)
+	out = ingest_to_staging.coerce_chunk(df, ingest_to_staging.STAGING_COLUMNS["staging.transactions"])
+	assert list(out.columns) == ["transaction_id", "customer_id", "transaction_date", "payment_method", "total_amount"]
+	assert out["transaction_date"].iloc[0] == "2024-01-19"
+	assert out["customer_id"].isna().iloc[1]
+
+
+def test_coerce_chunk_parses_mixed_iso_dates_and_nulls_fractional_ids():
+	df = pd.DataFrame(
+		[
+			{"transaction_id": "1", "customer_id": "1.5", "transaction_date": "2024-01-02 03:04:05"},
+			{"transaction_id": "2.0", "customer_id": "3", "transaction_date": "2024-01-03"},
+		]
+	)
+	out = ingest_to_staging.coerce_chunk(df, ingest_to_staging.STAGING_COLUMNS["staging.transactions"])
+	assert out["transaction_date"].tolist() == ["2024-01-02", "2024-01-03"]
+	assert out["customer_id"].isna().tolist() == [True, False]
+	assert out["transaction_id"].tolist() == [1, 2]
+
+
+def test_copy_chunk_streams_csv_to_copy():
+	captured = {}
+
+	class DummyCursor:
+		def __enter__(self):
+			return self
+
+		def __exit__(self, exc_type, exc, tb):
+			return False
+
+		def copy_expert(self, sql, buffer):
+			captured["sql"] = sql
+			captured["data"] = buffer.read()
+
+	class DummyConn:
+		def cursor(self):
+			return DummyCursor()
+
+	df = pd.DataFrame([{"a": 1, "b": None}, {"a": 2, "b": "x"}])
+	assert ingest_to_staging.copy_chunk(df, "staging.sample", DummyConn()) == 2
+	assert captured["sql"].startswith("COPY staging.sample (a,b) FROM STDIN")
+	assert captured["data"] == "1,\n2,x\n"
+
+
+def test_plan_shards_covers_file_on_line_boundaries(tmp_path):
+	csv_path = tmp_path / "items.csv"
+	pd.DataFrame({"a": range(1000), "b": ["x" * 5] * 1000}).to_csv(csv_path, index=False)
+	shards = ingest_to_staging.plan_shards(csv_path, 1024)
+	data = csv_path.read_bytes()
+	assert len(shards) > 1
+	assert shards[0][0] == data.index(b"\n") + 1
+	assert shards[-1][1] == len(data)
+	assert all(data[end - 1:end] == b"\n" for _, end in shards)
+	assert all(prev[1] == nxt[0] for prev, nxt in zip(shards, shards[1:]))
+
+
+def test_ingest_parallel_loads_every_shard_row(monkeypatch, tmp_path):
+	csv_path = tmp_path / "products.csv"
+	pd.DataFrame(
+		{"product_id": range(1, 501), "product_name": "p", "category": "Home", "price": 9.99}
+	).to_csv(csv_path, index=False)
+
+	class DummyConn:
+		def commit(self):
+			return None
+
+		def close(self):
+			return None
+
+	monkeypatch.setattr(ingest_to_staging, "get_connection", DummyConn)
+	monkeypatch.setattr(ingest_to_staging, "copy_chunk", lambda df, table_name, connection: len(df))
+	summary = ingest_to_staging.ingest_parallel(
+		{csv_path: "staging.products"}, workers=3, shard_bytes=2048, chunk_size=50, executor="thread"
+	)
+	assert summary[0]["rows_loaded"] == 500
+	assert summary[0]["shards"] > 1
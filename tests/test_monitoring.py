@@ -0,0 +1,95 @@
+from scripts.monitoring import pipeline_monitor
+
+
+def _sample(timestamp, fact_rows, latest="2024-03-31", staging_rows=100, lag=1.0):
+	return {
+		"timestamp": timestamp,
+		"tables": {
+			"warehouse.fact_sales": {"rows": fact_rows, "bytes": fact_rows * 10},
+			"staging.transactions": {"rows": staging_rows, "bytes": 0},
+		},
+		"freshness": {"fact_sales": latest},
+		"lag_hours": {"warehouse_published": lag},
+	}
+
+
+def test_monitoring_queries_never_count_rows():
+	queries = pipeline_monitor.load_named_queries(pipeline_monitor.QUERIES_PATH)
+	assert "table_stats" in queries
+	assert {name for name in queries if name.startswith("freshness_")} >= {"freshness_transactions", "freshness_fact_sales"}
+	assert not any("COUNT(" in sql.upper() for sql in queries.values())
+
+
+def test_run_probes_reports_none_for_a_failing_probe():
+	rolled_back = []
+
+	class DummyCursor:
+		def __enter__(self):
+			return self
+
+		def __exit__(self, *args):
+			return False
+
+		def execute(self, sql):
+			if "missing" in sql:
+				raise RuntimeError("relation does not exist")
+
+		def fetchone(self):
+			return (pipeline_monitor.date(2024, 3, 31),)
+
+	class DummyConnection:
+		def cursor(self):
+			return DummyCursor()
+
+		def rollback(self):
+			rolled_back.append(True)
+
+	queries = {"table_stats": "SELECT 1", "freshness_ok": "SELECT MAX(d) FROM t", "freshness_gone": "SELECT MAX(d) FROM missing"}
+	assert pipeline_monitor.run_probes(DummyConnection(), queries) == {"ok": "2024-03-31", "gone": None}
+	assert rolled_back == [True]
+
+
+def test_detect_anomalies_flags_drops_spikes_regressions_and_staleness():
+	history = [_sample(f"2024-04-0{i}T00:00:00", 1000 + 100 * i) for i in range(1, 5)]
+	config = {"row_drop_pct": 10, "spike_factor": 5, "max_staleness_hours": 26}
+
+	steady = _sample("2024-04-05T00:00:00", 1500, staging_rows=0)
+	assert pipeline_monitor.detect_anomalies(history, steady, config) == []
+
+	spike = _sample("2024-04-05T00:00:00", 5000)
+	assert [a["type"] for a in pipeline_monitor.detect_anomalies(history, spike, config)] == ["row_spike"]
+
+	broken = _sample("2024-04-05T00:00:00", 700, latest="2024-03-01", lag=30)
+	assert [a["type"] for a in pipeline_monitor.detect_anomalies(history, broken, config)] == [
+		"row_drop",
+		"freshness_regressed",
+		"stale_warehouse",
+	]
+
+
+def test_history_round_trip_and_trend(tmp_path):
+	path = tmp_path / "history.jsonl"
+	for i in range(3):
+		pipeline_monitor.append_sample(_sample(f"2024-04-0{i + 1}T00:00:00", 10 * (i + 1)), path)
+	assert len(path.read_text().splitlines()) == 3
+	history = pipeline_monitor.load_history(path, limit=2)
+	assert pipeline_monitor.trend(history, "warehouse.fact_sales") == [
+		("2024-04-02T00:00:00", 20, 200),
+		("2024-04-03T00:00:00", 30, 300),
+	]
+
+
+def test_history_is_read_from_the_tail_and_pruned(monkeypatch, tmp_path):
+	monkeypatch.setattr(pipeline_monitor, "TAIL_BLOCK_BYTES", 16)
+	path = tmp_path / "history.jsonl"
+	for day in range(1, 10):
+		pipeline_monitor.append_sample(_sample(f"2024-04-0{day}T00:00:00", day), path)
+
+	assert [s["timestamp"][:10] for s in pipeline_monitor.load_history(path, limit=2)] == ["2024-04-08", "2024-04-09"]
+	now = pipeline_monitor.datetime(2024, 4, 10)
+	assert not pipeline_monitor.prune_history(path, keep=20, max_age_days=30, now=now)
+
+	assert pipeline_monitor.prune_history(path, keep=5, max_age_days=3.5, now=now)
+	assert [s["timestamp"][:10] for s in pipeline_monitor.load_history(path)] == ["2024-04-07", "2024-04-08", "2024-04-09"]
+	assert pipeline_monitor.prune_history(path, keep=2, now=now)
+	assert len(pipeline_monitor.load_history(path)) == 2
@@ -1,2 +1,308 @@
+import os
+import threading
+from datetime import date
+
+import pytest
+
+from scripts import checkpoints, dag, micro_batch, pipeline_orchestrator
+
+
 def test_basic():
     assert 1 + 1 == 2
+
+
+def test_run_dag_runs_independent_tasks_concurrently():
+	barrier = threading.Barrier(2, timeout=5)
+	tasks = [
+		{"name": "left", "func": barrier.wait, "deps": []},
+		{"name": "right", "func": barrier.wait, "deps": []},
+		{"name": "join", "func": lambda left, right: "joined", "deps": ["left", "right"], "inputs": ["left", "right"]},
+	]
+	run = dag.run_dag(tasks, max_workers=2)
+	assert run["status"] == "success"
+	assert run["tasks"][2]["result"] == "joined"
+
+
+def test_run_dag_retries_per_task_and_skips_downstream_of_failures():
+	calls = {"flaky": 0}
+
+	def flaky():
+		calls["flaky"] += 1
+		if calls["flaky"] < 2:
+			raise RuntimeError("transient")
+		return "ok"
+
+	def broken():
+		raise RuntimeError("boom")
+
+	tasks = [
+		{"name": "flaky", "func": flaky, "deps": []},
+		{"name": "broken", "func": broken, "deps": []},
+		{"name": "after_broken", "func": lambda: None, "deps": ["broken"]},
+		{"name": "last", "func": lambda: None, "deps": ["after_broken", "flaky"]},
+	]
+	run = dag.run_dag(tasks, max_workers=2, retries=1)
+	status = {task["task"]: task["status"] for task in run["tasks"]}
+	assert status == {"flaky": "success", "broken": "failed", "after_broken": "skipped", "last": "skipped"}
+	assert run["tasks"][0]["attempt"] == 2
+	assert run["tasks"][1]["attempt"] == 2
+	assert run["status"] == "failed"
+
+
+def test_critical_path_follows_the_slowest_chain():
+	tasks = [
+		{"name": "a", "deps": []},
+		{"name": "b", "deps": ["a"]},
+		{"name": "c", "deps": ["a"]},
+		{"name": "d", "deps": ["b", "c"]},
+	]
+	results = {"a": {"seconds": 1}, "b": {"seconds": 5}, "c": {"seconds": 2}, "d": {"seconds": 1}}
+	assert dag.critical_path(tasks, results) == {"tasks": ["a", "b", "d"], "seconds": 7}
+
+
+def test_validate_graph_rejects_unknown_deps_and_cycles():
+	with pytest.raises(ValueError):
+		dag.validate_graph([{"name": "a", "deps": ["missing"]}])
+	with pytest.raises(ValueError):
+		dag.validate_graph([{"name": "a", "deps": ["b"]}, {"name": "b", "deps": ["a"]}])
+
+
+def test_pipeline_tasks_split_the_warehouse_load():
+	tasks = {task["name"]: task for task in pipeline_orchestrator.pipeline_tasks()}
+	dag.validate_graph(list(tasks.values()))
+	for dimension in ("dim_date", "dim_customers", "dim_products", "dim_payment_method"):
+		assert tasks[dimension]["deps"] == ["transformation"]
+		assert dimension in tasks["fact_sales"]["deps"]
+	assert tasks["aggregates"]["inputs"] == ["fact_sales"]
+
+
+def test_stale_reason(tmp_path):
+	output = tmp_path / "out.csv"
+	done = {"status": "success", "fingerprint": "abc"}
+	assert checkpoints.stale_reason(None, "abc") == "no checkpoint"
+	assert checkpoints.stale_reason({"status": "failed", "fingerprint": "abc"}, "abc") == "last run failed"
+	assert checkpoints.stale_reason(done, "xyz") == "inputs changed"
+	assert checkpoints.stale_reason(done, "abc", [output]).startswith("missing outputs")
+	output.write_text("x")
+	assert checkpoints.stale_reason(done, "abc", [output]) is None
+
+
+def test_run_pipeline_resumes_from_the_failed_task(monkeypatch, tmp_path):
+	calls = []
+	state = {"fail": True, "source": "v1"}
+
+	def step(name):
+		def run():
+			calls.append(name)
+			if name == "load" and state["fail"]:
+				raise RuntimeError("load failed")
+			return name
+		return run
+
+	tasks = [
+		{"name": "extract", "func": step("extract"), "deps": [], "fingerprint": lambda: state["source"]},
+		{"name": "load", "func": step("load"), "deps": ["extract"]},
+		{"name": "report", "func": step("report"), "deps": ["load"]},
+	]
+	monkeypatch.setattr(pipeline_orchestrator, "pipeline_tasks", lambda: tasks)
+	monkeypatch.setattr(pipeline_orchestrator, "_load_pipeline_config", lambda: {})
+	monkeypatch.setattr(pipeline_orchestrator, "OUT", tmp_path)
+	monkeypatch.setattr(checkpoints, "CHECKPOINT_PATH", tmp_path / "checkpoints.json")
+
+	assert pipeline_orchestrator.run_pipeline()["status"] == "failed"
+	assert calls == ["extract", "load"]
+
+	state["fail"] = False
+	calls.clear()
+	report = pipeline_orchestrator.run_pipeline()
+	assert report["status"] == "success"
+	assert calls == ["load", "report"]
+
+	calls.clear()
+	pipeline_orchestrator.run_pipeline()
+	assert calls == []
+
+	state["source"] = "v2"
+	pipeline_orchestrator.run_pipeline()
+	assert calls == ["extract", "load", "report"]
+
+	calls.clear()
+	pipeline_orchestrator.run_pipeline(only=["report"])
+	assert calls == ["report"]
+
+	calls.clear()
+	pipeline_orchestrator.run_pipeline(from_step="load")
+	assert calls == ["load", "report"]
+
+	with pytest.raises(ValueError):
+		pipeline_orchestrator.run_pipeline(from_step="missing")
+
+
+def _land(landing, name, age=60, body="transaction_id\n1\n"):
+	path = landing / name
+	path.write_text(body, encoding="utf-8")
+	mtime = path.stat().st_mtime - age
+	os.utime(path, (mtime, mtime))
+	return path
+
+
+def test_micro_batch_table_for_prefers_the_longest_prefix():
+	assert micro_batch.table_for(micro_batch.Path("transaction_items_0001.csv")) == "staging.transaction_items"
+	assert micro_batch.table_for(micro_batch.Path("transactions_0001.csv")) == "staging.transactions"
+	assert micro_batch.table_for(micro_batch.Path("orders.csv")) is None
+
+
+def test_micro_batch_processes_each_landed_file_once(monkeypatch, tmp_path):
+	landing = tmp_path / "landing"
+	landing.mkdir()
+	for i in range(3):
+		_land(landing, f"transactions_{i}.csv", age=60 - i)
+	_land(landing, "customers_new.csv", age=0)  # still being written
+	_land(landing, "orders.csv")
+	batches = []
+	monkeypatch.setattr(micro_batch, "process_batch", lambda files, chunk_size: batches.append(files) or {"seconds": 0.1})
+	config = {"batch_size": 2, "micro_batch": {"landing_dir": str(landing), "settle_seconds": 5, "max_pending_files": 0, "resume_pending_files": 1}}
+	manifest_path = tmp_path / "manifest.json"
+
+	first = micro_batch.run_once(config, manifest_path)
+	assert first["files"] == ["transactions_0.csv", "transactions_1.csv"]
+	assert first["backlog"] == 1 and first["paused"]
+	assert (landing / micro_batch.PAUSE_MARKER).exists()
+
+	second = micro_batch.run_once(config, manifest_path)
+	assert second["files"] == ["transactions_2.csv"]
+	assert second["backlog"] == 0 and not second["paused"]
+
+	assert micro_batch.run_once(config, manifest_path)["files"] == []
+	assert [sorted(path.name for path in files) for files in batches] == [
+		["transactions_0.csv", "transactions_1.csv"],
+		["transactions_2.csv"],
+	]
+	manifest = micro_batch.load_manifest(manifest_path)
+	files = {key.split(":")[0]: entry for key, entry in manifest["files"].items()}
+	assert manifest["batches"] == 2
+	assert files["orders.csv"]["status"] == "ignored"
+	assert files["transactions_2.csv"]["batch"] == 2
+	assert "customers_new.csv" not in files
+
+	# A new drop under a used name is a new file.
+	_land(landing, "transactions_0.csv", body="transaction_id\n1\n2\n")
+	assert micro_batch.run_once(config, manifest_path)["files"] == ["transactions_0.csv"]
+
+
+def test_micro_batch_failure_leaves_files_pending(monkeypatch, tmp_path):
+	landing = tmp_path / "landing"
+	landing.mkdir()
+	_land(landing, "products_a.csv")
+
+	def fail(files, chunk_size):
+		raise RuntimeError("warehouse down")
+
+	monkeypatch.setattr(micro_batch, "process_batch", fail)
+	config = {"micro_batch": {"landing_dir": str(landing)}}
+	with pytest.raises(RuntimeError):
+		micro_batch.run_once(config, tmp_path / "manifest.json")
+	manifest = micro_batch.load_manifest(tmp_path / "manifest.json")
+	assert manifest["files"] == {}
+	assert list(manifest["attempts"].values()) == [1]
+
+
+def test_micro_batch_quarantines_a_file_that_keeps_failing(monkeypatch, tmp_path):
+	landing = tmp_path / "landing"
+	landing.mkdir()
+	_land(landing, "products_bad.csv", age=60)
+	_land(landing, "products_good.csv", age=30)
+	loaded = []
+
+	def process(files, chunk_size):
+		if any(path.name == "products_bad.csv" for path in files):
+			raise ValueError("bad row")
+		loaded.extend(path.name for path in files)
+		return {"seconds": 0.1}
+
+	monkeypatch.setattr(micro_batch, "process_batch", process)
+	config = {"micro_batch": {"landing_dir": str(landing), "max_attempts": 2}}
+	manifest_path = tmp_path / "manifest.json"
+
+	with pytest.raises(ValueError):
+		micro_batch.run_once(config, manifest_path)  # both files in one batch: attempt 1 for each
+	summary = micro_batch.run_once(config, manifest_path)  # the bad file alone: attempt 2
+	assert summary["quarantined"] == ["products_bad.csv"]
+	assert (landing / "failed" / "products_bad.csv").exists()
+
+	assert micro_batch.run_once(config, manifest_path)["files"] == ["products_good.csv"]
+	assert loaded == ["products_good.csv"]
+	manifest = micro_batch.load_manifest(manifest_path)
+	statuses = {key.split(":")[0]: entry["status"] for key, entry in manifest["files"].items()}
+	assert statuses == {"products_bad.csv": "failed", "products_good.csv": "processed"}
+	assert manifest["attempts"] == {}
+
+
+def test_plan_batch_respects_the_byte_limit():
+	pending = [("a", 60), ("b", 60), ("c", 10)]
+	assert micro_batch.plan_batch(pending, max_files=10, max_bytes=100) == [("a", 60)]
+	assert micro_batch.plan_batch([("big", 500)], max_files=10, max_bytes=100) == [("big", 500)]
+
+
+def test_micro_batch_reloads_facts_from_a_late_files_oldest_transaction(monkeypatch, tmp_path):
+	late = date(2023, 1, 15)
+	calls = {}
+
+	class DummyConnection:
+		def close(self):
+			pass
+
+	monkeypatch.setattr(micro_batch, "get_connection", DummyConnection)
+	monkeypatch.setattr(micro_batch, "truncate_staging_tables", lambda conn, tables: None)
+	monkeypatch.setattr(micro_batch, "copy_csv_to_staging", lambda path, table, conn, chunk_size: {"rows_loaded": 1})
+	monkeypatch.setattr(
+		micro_batch.staging_to_production, "run_pushdown_delta", lambda conn: {"summary": [], "min_transaction_date": late}
+	)
+	monkeypatch.setattr(micro_batch.load_warehouse, "main", lambda since=None: calls.update(since=since) or {"publish_version": 7})
+
+	result = micro_batch.process_batch({tmp_path / "transactions_late.csv": "staging.transactions"})
+	assert calls["since"] == late
+	assert result["fact_window_from"] == late and result["warehouse_version"] == 7
+
+
+def test_warehouse_fingerprint_reads_state_rows_instead_of_counting(monkeypatch):
+	executed = []
+	rows = {
+		"data_versions": [("production", 4, "2024-01-02 03:04:05")],
+		"watermarks": [("staging_to_production", "transactions", "2024-01-02", "2024-01-02 03:04:05")],
+	}
+
+	class DummyCursor:
+		def __enter__(self):
+			return self
+
+		def __exit__(self, *args):
+			return False
+
+		def execute(self, sql, params=None):
+			executed.append((sql, params))
+
+		def fetchall(self):
+			return rows["data_versions" if "data_versions" in executed[-1][0] else "watermarks"]
+
+	class DummyConnection:
+		def cursor(self):
+			return DummyCursor()
+
+		def rollback(self):
+			pass
+
+		def close(self):
+			pass
+
+	monkeypatch.setattr(checkpoints, "get_connection", DummyConnection)
+	monkeypatch.setattr(pipeline_orchestrator, "get_config", lambda section: {})
+
+	fingerprint = pipeline_orchestrator._production_fingerprint()
+
+	assert fingerprint["production"] == {
+		"versions": {"production": [4, "2024-01-02 03:04:05"]},
+		"watermarks": {"staging_to_production.transactions": ["2024-01-02", "2024-01-02 03:04:05"]},
+	}
+	assert [params for _, params in executed] == [(["production"],), (["staging_to_production"],)]
+	assert not any("COUNT(" in sql for sql, _ in executed)
@@ -1,3 +1,5 @@
+import pytest
+
 from scripts.quality_checks import validate_data
 
 
@@ -9,3 +11,97 @@ def test_calculate_quality_score():
 		"d": True,
 	}
 	assert validate_data.calculate_quality_score(results) == 75.0
+
+
+def test_compile_table_scan_fuses_rules_into_one_query():
+	rules = [
+		{"name": "email_nulls", "table": "customers", "type": "not_null", "column": "email"},
+		{"name": "dupes", "table": "customers", "type": "unique", "column": "customer_id"},
+	]
+	sql = validate_data.compile_table_scan("production", "customers", rules)
+	assert sql == (
+		"SELECT COUNT(*) AS row_count, COUNT(*) FILTER (WHERE t.email IS NULL), "
+		"COUNT(t.customer_id) - COUNT(DISTINCT t.customer_id) FROM production.customers t"
+	)
+
+
+def test_compile_table_scan_checks_references_with_not_exists():
+	rules = [
+		{"name": "fk", "table": "transactions", "type": "references", "column": "customer_id",
+		 "ref_table": "customers", "ref_column": "customer_id"},
+		{"name": "positive", "table": "transactions", "type": "range", "column": "total_amount", "greater_than": 0},
+	]
+	sql = validate_data.compile_table_scan("staging", "transactions", rules)
+	assert (
+		"COUNT(*) FILTER (WHERE NOT EXISTS (SELECT 1 FROM staging.customers r WHERE r.customer_id = t.customer_id))"
+		in sql
+	)
+	assert "COUNT(*) FILTER (WHERE t.total_amount <= 0)" in sql
+	assert sql.endswith("FROM staging.transactions t")
+	assert "JOIN" not in sql
+
+
+def test_check_table_reports_failing_counts_and_samples(monkeypatch):
+	queries = []
+
+	class DummyCursor:
+		def __enter__(self):
+			return self
+
+		def __exit__(self, exc_type, exc, tb):
+			return False
+
+		def execute(self, sql):
+			queries.append(sql)
+
+		def fetchone(self):
+			return (10, 0, 2)
+
+		def fetchall(self):
+			return [(4,), (7,)]
+
+	class DummyConn:
+		def cursor(self):
+			return DummyCursor()
+
+		def close(self):
+			return None
+
+	monkeypatch.setattr(validate_data, "get_connection", DummyConn)
+	rules = [
+		{"name": "price_nulls", "table": "products", "type": "not_null", "column": "price"},
+		{"name": "positive", "table": "products", "type": "range", "column": "price", "greater_than": 0},
+	]
+	result = validate_data.check_table("production", "products", rules, "product_id", 5)
+	assert result["row_count"] == 10
+	assert result["rules"]["price_nulls"]["passed"] is True
+	assert result["rules"]["positive"]["failing_rows"] == 2
+	assert result["rules"]["positive"]["sample_keys"] == [4, 7]
+	assert len(queries) == 2
+
+
+def test_check_table_closes_its_connection_when_a_query_fails(monkeypatch):
+	closed = []
+
+	class FailingCursor:
+		def __enter__(self):
+			return self
+
+		def __exit__(self, exc_type, exc, tb):
+			return False
+
+		def execute(self, sql):
+			raise RuntimeError("relation does not exist")
+
+	class DummyConn:
+		def cursor(self):
+			return FailingCursor()
+
+		def close(self):
+			closed.append(True)
+
+	monkeypatch.setattr(validate_data, "get_connection", DummyConn)
+	rules = [{"name": "price_nulls", "table": "products", "type": "not_null", "column": "price"}]
+	with pytest.raises(RuntimeError):
+		validate_data.check_table("production", "products", rules, "product_id", 5)
+	assert closed == [True]
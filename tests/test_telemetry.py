@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts import dag, telemetry
+
+
+class DummyCursor:
+	def __init__(self, rowcount, description=None):
+		self.rowcount = rowcount
+		self.description = description
+
+
+def test_measure_task_splits_sql_and_python_time():
+	with telemetry.measure_task("load") as metrics:
+		with telemetry._sql_timer(DummyCursor(40, description=[("id",)])):
+			pass
+		with telemetry._sql_timer(DummyCursor(25)):
+			pass
+		telemetry.record_rows(rows_out=5)
+
+	assert metrics["sql_statements"] == 2
+	assert metrics["rows_in"] == 40
+	assert metrics["rows_out"] == 30
+	assert metrics["wall_seconds"] >= metrics["sql_seconds"]
+	assert set(telemetry.PROMETHEUS_METRICS) <= set(metrics)
+	assert "process_peak_rss_mb" in metrics and "peak_rss_mb" not in metrics
+
+
+def test_sql_outside_a_task_is_not_recorded():
+	with telemetry._sql_timer(DummyCursor(10)):
+		pass
+	with telemetry.measure_task("idle") as metrics:
+		pass
+	assert metrics["sql_statements"] == 0
+
+
+def test_worker_threads_report_sql_to_the_submitting_task():
+	def query():
+		with telemetry._sql_timer(DummyCursor(5, description=[("id",)])):
+			pass
+
+	with telemetry.measure_task("analytics") as metrics:
+		with ThreadPoolExecutor(max_workers=4) as pool:
+			for future in [telemetry.submit_in_context(pool, query) for _ in range(8)]:
+				future.result()
+			pool.submit(query).result()  # a plain submit loses the task
+	assert metrics["sql_statements"] == 8
+	assert metrics["rows_in"] == 40
+
+
+def test_run_task_profiles_and_reports_metrics(monkeypatch, tmp_path):
+	monkeypatch.setattr(telemetry, "PROFILE_PATH", tmp_path)
+	record = dag.run_task("aggregates", lambda: telemetry.record_rows(rows_in=3), 0, {}, "cprofile")
+	assert record["status"] == "success"
+	assert record["metrics"]["rows_in"] == 3
+	assert (tmp_path / "aggregates.prof").exists()
+
+
+def test_to_prometheus_renders_one_sample_per_task():
+	tasks = [
+		{"task": "fact_sales", "metrics": {"wall_seconds": 1.5, "rows_out": 10}},
+		{"task": "analytics", "status": "cached"},
+	]
+	text = telemetry.to_prometheus(tasks)
+	assert "# TYPE pipeline_task_wall_seconds gauge" in text
+	assert 'pipeline_task_wall_seconds{task="fact_sales"} 1.5' in text
+	assert 'pipeline_task_rows_out{task="fact_sales"} 10' in text
+	assert 'task="analytics"' not in text
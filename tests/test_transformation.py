@@ -1,6 +1,9 @@
+import json
+
 import pandas as pd
+import pyarrow.parquet as pq
 
-from scripts.transformation import staging_to_production
+from scripts.transformation import export_parquet, generate_analytics, staging_to_production
 
 
 def test_cleanse_customer_data_removes_nulls():
@@ -23,3 +26,180 @@ def test_apply_business_rules_filters_invalid_items():
 	)
 	filtered = staging_to_production.apply_business_rules(df, "items")
 	assert len(filtered) == 1
+
+
+def test_compile_pushdown_sql_dedupes_before_filtering():
+	sql = staging_to_production.compile_pushdown_sql("products")
+	assert sql.startswith("INSERT INTO production.products (product_id, product_name, category, price) SELECT")
+	assert "DISTINCT ON (product_id)" in sql
+	assert sql.index("DISTINCT ON") < sql.index("WHERE")
+	assert sql.endswith("price IS NOT NULL AND price > 0")
+
+
+def test_compile_pushdown_sql_matches_item_business_rules():
+	sql = staging_to_production.compile_pushdown_sql("transaction_items")
+	assert "DISTINCT ON" not in sql
+	assert sql.endswith("WHERE quantity > 0 AND unit_price > 0")
+
+
+def test_compile_upsert_sql_only_rewrites_changed_rows():
+	sql = staging_to_production.compile_upsert_sql("products", "VALUES %s")
+	assert "ON CONFLICT (product_id) DO UPDATE SET product_name = EXCLUDED.product_name" in sql
+	assert sql.endswith(
+		"WHERE (tgt.product_name, tgt.category, tgt.price) "
+		"IS DISTINCT FROM (EXCLUDED.product_name, EXCLUDED.category, EXCLUDED.price)"
+	)
+
+
+def test_upsert_to_production_sends_batches(monkeypatch):
+	batches = []
+
+	class DummyCursor:
+		rowcount = 0
+
+		def __enter__(self):
+			return self
+
+		def __exit__(self, exc_type, exc, tb):
+			return False
+
+	class DummyConn:
+		def cursor(self):
+			return DummyCursor()
+
+	def fake_execute_values(cur, query, batch, page_size):
+		batches.append(batch)
+		cur.rowcount = len(batch)
+
+	monkeypatch.setattr(staging_to_production, "execute_values", fake_execute_values)
+	df = pd.DataFrame(
+		{"product_id": range(5), "product_name": "p", "category": None, "price": [1.0] * 5}
+	)
+	assert staging_to_production.upsert_to_production(df, "products", DummyConn(), batch_size=2) == 5
+	assert [len(b) for b in batches] == [2, 2, 1]
+	assert batches[0][0] == (0, "p", None, 1.0)
+
+
+def test_load_queries_reads_named_blocks_from_the_sql_file():
+	queries = generate_analytics.load_queries()
+	assert list(queries) == [
+		"query1_top_products",
+		"query2_monthly_trend",
+		"query5_payment_distribution",
+	]
+	assert queries["query1_top_products"].startswith("SELECT")
+	assert not any(sql.endswith(";") or "-- Objective" in sql for sql in queries.values())
+
+
+def test_execute_and_export_streams_each_query_with_copy(monkeypatch, tmp_path):
+	copied = []
+
+	class DummyCursor:
+		rowcount = 2
+
+		def __enter__(self):
+			return self
+
+		def __exit__(self, *args):
+			return False
+
+		def copy_expert(self, sql, f):
+			copied.append(sql)
+			f.write('"name, full",total\n"a, b",1\nb,2\n')
+
+	class DummyConnection:
+		def cursor(self):
+			return DummyCursor()
+
+		def rollback(self):
+			pass
+
+		def close(self):
+			pass
+
+	queries = tmp_path / "queries.sql"
+	queries.write_text("-- name: first\nSELECT 1;\n\n-- name: second\n-- comment\nSELECT 2;\n", encoding="utf-8")
+	config = {"queries_path": str(queries), "output_dir": str(tmp_path / "out"), "workers": 2}
+	monkeypatch.setattr(generate_analytics, "get_config", lambda section: config)
+	monkeypatch.setattr(generate_analytics, "get_connection", DummyConnection)
+
+	summary = generate_analytics.execute_and_export()
+
+	assert sorted(copied) == [
+		"COPY (SELECT 1) TO STDOUT WITH (FORMAT csv, HEADER)",
+		"COPY (SELECT 2) TO STDOUT WITH (FORMAT csv, HEADER)",
+	]
+	assert summary["query_results"]["first"]["rows"] == 2
+	assert summary["query_results"]["second"]["columns"] == 2
+	assert (tmp_path / "out" / "second.csv").read_text() == '"name, full",total\n"a, b",1\nb,2\n'
+	assert json.loads((tmp_path / "out" / "analytics_summary.json").read_text())["queries_executed"] == 2
+	assert not list((tmp_path / "out").glob("*.part"))
+
+
+def test_parquet_partition_queries_filter_by_month():
+	spec = export_parquet.PARQUET_TABLES["fact_sales"]
+	signature_sql = export_parquet.compile_signature_sql(spec)
+	assert "EXTRACT(YEAR FROM t.date_key)" in signature_sql and signature_sql.endswith("GROUP BY 1, 2")
+	assert export_parquet.compile_partition_query(spec).endswith("f.date_key >= %(start)s AND f.date_key < %(end)s")
+	monthly = export_parquet.compile_partition_query(export_parquet.PARQUET_TABLES["agg_sales_monthly"])
+	assert monthly.endswith("WHERE a.year = %(year)s AND a.month = %(month)s")
+	assert export_parquet._month_range(2024, 12) == (pd.Timestamp("2024-12-01").date(), pd.Timestamp("2025-01-01").date())
+
+
+def test_export_parquet_rewrites_only_changed_partitions(monkeypatch, tmp_path):
+	signatures = [(2024, 1, 2, "a"), (2024, 2, 1, "b")]
+	reads = []
+
+	class DummyCursor:
+		def __enter__(self):
+			return self
+
+		def __exit__(self, *args):
+			return False
+
+		def execute(self, sql):
+			pass
+
+		def fetchall(self):
+			return signatures
+
+	class DummyConnection:
+		def cursor(self):
+			return DummyCursor()
+
+		def rollback(self):
+			pass
+
+		def close(self):
+			pass
+
+	def read_sql(query, connection, params=None):
+		reads.append(params["start"].month)
+		rows = 2 if params["start"].month == 1 else 1
+		return pd.DataFrame({"sales_key": range(rows), "category": ["Books"] * rows, "total_sales": [1.5] * rows})
+
+	config = {"output_dir": str(tmp_path), "compression": "zstd", "tables": ["fact_sales"]}
+	monkeypatch.setattr(export_parquet, "get_config", lambda section: config)
+	monkeypatch.setattr(export_parquet, "get_connection", DummyConnection)
+	monkeypatch.setattr(export_parquet.pd, "read_sql", read_sql)
+
+	first = export_parquet.main()
+	assert first["tables"]["fact_sales"] == {"partitions": 2, "written": 2, "unchanged": 0, "removed": 0, "rows_written": 3}
+	january = tmp_path / "fact_sales" / "year=2024" / "month=01" / "part-0.parquet"
+	table = pq.read_table(january)
+	assert table.num_rows == 2
+	assert str(table.schema.field("category").type).startswith("dictionary")
+
+	signatures = [(2024, 1, 2, "a"), (2024, 3, 1, "c")]
+	reads.clear()
+	second = export_parquet.main()
+	assert reads == [3]
+	assert second["tables"]["fact_sales"] == {"partitions": 2, "written": 1, "unchanged": 1, "removed": 1, "rows_written": 1}
+	assert not (tmp_path / "fact_sales" / "year=2024" / "month=02" / "part-0.parquet").exists()
+
+	manifest = json.loads((tmp_path / "manifest.json").read_text())["tables"]["fact_sales"]
+	assert manifest["rows"] == 3
+	assert {name: entry["rows"] for name, entry in manifest["partitions"].items()} == {
+		"year=2024/month=01": 2,
+		"year=2024/month=03": 1,
+	}
@@ -0,0 +1,80 @@
+from datetime import date
+
+from scripts.transformation import load_warehouse
+
+
+def test_compile_scd2_sql_expires_on_hash_change():
+	sql = load_warehouse.compile_scd2_sql("dim_customers")
+	assert "FROM production.customers src" in sql["expire"]
+	assert "d.is_current" in sql["expire"]
+	assert "d.row_hash IS DISTINCT FROM md5(ROW(src.first_name, src.last_name, src.email)::text)" in sql["expire"]
+
+
+def test_compile_scd2_sql_inserts_only_missing_current_versions():
+	sql = load_warehouse.compile_scd2_sql("dim_products")
+	assert sql["insert"].startswith(
+		"INSERT INTO warehouse.dim_products (product_id, product_name, category, price, row_hash,"
+	)
+	assert "NOT EXISTS (SELECT 1 FROM warehouse.dim_products d WHERE d.product_id = src.product_id AND d.is_current)" in sql["insert"]
+	assert "TRUNCATE" not in " ".join(sql.values())
+
+
+def test_date_chunks_cover_range_without_gaps():
+	chunks = load_warehouse.date_chunks(date(2024, 1, 1), date(2024, 3, 5), 31)
+	assert chunks[0] == (date(2024, 1, 1), date(2024, 2, 1))
+	assert chunks[-1][1] == date(2024, 3, 6)
+	assert all(prev[1] == nxt[0] for prev, nxt in zip(chunks, chunks[1:]))
+
+
+def test_compile_aggregate_delta_sql_adds_signed_window_totals():
+	sql = load_warehouse.compile_aggregate_delta_sql("agg_sales_monthly")
+	assert "WHERE f.date_key >= %(start)s" in sql
+	assert "%(sign)s * total_sales" in sql
+	assert "ON CONFLICT (year, month) DO UPDATE SET" in sql
+	assert "total_orders = a.total_orders + EXCLUDED.total_orders" in sql
+
+
+def test_aggregate_deltas_skip_facts_without_a_product():
+	# A fact whose product has no current dimension row is loaded with a NULL product_key.
+	product = load_warehouse.compile_aggregate_delta_sql("agg_sales_product")
+	assert "WHERE f.product_key IS NOT NULL AND f.date_key >= %(start)s" in product
+	assert "product_key IS NOT NULL" not in load_warehouse.compile_aggregate_delta_sql("agg_sales_daily")
+	assert "WHERE f.product_key IS NOT NULL" in load_warehouse.aggregate_select("agg_sales_product")
+	assert "WHERE" not in load_warehouse.aggregate_select("agg_sales_daily")
+
+
+def test_apply_aggregate_delta_cleans_up_empty_rows_after_adding():
+	executed = []
+
+	class DummyCursor:
+		def execute(self, sql, params=None):
+			executed.append((sql, params))
+
+	load_warehouse.apply_aggregate_delta(DummyCursor(), date(2024, 1, 1), -1)
+	assert len(executed) == 4
+	assert all(params["sign"] == -1 for _, params in executed)
+
+	executed.clear()
+	load_warehouse.apply_aggregate_delta(DummyCursor(), date(2024, 1, 1), 1)
+	assert [sql for sql, _ in executed[4:]] == [
+		"DELETE FROM warehouse.agg_sales_daily WHERE total_orders <= 0",
+		"DELETE FROM warehouse.agg_sales_monthly WHERE total_orders <= 0",
+		"DELETE FROM warehouse.agg_sales_category WHERE total_orders <= 0",
+		"DELETE FROM warehouse.agg_sales_product WHERE total_orders <= 0",
+	]
+
+
+def test_build_aggregates_dispatches_on_configured_method(monkeypatch):
+	monkeypatch.setattr(load_warehouse, "build_aggregates_grouping_sets", lambda: {"method": "grouping_sets"})
+	monkeypatch.setattr(load_warehouse, "build_aggregates_pandas", lambda: {"method": "pandas"})
+	assert load_warehouse.build_aggregates("pandas")["method"] == "pandas"
+	assert load_warehouse.build_aggregates("grouping_sets")["method"] == "grouping_sets"
+	assert "GROUP BY GROUPING SETS ((date_key), (year, month), (category), (product_key))" in load_warehouse.GROUPING_SETS_SQL
+
+
+def test_fact_window_reaches_back_to_a_late_batch(monkeypatch):
+	monkeypatch.setattr(load_warehouse, "get_watermark", lambda conn, stage, table: "2024-03-31")
+	assert load_warehouse._fact_window_start(None, "incremental", 3) == date(2024, 3, 28)
+	assert load_warehouse._fact_window_start(None, "incremental", 3, since=date(2023, 1, 15)) == date(2023, 1, 15)
+	assert load_warehouse._fact_window_start(None, "incremental", 3, since=date(2024, 3, 30)) == date(2024, 3, 28)
+	assert load_warehouse._fact_window_start(None, "full", 3, since=date(2023, 1, 15)) is None